@@ -0,0 +1,232 @@
+# backend/app/assets.py
+"""
+Imágenes estáticas con huella de contenido y variantes precomprimidas.
+
+    python -m app.manage assets
+
+1. `build()` copia cada archivo de app/static a `static/dist/<nombre>.<hash>.<ext>`
+   (sha256 del contenido, 12 hex), escribe `.gz` (y `.br` si está instalado
+   `brotli`) para los formatos de texto y guarda `dist/manifest.json`.
+2. `ingest(db)` reescribe `Product.image_url` a la ruta con hash (también
+   las que apuntan a un hash viejo del mismo archivo).
+
+`HashedStaticFiles` sirve /static: lo que está en el manifiesto va con
+`Cache-Control: immutable` y, según Accept-Encoding, la variante .br/.gz ya
+comprimida (nada se comprime por petición). Las subidas de static/uploads
+(app/images.py) ya tienen hash en el nombre y también son inmutables. El
+resto (rutas sin hash) se revalida siempre con ETag. Los hashes viejos no se borran: clientes y CDN
+pueden seguir pidiéndolos.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+try:  # opcional: sin brotli solo se generan variantes gzip
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+from .images import UPLOADS
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = Path(__file__).resolve().parent / "static"
+STATIC_URL = "/static"
+DIST = "dist"
+MANIFEST = STATIC_DIR / DIST / "manifest.json"
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+# Formatos que vale la pena comprimir (png/jpg/webp ya vienen comprimidos)
+COMPRESSIBLE = {".svg", ".css", ".js", ".json", ".txt", ".html", ".xml", ".ico"}
+# Orden de preferencia al elegir variante
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+_HASHED_NAME = re.compile(r"^(?P<stem>.+)\.(?P<hash>[0-9a-f]{12})(?P<suffix>\.[^./]+)$")
+
+
+# =======================
+#   Build
+# =======================
+def _write(path: Path, data: bytes) -> None:
+    if path.exists():
+        return  # mismo hash => mismo contenido
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+
+def _compressed(data: bytes) -> Dict[str, bytes]:
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    # Solo las que ahorran bytes (un SVG de 200 B puede crecer con gzip)
+    return {enc: body for enc, body in variants.items() if len(body) < len(data)}
+
+
+def build(static_dir: Path = STATIC_DIR) -> dict:
+    """Genera los archivos con hash y sus variantes; devuelve (y guarda) el manifiesto."""
+    dist = static_dir / DIST
+    files: Dict[str, str] = {}
+    encodings: Dict[str, list] = {}
+    for source in sorted(static_dir.rglob("*")):
+        rel = source.relative_to(static_dir)
+        if not source.is_file() or rel.parts[0] in (DIST, UPLOADS) or source.name.startswith("."):
+            continue
+        data = source.read_bytes()
+        digest = hashlib.sha256(data).hexdigest()[:12]
+        hashed_rel = Path(DIST) / rel.parent / f"{source.stem}.{digest}{source.suffix}"
+        _write(static_dir / hashed_rel, data)
+
+        available = []
+        if source.suffix.lower() in COMPRESSIBLE:
+            variants = _compressed(data)
+            for encoding, extension in ENCODINGS:
+                if encoding in variants:
+                    _write(static_dir / f"{hashed_rel}{extension}", variants[encoding])
+                    available.append(encoding)
+        files[f"{STATIC_URL}/{rel.as_posix()}"] = f"{STATIC_URL}/{hashed_rel.as_posix()}"
+        encodings[hashed_rel.as_posix()] = available
+
+    manifest = {"files": files, "encodings": encodings}
+    dist.mkdir(parents=True, exist_ok=True)
+    tmp = dist / "manifest.json.tmp"
+    tmp.write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    os.replace(tmp, dist / "manifest.json")
+    reload()
+    return manifest
+
+
+# =======================
+#   Manifiesto en memoria
+# =======================
+_manifest: Optional[dict] = None
+_lock = threading.Lock()
+
+
+def manifest() -> dict:
+    global _manifest
+    if _manifest is None:
+        with _lock:
+            if _manifest is None:
+                try:
+                    _manifest = json.loads(MANIFEST.read_text())
+                except (OSError, ValueError):
+                    _manifest = {"files": {}, "encodings": {}}  # sin build: todo se sirve sin hash
+    return _manifest
+
+
+def reload() -> None:
+    global _manifest
+    with _lock:
+        _manifest = None
+
+
+def source_url(url: str) -> str:
+    """`/static/dist/x.<hash>.svg` -> `/static/x.svg`; cualquier otra URL igual."""
+    prefix = f"{STATIC_URL}/{DIST}/"
+    if not url.startswith(prefix):
+        return url
+    rest = url[len(prefix):]
+    directory, _, name = rest.rpartition("/")
+    match = _HASHED_NAME.match(name)
+    if not match:
+        return url
+    name = match["stem"] + match["suffix"]
+    return f"{STATIC_URL}/{directory + '/' if directory else ''}{name}"
+
+
+def hashed_url(url: Optional[str]) -> Optional[str]:
+    """Ruta con el hash vigente para una imagen de /static (si está en el manifiesto)."""
+    if not url or not url.startswith(STATIC_URL + "/"):
+        return url
+    return manifest()["files"].get(source_url(url), url)
+
+
+def ingest(db: Session) -> int:
+    """Reescribe image_url de los productos a las rutas con hash; devuelve filas cambiadas."""
+    changed = 0
+    urls = db.scalars(
+        select(Product.image_url).where(Product.image_url.like(f"{STATIC_URL}/%")).distinct()
+    ).all()
+    for url in urls:
+        target = hashed_url(url)
+        if target != url:
+            changed += db.execute(
+                update(Product).where(Product.image_url == url).values(image_url=target)
+            ).rowcount
+    db.commit()
+    if changed:
+        from .cache import catalog_cache
+        catalog_cache.bump()
+    return changed
+
+
+# =======================
+#   Servir /static
+# =======================
+def _accepts(accept_encoding: str, coding: str) -> bool:
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != coding:
+            continue
+        q = params.strip()
+        if not q.startswith("q="):
+            return True
+        try:
+            return float(q[2:]) > 0
+        except ValueError:
+            return False
+    return False
+
+
+class HashedStaticFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200):
+        request_headers = Headers(scope=scope)
+        rel = Path(os.path.relpath(full_path, os.path.realpath(self.directory))).as_posix()
+        available = manifest()["encodings"].get(rel)
+
+        if available is None:
+            response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+            # Las subidas ya llevan el hash del contenido en el nombre
+            response.headers["Cache-Control"] = IMMUTABLE if rel.startswith(UPLOADS + "/") else REVALIDATE
+        else:
+            accept = request_headers.get("accept-encoding", "")
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            response = None
+            for encoding, extension in ENCODINGS:
+                if encoding in available and _accepts(accept, encoding):
+                    variant = f"{full_path}{extension}"
+                    try:
+                        variant_stat = os.stat(variant)
+                    except FileNotFoundError:
+                        continue  # manifiesto nuevo y archivo aún no copiado
+                    response = FileResponse(
+                        variant, status_code=status_code, stat_result=variant_stat, media_type=media_type
+                    )
+                    response.headers["Content-Encoding"] = encoding
+                    break
+            if response is None:
+                response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+            response.headers["Cache-Control"] = IMMUTABLE
+            if available:
+                response.headers["Vary"] = "Accept-Encoding"
+
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -1,28 +1,27 @@
 # backend/app/auth.py
 import os
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
 from typing import Optional, Callable, Iterable
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from passlib.exc import UnknownHashError
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import event, inspect, or_, select, true, update
 from sqlalchemy.orm import Session
 
-from .database import get_db
+from .cache import TTLCache
+from .config import settings
+from .database import SessionLocal, run_in_session
 from .models import User, RoleEnum
+from .hashing import pwd_context, verify_password_sync, hash_password_sync, hash_password_async
 
 # ===== Config (.env) =====
 SECRET_KEY = os.getenv("JWT_SECRET", "dev-secret-change-me")
 ALGORITHM = os.getenv("JWT_ALG", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("JWT_EXPIRE_MIN", "120"))
 
-# Acepta hashes legacy además de bcrypt (evita UnknownHashError)
-pwd_context = CryptContext(
-    schemes=["bcrypt", "pbkdf2_sha256", "sha256_crypt", "argon2", "plaintext"],
-    deprecated="auto",
-)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
 credentials_exc = HTTPException(
@@ -32,18 +31,32 @@ credentials_exc = HTTPException(
 )
 
 # ===== Password utils =====
+# El trabajo de bcrypt corre en el pool de app/hashing.py; los endpoints async
+# usan verify_password_async / hash_password_async directamente.
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verifica contra varios esquemas; si es desconocido, prueba igualdad (texto plano legacy)."""
-    if hashed_password is None:
-        return False
-    try:
-        return pwd_context.verify(plain_password, hashed_password)
-    except UnknownHashError:
-        # Compatibilidad: algunos datos antiguos pueden tener password en texto plano
-        return hashed_password == plain_password
+    return verify_password_sync(plain_password, hashed_password)[0]
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return hash_password_sync(password)
+
+def _store_upgraded_hash(user_id: int, old_hash: str, new_hash: str) -> None:
+    with SessionLocal() as db:
+        # Compare-and-set: si cambió la contraseña mientras tanto, no pisar
+        db.execute(
+            update(User)
+            .where(User.id == user_id, User.password_hash == old_hash)
+            .values(password_hash=new_hash)
+        )
+        db.commit()
+
+async def upgrade_password_hash(user_id: int, old_hash: str, plain_password: str) -> None:
+    """Tarea en segundo plano tras un login con hash legacy o bcrypt de menor costo."""
+    try:
+        new_hash = await hash_password_async(plain_password)
+    except HTTPException:
+        return  # pool saturado: se reintentará en el próximo login
+    await run_in_threadpool(_store_upgraded_hash, user_id, old_hash, new_hash)
 
 # ===== JWT =====
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -59,24 +72,87 @@ def decode_token(token: str) -> dict:
     return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
 
 # ===== DB helpers =====
+# Forma del modelo resuelta una sola vez al importar (no en cada request)
+_IDENTITY_FIELDS = [f for f in ("email", "username") if hasattr(User, f)]
+_ENABLED_FIELD = "is_active" if hasattr(User, "is_active") else ("enabled" if hasattr(User, "enabled") else None)
+
+def _identity_filter(identity: str):
+    return or_(*[getattr(User, f) == identity for f in _IDENTITY_FIELDS])
+
 def get_user_by_identity(db: Session, identity: str) -> Optional[User]:
-    if hasattr(User, "email"):
-        u = db.query(User).filter(User.email == identity).first()
-        if u:
-            return u
-    if hasattr(User, "username"):
-        return db.query(User).filter(User.username == identity).first()
-    return None
+    if not _IDENTITY_FIELDS:
+        return None
+    return db.query(User).filter(_identity_filter(identity)).first()
 
 def _is_enabled(u: User) -> bool:
-    if hasattr(u, "is_active"):
-        return bool(getattr(u, "is_active"))
-    if hasattr(u, "enabled"):
-        return bool(getattr(u, "enabled"))
-    return True
+    return bool(getattr(u, _ENABLED_FIELD)) if _ENABLED_FIELD else True
+
+# ===== Principal (usuario autenticado, cacheado) =====
+@dataclass(frozen=True)
+class Principal:
+    """Vista inmutable y liviana del usuario autenticado (compatible con UserOut)."""
+    id: int
+    email: str
+    role: str
+    is_active: bool
+    created_at: datetime
+
+def _role_str(raw_role) -> str:
+    return str(getattr(raw_role, "value", raw_role))
+
+def _load_principal(db: Session, subject: str) -> Optional[Principal]:
+    if not _IDENTITY_FIELDS:
+        return None
+    enabled_col = getattr(User, _ENABLED_FIELD) if _ENABLED_FIELD else true()
+    row = db.execute(
+        select(User.id, getattr(User, _IDENTITY_FIELDS[0]), User.role, enabled_col, User.created_at)
+        .where(_identity_filter(subject))
+        .limit(1)
+    ).first()
+    if row is None:
+        return None
+    return Principal(id=row[0], email=row[1], role=_role_str(row[2]), is_active=bool(row[3]), created_at=row[4])
+
+principal_cache = TTLCache(max_size=settings.auth_cache_size, ttl=settings.auth_cache_ttl)
+
+# Invalidación: cambios de rol / activo / identidad se aplican al confirmar,
+# pero solo en el proceso que confirmó. En los demás workers (y para UPDATE/
+# DELETE en bloque o hechos fuera de la app) el principal viejo sigue vigente
+# hasta AUTH_CACHE_TTL: ese es el plazo máximo para que un usuario degradado,
+# desactivado o borrado pierda el acceso. Por eso el TTL es de segundos; aun
+# así ahorra la consulta en casi todas las peticiones de un mismo usuario.
+_PRINCIPAL_FIELDS = ("role", _ENABLED_FIELD, *_IDENTITY_FIELDS)
+
+@event.listens_for(User, "after_update")
+def _user_updated(mapper, connection, target):
+    state = inspect(target)
+    changed = [f for f in _PRINCIPAL_FIELDS if f and state.attrs[f].history.has_changes()]
+    if changed:
+        subjects = Session.object_session(target).info.setdefault("auth_invalidate", set())
+        for f in _IDENTITY_FIELDS:
+            hist = state.attrs[f].history
+            subjects.update(v for v in (*hist.deleted, *hist.unchanged, *hist.added) if v)
+
+@event.listens_for(User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    subjects = Session.object_session(target).info.setdefault("auth_invalidate", set())
+    subjects.update(getattr(target, f) for f in _IDENTITY_FIELDS)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    for subject in session.info.pop("auth_invalidate", ()):
+        principal_cache.invalidate(subject)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session):
+    session.info.pop("auth_invalidate", None)
 
 # ===== Current user =====
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Con la caché caliente no hay consultas ni saltos al threadpool: solo se
+    decodifica el JWT. En un fallo se lee el usuario con su propia sesión.
+    """
     try:
         payload = decode_token(token)
         subject: Optional[str] = payload.get("sub")
@@ -85,10 +161,15 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except JWTError:
         raise credentials_exc
 
-    user = get_user_by_identity(db, subject)
-    if not user or not _is_enabled(user):
+    principal = principal_cache.get(subject)
+    if principal is None:
+        principal = await run_in_session(_load_principal, subject)
+        if principal is None:
+            raise credentials_exc
+        principal_cache.put(subject, principal)
+    if not principal.is_active:
         raise credentials_exc
-    return user
+    return principal
 
 # ===== Role guard =====
 def require_role(*roles: Iterable) -> Callable:
@@ -104,14 +185,8 @@ def require_role(*roles: Iterable) -> Callable:
         else:
             accepted.add(str(r))
 
-    def _dep(current: User = Depends(get_current_user)) -> User:
-        raw_role = getattr(current, "role", None)
-        role_str = (
-            str(getattr(raw_role, "value", None))
-            if hasattr(raw_role, "value")
-            else (str(getattr(raw_role, "name", None)) if hasattr(raw_role, "name") else str(raw_role))
-        )
-        if not accepted or role_str in accepted or raw_role in roles:
+    async def _dep(current: Principal = Depends(get_current_user)) -> Principal:
+        if not accepted or current.role in accepted:
             return current
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Permisos insuficientes")
 
@@ -0,0 +1,358 @@
+# backend/app/bulk.py
+"""
+Importación/exportación masiva de productos (POST/GET /admin/products/...).
+
+Importación:
+- El cuerpo (CSV con encabezado o NDJSON) se lee en streaming; cada
+  IMPORT_CHUNK_SIZE filas se validan contra `ProductCreate` y se aplican en una
+  transacción propia (un fallo a mitad de archivo no revierte los bloques ya
+  confirmados: el reporte dice qué líneas fallaron).
+- Identidad de la fila: columna `id` si viene (debe existir), si no el nombre
+  exacto del producto; sin coincidencia se inserta. Dentro de un bloque, si una
+  fila se repite gana la última.
+- Postgres: COPY a una tabla temporal y un único INSERT ... ON CONFLICT (id).
+  Otros motores: UPDATE e INSERT en lote (executemany).
+
+Exportación: CSV o NDJSON por bloques desde un cursor del lado del servidor.
+"""
+import codecs
+import csv
+import io
+import json
+from datetime import datetime
+from typing import AsyncIterator, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import String, insert, select, text, update
+from sqlalchemy.orm import Session
+
+from .cache import catalog_cache
+from .config import settings
+from .database import SessionLocal
+from .models import Product
+from .schemas import ProductCreate
+from .serializers import dumps, product_row
+from . import assets, inventory, search, stats
+
+IMPORT_CHUNK_SIZE = 1000
+EXPORT_CHUNK_SIZE = 1000
+MAX_REPORTED_ERRORS = 1000
+
+FIELDS = tuple(ProductCreate.model_fields)
+EXPORT_FIELDS = ("id",) + FIELDS + ("created_at",)
+
+# Largo máximo de las columnas de texto (la BD rechazaría el bloque entero)
+_MAX_LENGTHS = {
+    c.name: c.type.length
+    for c in Product.__table__.columns
+    if isinstance(c.type, String) and c.type.length and c.name in FIELDS
+}
+
+# (línea, id existente o None, datos validados)
+Row = Tuple[int, Optional[int], dict]
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: list = []
+
+    def error(self, line: int, messages: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"line": line, "errors": messages})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": sorted(self.errors, key=lambda e: e["line"]),
+            "errorsTruncated": self.failed > len(self.errors),
+        }
+
+
+# =======================
+#   Lectura en streaming
+# =======================
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    buffer = ""
+    async for chunk in chunks:
+        buffer += decoder.decode(chunk)
+        *complete, buffer = buffer.split("\n")
+        for line in complete:
+            yield line + "\n"
+    buffer += decoder.decode(b"", final=True)
+    if buffer:
+        yield buffer
+
+
+async def csv_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, dict]]:
+    """(línea, fila) por cada registro CSV; soporta campos entre comillas con saltos de línea."""
+    header: Optional[list] = None
+    pending, start, line_no = "", 0, 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not pending:
+            start = line_no
+        pending += line
+        if pending.count('"') % 2:  # comilla abierta: el registro sigue en la próxima línea
+            continue
+        record, pending = pending, ""
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip().lower() for h in values]
+            missing = {"name", "price"} - set(header)
+            if missing:
+                raise ValueError(f"Faltan columnas en el encabezado CSV: {', '.join(sorted(missing))}")
+            continue
+        # Las celdas vacías no se envían: aplican los valores por defecto del esquema
+        yield start, {k: v for k, v in zip(header, values) if v != ""}
+    if pending.strip():
+        raise ValueError(f"Comillas sin cerrar desde la línea {start}")
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[Tuple[int, object]]:
+    line_no = 0
+    async for line in _lines(chunks):
+        line_no += 1
+        if not line.strip():
+            continue
+        try:
+            yield line_no, json.loads(line)
+        except ValueError:
+            yield line_no, None
+
+
+def validate(line: int, data, report: ImportReport) -> Optional[Row]:
+    """Valida una fila contra ProductCreate; registra el error y devuelve None si no pasa."""
+    if not isinstance(data, dict):
+        report.error(line, ["La línea no es un objeto JSON"])
+        return None
+
+    product_id = data.get("id")
+    if product_id in ("", None):
+        product_id = None
+    else:
+        try:
+            product_id = int(product_id)
+        except (TypeError, ValueError):
+            report.error(line, ["id: debe ser un entero"])
+            return None
+
+    try:
+        product = ProductCreate.model_validate({k: v for k, v in data.items() if k in FIELDS})
+    except ValidationError as exc:
+        report.error(line, [
+            f"{'.'.join(str(p) for p in e['loc'])}: {e['msg']}" for e in exc.errors()
+        ])
+        return None
+
+    values = product.model_dump()
+    values["image_url"] = assets.hashed_url(values["image_url"])
+    if values["description"] is None:
+        values["description"] = ""  # la columna es NOT NULL
+    too_long = [
+        f"{name}: máximo {length} caracteres"
+        for name, length in _MAX_LENGTHS.items()
+        if values.get(name) is not None and len(values[name]) > length
+    ]
+    if too_long:
+        report.error(line, too_long)
+        return None
+    return line, product_id, values
+
+
+def _dedupe(rows: List[Row], report: ImportReport) -> List[Row]:
+    """Una fila por producto dentro del bloque (gana la última)."""
+    latest: dict = {}
+    for row in rows:
+        line, product_id, values = row
+        key = ("id", product_id) if product_id is not None else ("name", values["name"])
+        previous = latest.get(key)
+        if previous is not None:
+            report.error(previous[0], [f"Fila repetida: se usa la línea {line}"])
+        latest[key] = row
+    return list(latest.values())
+
+
+# =======================
+#   Aplicar un bloque
+# =======================
+def apply_chunk(rows: List[Row], report: ImportReport) -> None:
+    """Aplica un bloque ya validado en su propia transacción (sesión sync)."""
+    rows = _dedupe(rows, report)
+    with SessionLocal() as db:
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                inserted, updated = _copy_upsert(db, rows, report)
+            else:
+                inserted, updated = _batch_upsert(db, rows, report)
+            search.touch(db)  # índice de búsqueda en memoria de todos los workers
+            db.commit()
+        except Exception as exc:
+            db.rollback()
+            for line, _, _ in rows:
+                report.error(line, [f"Error de base de datos: {exc.__class__.__name__}"])
+            return
+    catalog_cache.bump()
+    report.inserted += inserted
+    report.updated += updated
+
+
+def _batch_upsert(db: Session, rows: List[Row], report: ImportReport) -> Tuple[int, int]:
+    ids = {pid for _, pid, _ in rows if pid is not None}
+    names = {v["name"] for _, pid, v in rows if pid is None}
+    by_id, by_name = {}, {}
+    if ids or names:
+        for pid, name, stock, image_url, image_sizes in db.execute(
+            select(Product.id, Product.name, Product.stock, Product.image_url, Product.image_sizes).where(
+                Product.id.in_(ids) | Product.name.in_(names)
+            )
+        ):
+            by_id[pid] = (stock, image_url, image_sizes)
+            by_name.setdefault(name, pid)
+
+    inserts, updates, low_stock = [], [], 0
+    now = datetime.utcnow()
+    for line, pid, values in rows:
+        if pid is None:
+            pid = by_name.get(values["name"])
+        elif pid not in by_id:
+            report.error(line, [f"id: el producto {pid} no existe"])
+            continue
+        if pid is None:
+            inserts.append({**values, "created_at": now})
+            low_stock += int(stats.is_low_stock(values["stock"]))
+        else:
+            stock, image_url, image_sizes = by_id[pid]
+            # Miniaturas solo si la imagen no cambia
+            sizes = image_sizes if values["image_url"] == image_url else None
+            updates.append({**values, "id": pid, "image_sizes": sizes})
+            low_stock += stats.low_stock_delta(stock, values["stock"])
+
+    if updates:
+        db.execute(update(Product), updates)  # UPDATE por clave primaria en lote
+        inventory.unshard(db, [u["id"] for u in updates])  # el stock importado manda
+    if inserts:
+        db.execute(insert(Product), inserts)
+    stats.bump(db, products=len(inserts), low_stock_products=low_stock)
+    return len(inserts), len(updates)
+
+
+_STAGING_COLUMNS = ("line", "id") + FIELDS
+
+
+def _copy_upsert(db: Session, rows: List[Row], report: ImportReport) -> Tuple[int, int]:
+    db.execute(text(
+        "CREATE TEMP TABLE product_import ("
+        " line integer, id integer, name text, description text, price numeric(10,2),"
+        " stock integer, image_url text, category text, is_vegan boolean, is_gluten_free boolean"
+        ") ON COMMIT DROP"
+    ))
+
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for line, pid, values in rows:
+        writer.writerow([line, pid] + [values[f] for f in FIELDS])
+    buf.seek(0)
+    raw = db.connection().connection.driver_connection  # psycopg2
+    with raw.cursor() as cur:
+        cur.copy_expert(
+            # FORCE_NOT_NULL: en CSV la cadena vacía sin comillas sería NULL
+            f"COPY product_import ({', '.join(_STAGING_COLUMNS)}) FROM STDIN"
+            " WITH (FORMAT csv, FORCE_NOT_NULL (name, description, category))",
+            buf,
+        )
+
+    # Sin id: resolver por nombre exacto
+    db.execute(text(
+        "UPDATE product_import s SET id = p.id FROM products p"
+        " WHERE s.id IS NULL AND p.name = s.name"
+    ))
+    for line, pid in db.execute(text(
+        "DELETE FROM product_import s WHERE s.id IS NOT NULL"
+        " AND NOT EXISTS (SELECT 1 FROM products p WHERE p.id = s.id)"
+        " RETURNING s.line, s.id"
+    )):
+        report.error(line, [f"id: el producto {pid} no existe"])
+    # Dos filas sin id que resolvieron al mismo producto: gana la última
+    for line, pid in db.execute(text(
+        "DELETE FROM product_import s USING product_import t"
+        " WHERE s.id = t.id AND s.line < t.line RETURNING s.line, s.id"
+    )):
+        report.error(line, [f"Fila repetida del producto {pid}"])
+
+    inserted, new_low, old_low = db.execute(
+        text(
+            "SELECT count(*) FILTER (WHERE s.id IS NULL),"
+            " count(*) FILTER (WHERE s.stock <= :t),"
+            " count(p.id) FILTER (WHERE p.stock <= :t)"
+            " FROM product_import s LEFT JOIN products p ON p.id = s.id"
+        ),
+        {"t": settings.low_stock_threshold},
+    ).one()
+    total = db.scalar(text("SELECT count(*) FROM product_import"))
+
+    # El stock importado manda sobre el repartido en shards (ver app/inventory.py)
+    db.execute(text(
+        "DELETE FROM stock_shards WHERE product_id IN"
+        " (SELECT id FROM product_import WHERE id IS NOT NULL)"
+    ))
+
+    columns = ", ".join(FIELDS)
+    db.execute(
+        text(
+            f"INSERT INTO products (id, {columns}, created_at)"
+            f" SELECT COALESCE(s.id, nextval(pg_get_serial_sequence('products', 'id'))),"
+            f" {', '.join('s.' + f for f in FIELDS)}, :now"
+            f" FROM product_import s"
+            f" ON CONFLICT (id) DO UPDATE SET {', '.join(f'{f} = EXCLUDED.{f}' for f in FIELDS)},"
+            # Miniaturas solo si la imagen no cambia
+            f" image_sizes = CASE WHEN products.image_url IS NOT DISTINCT FROM EXCLUDED.image_url"
+            f" THEN products.image_sizes END"
+        ),
+        {"now": datetime.utcnow()},
+    )
+    stats.bump(db, products=inserted, low_stock_products=new_low - old_low)
+    return inserted, total - inserted
+
+
+# =======================
+#   Exportación
+# =======================
+def _export_rows(fields=EXPORT_FIELDS) -> Iterator[list]:
+    """Bloques de filas (por defecto id, campos, created_at) desde un cursor del lado del servidor."""
+    columns = [getattr(Product, f) for f in fields]
+    with SessionLocal() as db:
+        result = db.execute(
+            select(*columns).order_by(Product.id).execution_options(yield_per=EXPORT_CHUNK_SIZE)
+        )
+        for chunk in result.partitions():
+            yield chunk
+
+
+def export_csv() -> Iterator[str]:
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_FIELDS)
+    for chunk in _export_rows():
+        for row in chunk:
+            writer.writerow([v.isoformat() if isinstance(v, datetime) else v for v in row])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    yield buf.getvalue()
+
+
+def export_ndjson() -> Iterator[bytes]:
+    # Columnas en el orden de product_row: reutiliza el serializador precompilado
+    for chunk in _export_rows(product_row.fields):
+        yield b"".join(dumps(product_row.one(row)) + b"\n" for row in chunk)
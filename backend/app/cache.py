@@ -0,0 +1,146 @@
+# backend/app/cache.py
+"""
+Caché en proceso del catálogo (GET /products y GET /products/{id}).
+
+- Read-through: la clave son los parámetros normalizados de la consulta.
+- Versión del catálogo: los endpoints que escriben productos llaman a `bump()`,
+  que invalida todo. Una entrada calculada con una versión vieja se descarta.
+- Las ventas (órdenes, lotes flash, barrido de reservas) no invalidan por cada
+  unidad: solo cuando un producto se agota o vuelve a tener stock
+  (`availability_changed`). El número de `stock` cacheado puede ir atrasado
+  hasta CATALOG_CACHE_TTL; el "agotado / disponible" no.
+- LRU acotado + TTL como red de seguridad con varios workers (cada proceso
+  tiene su propia versión).
+- ETag fuerte = versión + hash del cuerpo, para responder 304 sin ir a la BD.
+
+`TTLCache` es el LRU genérico con expiración (p. ej. principal de auth).
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Hashable, Iterable, Optional
+
+from .config import settings
+
+
+@dataclass(frozen=True)
+class CachedBody:
+    body: bytes
+    etag: str
+    headers: tuple = ()  # headers extra a devolver (p. ej. X-Next-Cursor)
+
+
+class CatalogCache:
+    def __init__(self, max_size: int = 512, ttl: float = 30.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, CachedBody]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[CachedBody]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def make(self, version: int, body: bytes, headers: tuple = ()) -> CachedBody:
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        return CachedBody(body=body, etag=f'"v{version}-{digest}"', headers=headers)
+
+    def put(self, key: Hashable, version: int, value: CachedBody) -> None:
+        """Guarda solo si nadie cambió el catálogo mientras se calculaba `value`."""
+        with self._lock:
+            if version != self.version:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def bump(self) -> int:
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            return self.version
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "version": self.version,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+class TTLCache:
+    """LRU acotado con expiración por entrada (genérico, thread-safe)."""
+
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple[float, object]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, value) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+def availability_changed(changes: Iterable[tuple]) -> bool:
+    """`changes`: (stock antes, stock después). True si alguno cruzó el cero."""
+    return any((old > 0) != (new > 0) for old, new in changes)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+
+catalog_cache = CatalogCache(max_size=settings.catalog_cache_size, ttl=settings.catalog_cache_ttl)
@@ -1,3 +1,5 @@
+import os
+
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -12,14 +14,78 @@ class Settings(BaseSettings):
     postgres_user: str = Field(default="candy_user", alias="POSTGRES_USER")
     postgres_password: str = Field(default="candy_pass", alias="POSTGRES_PASSWORD")
 
+    # --- modo async (asyncpg): DB_ASYNC=true. Si no hay ASYNC_DATABASE_URL
+    #     se deriva de la URL sync cambiando el driver.
+    db_async: bool = Field(default=False, alias="DB_ASYNC")
+    async_database_url: str | None = Field(default=None, alias="ASYNC_DATABASE_URL")
+
+    # --- réplica de lectura (opcional): GETs de catálogo, historial y listados admin
+    replica_database_url: str | None = Field(default=None, alias="REPLICA_DATABASE_URL")
+    replica_max_lag_seconds: float = Field(default=5.0, alias="REPLICA_MAX_LAG_SECONDS")
+    replica_check_seconds: float = Field(default=2.0, alias="REPLICA_CHECK_SECONDS")
+    # Tras una orden, las lecturas de ese token van al primario durante este tiempo
+    replica_sticky_seconds: float = Field(default=15.0, alias="REPLICA_STICKY_SECONDS")
+
     jwt_secret: str = Field(default="change_me", alias="JWT_SECRET")
     # tu auth.py usa JWT_ALG, déjalo así:
     # jwt_algorithm: str = Field(default="HS256", alias="JWT_ALGORITHM")
 
+    # --- hashing de contraseñas (pool de procesos)
+    bcrypt_rounds: int = Field(default=12, alias="BCRYPT_ROUNDS")
+    hash_workers: int = Field(default_factory=lambda: max(1, min(4, os.cpu_count() or 1)), alias="HASH_WORKERS")
+    hash_queue_limit: int = Field(default=64, alias="HASH_QUEUE_LIMIT")
+
+    # --- subida de imágenes (miniaturas en un pool de procesos; 0 = un hilo del proceso)
+    upload_max_bytes: int = Field(default=10 * 1024 * 1024, alias="UPLOAD_MAX_BYTES")
+    image_workers: int = Field(default=1, alias="IMAGE_WORKERS")
+
     admin_email: str | None = Field(default=None, alias="ADMIN_EMAIL")
     admin_password: str | None = Field(default=None, alias="ADMIN_PASSWORD")
     admin_invite_code: str | None = Field(default=None, alias="ADMIN_INVITE_CODE")
 
+    # --- migraciones: al arrancar con el esquema atrasado, migrar (true) o fallar (false)
+    auto_migrate: bool = Field(default=True, alias="AUTO_MIGRATE")
+
+    # --- caché del catálogo (por proceso)
+    catalog_cache_size: int = Field(default=512, alias="CATALOG_CACHE_SIZE")
+    catalog_cache_ttl: float = Field(default=30.0, alias="CATALOG_CACHE_TTL")
+
+    # --- caché de usuarios autenticados (sub del JWT -> principal). Por proceso:
+    # en otros workers un cambio de rol/activo/borrado tarda hasta el TTL en verse
+    auth_cache_size: int = Field(default=10000, alias="AUTH_CACHE_SIZE")
+    auth_cache_ttl: float = Field(default=5.0, alias="AUTH_CACHE_TTL")
+
+    # --- contadores del dashboard admin
+    low_stock_threshold: int = Field(default=10, alias="LOW_STOCK_THRESHOLD")
+    stats_reconcile_minutes: int = Field(default=15, alias="STATS_RECONCILE_MINUTES")
+
+    # --- reservas del carrito (stock repartido en shards por producto)
+    cart_hold_minutes: float = Field(default=15.0, alias="CART_HOLD_MINUTES")
+    cart_sweep_seconds: float = Field(default=15.0, alias="CART_SWEEP_SECONDS")
+    stock_shards: int = Field(default=8, alias="STOCK_SHARDS")
+
+    # --- venta flash: órdenes de productos marcados, en lotes (un commit por lote)
+    flash_sale_batch_size: int = Field(default=200, alias="FLASH_SALE_BATCH_SIZE")
+    flash_sale_window_ms: float = Field(default=5.0, alias="FLASH_SALE_WINDOW_MS")
+    flash_sale_queue_limit: int = Field(default=2000, alias="FLASH_SALE_QUEUE_LIMIT")
+    flash_sale_timeout_seconds: float = Field(default=10.0, alias="FLASH_SALE_TIMEOUT_SECONDS")
+    flash_sale_refresh_seconds: float = Field(default=2.0, alias="FLASH_SALE_REFRESH_SECONDS")
+
+    # --- Idempotency-Key en POST /orders
+    idempotency_ttl_hours: int = Field(default=24, alias="IDEMPOTENCY_TTL_HOURS")
+    idempotency_cleanup_minutes: int = Field(default=30, alias="IDEMPOTENCY_CLEANUP_MINUTES")
+
+    # --- métricas Prometheus (GET /__metrics)
+    metrics_enabled: bool = Field(default=True, alias="METRICS_ENABLED")
+    # Con varios workers: directorio compartido donde cada proceso vuelca las suyas
+    metrics_multiproc_dir: str | None = Field(default=None, alias="METRICS_MULTIPROC_DIR")
+    metrics_flush_seconds: float = Field(default=5.0, alias="METRICS_FLUSH_SECONDS")
+
+    # --- perfilado de SQL por petición (depuración: Server-Timing, N+1, log lento)
+    sql_profiling: bool = Field(default=False, alias="SQL_PROFILING")
+    sql_slow_query_ms: float = Field(default=200.0, alias="SQL_SLOW_QUERY_MS")
+    sql_n_plus_one_threshold: int = Field(default=3, alias="SQL_N_PLUS_ONE_THRESHOLD")
+
     class Config:
         env_file = ".env"
         extra = "ignore"
@@ -1,6 +1,25 @@
-from sqlalchemy import create_engine
+import functools
+import inspect
+import logging
+import threading
+import time
+import typing
+from typing import Optional
+
+from fastapi import Depends, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.params import Depends as DependsParam
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import make_url
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from .cache import TTLCache
 from .config import settings
+from .metrics import (
+    TimedAsyncQueuePool, TimedAsyncReplicaQueuePool, TimedQueuePool, TimedReplicaQueuePool,
+    registry, watch_pool,
+)
+
+logger = logging.getLogger(__name__)
 
 # 1) Producción (Render/Neon): DATABASE_URL con sslmode=require
 if settings.database_url:
@@ -12,7 +31,10 @@ else:
         f"@{settings.postgres_host}:{settings.postgres_port}/{settings.postgres_db}"
     )
 
-engine = create_engine(DATABASE_URL, echo=False, future=True, pool_pre_ping=True)
+# Con métricas, el pool mide la espera de checkout (ver app/metrics.py)
+_pool_options = {"poolclass": TimedQueuePool} if settings.metrics_enabled else {}
+engine = create_engine(DATABASE_URL, echo=False, future=True, pool_pre_ping=True, **_pool_options)
+watch_pool("sync", engine.pool)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 class Base(DeclarativeBase):
@@ -24,3 +46,218 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ===== Modo async (DB_ASYNC=true) =====
+# El engine sync sigue existiendo para el arranque, jobs en segundo plano y
+# exportaciones en streaming; las dependencias de request usan asyncpg.
+def _async_url(url: str) -> str:
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend == "postgresql":
+        query = dict(u.query)
+        # asyncpg no entiende sslmode (Neon/Render): usa ssl
+        if "sslmode" in query:
+            query["ssl"] = query.pop("sslmode")
+        u = u.set(drivername="postgresql+asyncpg", query=query)
+    elif backend == "sqlite":
+        u = u.set(drivername="sqlite+aiosqlite")  # requiere aiosqlite (solo local)
+    return u.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = settings.async_database_url or _async_url(DATABASE_URL)
+
+async_engine = None
+AsyncSessionLocal = None
+if settings.db_async:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(
+        ASYNC_DATABASE_URL, echo=False, pool_pre_ping=True,
+        **({"poolclass": TimedAsyncQueuePool} if settings.metrics_enabled else {}),
+    )
+    watch_pool("async", async_engine.pool)
+    # expire_on_commit=False: FastAPI serializa la respuesta fuera del greenlet,
+    # así que los atributos deben seguir cargados tras el commit.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ===== Réplica de lectura (REPLICA_DATABASE_URL, opcional) =====
+# Los GET de solo lectura usan `get_read_db`: van a la réplica si su retraso
+# (medido en segundo plano) es <= REPLICA_MAX_LAG_SECONDS y el token no hizo
+# una orden hace menos de REPLICA_STICKY_SECONDS (read-your-writes); si no,
+# al primario. Escrituras y FOR UPDATE siguen siempre en get_db.
+replica_engine = None
+ReplicaSessionLocal = None
+AsyncReplicaSessionLocal = None
+if settings.replica_database_url:
+    replica_engine = create_engine(
+        settings.replica_database_url, echo=False, future=True, pool_pre_ping=True,
+        **({"poolclass": TimedReplicaQueuePool} if settings.metrics_enabled else {}),
+    )
+    watch_pool("replica", replica_engine.pool)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if settings.db_async:
+        async_replica_engine = create_async_engine(
+            _async_url(settings.replica_database_url), echo=False, pool_pre_ping=True,
+            **({"poolclass": TimedAsyncReplicaQueuePool} if settings.metrics_enabled else {}),
+        )
+        watch_pool("async_replica", async_replica_engine.pool)
+        AsyncReplicaSessionLocal = async_sessionmaker(
+            async_replica_engine, autoflush=False, expire_on_commit=False
+        )
+
+# Retraso de replay; 0 si ya aplicó todo lo recibido (un primario ocioso no
+# avanza pg_last_xact_replay_timestamp y parecería retrasado)
+_LAG_SQL = text(
+    "SELECT CASE"
+    " WHEN NOT pg_is_in_recovery() THEN 0"
+    " WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0"
+    " ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+    " END"
+)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.lag: Optional[float] = None  # None: sin medir todavía o réplica caída
+        self._pinned = TTLCache(max_size=10_000, ttl=settings.replica_sticky_seconds)
+
+    def pin(self, request: Request) -> None:
+        """Las próximas lecturas de este token van al primario (por proceso)."""
+        token = request.headers.get("authorization")
+        if token and replica_engine is not None:
+            self._pinned.put(token, True)
+
+    def use_replica(self, request: Request) -> bool:
+        if replica_engine is None:
+            return False
+        if self.lag is None or self.lag > settings.replica_max_lag_seconds:
+            reason = "lag"
+        elif self._pinned.get(request.headers.get("authorization")):
+            reason = "sticky"
+        else:
+            registry.inc("db_read_routing_total", (("target", "replica"), ("reason", "ok")))
+            return True
+        registry.inc("db_read_routing_total", (("target", "primary"), ("reason", reason)))
+        return False
+
+    def measure(self) -> float:
+        with replica_engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                conn.execute(text("SELECT 1"))
+                return 0.0
+            return float(conn.scalar(_LAG_SQL))
+
+    def check(self) -> None:
+        try:
+            lag = self.measure()
+        except Exception as exc:
+            if self.lag is not None:
+                logger.warning("Réplica de lectura no disponible, se lee del primario: %s", exc)
+            self.lag = None
+            return
+        if lag > settings.replica_max_lag_seconds and (self.lag or 0) <= settings.replica_max_lag_seconds:
+            logger.warning("Réplica con %.1f s de retraso, se lee del primario", lag)
+        self.lag = lag
+
+
+replica = ReplicaRouter()
+
+
+def _replica_loop(interval_seconds: float) -> None:
+    while True:
+        replica.check()
+        time.sleep(interval_seconds)
+
+
+def start_replica_job() -> None:
+    if replica_engine is None:
+        return
+    registry.collector(lambda: [
+        ("db_replica_lag_seconds", (), -1 if replica.lag is None else replica.lag),
+    ])
+    threading.Thread(
+        target=_replica_loop, args=(settings.replica_check_seconds,), name="replica-lag", daemon=True
+    ).start()
+
+
+def get_read_db(request: Request):
+    db = (ReplicaSessionLocal if replica.use_replica(request) else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_read_db(request: Request):
+    factory = AsyncReplicaSessionLocal if replica.use_replica(request) else AsyncSessionLocal
+    async with factory() as db:
+        yield db
+
+# Para endpoints `async def` que hacen trabajo no-BD pesado (p. ej. bcrypt):
+# la sesión del modo activo y `run_db` para ejecutar los tramos de BD.
+get_request_db = get_async_db if settings.db_async else get_db
+
+async def run_db(db, fn, *args):
+    """Ejecuta `fn(session, *args)`: run_sync en modo async, threadpool en modo sync."""
+    if settings.db_async:
+        return await db.run_sync(fn, *args)
+    return await run_in_threadpool(fn, db, *args)
+
+async def run_in_session(fn, *args):
+    """Como `run_db` pero abre (y cierra) su propia sesión: para BD perezosa."""
+    if settings.db_async:
+        async with AsyncSessionLocal() as db:
+            return await db.run_sync(fn, *args)
+
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args)
+
+    return await run_in_threadpool(call)
+
+_ASYNC_DEPENDENCIES = {get_db: get_async_db, get_read_db: get_async_read_db}
+
+def db_endpoint(fn):
+    """
+    En modo sync devuelve `fn` tal cual. En modo async convierte el endpoint (o
+    dependencia) que recibe `db: Session = Depends(get_db)` (o get_read_db) en una corrutina
+    que recibe una AsyncSession y ejecuta el MISMO cuerpo con `run_sync`:
+    la E/S va por asyncpg sin ocupar un hilo del threadpool.
+    """
+    if not settings.db_async:
+        return fn
+
+    hints = typing.get_type_hints(fn, include_extras=True)
+    sig = inspect.signature(fn)
+    db_names = [
+        name for name, p in sig.parameters.items()
+        if isinstance(p.default, DependsParam) and p.default.dependency in _ASYNC_DEPENDENCIES
+    ]
+    if not db_names:
+        return fn
+
+    params = []
+    for name, p in sig.parameters.items():
+        p = p.replace(annotation=hints.get(name, p.annotation))
+        if name in db_names:
+            p = p.replace(annotation=typing.Any, default=Depends(_ASYNC_DEPENDENCIES[p.default.dependency]))
+        params.append(p)
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+        adb = kwargs[db_names[0]]
+
+        def call(session):
+            kwargs.update({name: session for name in db_names})
+            return fn(*args, **kwargs)
+
+        return await adb.run_sync(call)
+
+    wrapper.__signature__ = sig.replace(
+        parameters=params, return_annotation=hints.get("return", sig.return_annotation)
+    )
+    return wrapper
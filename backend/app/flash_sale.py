@@ -0,0 +1,274 @@
+# backend/app/flash_sale.py
+"""
+Venta flash: las órdenes de productos marcados (`Product.flash_sale`) no
+compiten por el lock de la fila una por una.
+
+- POST /orders con algún producto marcado encola la petición en este proceso
+  y espera su resultado (FLASH_SALE_TIMEOUT_SECONDS; cola llena => 503).
+- Un único hilo vacía la cola en lotes de hasta FLASH_SALE_BATCH_SIZE (espera
+  FLASH_SALE_WINDOW_MS a que el lote se llene): un FOR UPDATE de los productos
+  del lote, asignación de stock en orden de llegada, un UPDATE de stock, un
+  INSERT de órdenes y otro de items, y UN commit para todo el lote.
+- Cada petición recibe su OrderOut o su error (404, o 400 si se agotó).
+
+El lote es por proceso: con varios workers hay un lote por worker, y el lock
+se toma una vez por lote en vez de una vez por orden.
+"""
+import asyncio
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import case, insert, select, update
+from sqlalchemy.orm import Session
+
+from .cache import availability_changed, catalog_cache
+from .config import settings
+from .database import SessionLocal
+from .metrics import registry
+from .models import Order, OrderItem, Product
+from .schemas import OrderItemOut, OrderOut
+from . import idempotency, inventory, sales, stats
+
+logger = logging.getLogger(__name__)
+
+
+# =======================
+#   Productos marcados
+# =======================
+_flagged: FrozenSet[int] = frozenset()
+_flagged_until = 0.0
+
+
+def flagged(db: Session) -> FrozenSet[int]:
+    """Ids con venta flash (se relee cada FLASH_SALE_REFRESH_SECONDS)."""
+    global _flagged, _flagged_until
+    if time.monotonic() >= _flagged_until:
+        _flagged = frozenset(db.scalars(select(Product.id).where(Product.flash_sale == True)))
+        _flagged_until = time.monotonic() + settings.flash_sale_refresh_seconds
+    return _flagged
+
+
+def invalidate() -> None:
+    """Relee los marcados en la próxima orden (tras editar un producto en este proceso)."""
+    global _flagged_until
+    _flagged_until = 0.0
+
+
+def applies(db: Session, quantities: Dict[int, int]) -> bool:
+    marked = flagged(db)
+    return bool(marked) and any(product_id in marked for product_id in quantities)
+
+
+# =======================
+#   Cola y lotes
+# =======================
+@dataclass
+class _Pending:
+    user_id: int
+    quantities: Dict[int, int]
+    idempotency_key: Optional[str] = None
+    future: Future = field(default_factory=Future)
+
+
+_queue: "queue.Queue[_Pending]" = queue.Queue(maxsize=settings.flash_sale_queue_limit)
+_worker: Optional[threading.Thread] = None
+_worker_lock = threading.Lock()
+
+
+def _ensure_worker() -> None:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            registry.collector(lambda: [("flash_sale_queue_depth", (), _queue.qsize())])
+            _worker = threading.Thread(target=_worker_loop, name="flash-sale", daemon=True)
+            _worker.start()
+
+
+def submit(user_id: int, quantities: Dict[int, int], idempotency_key: Optional[str] = None) -> Future:
+    """Encola la orden; el Future resuelve a OrderOut o a la HTTPException de esa orden."""
+    _ensure_worker()
+    pending = _Pending(user_id=user_id, quantities=quantities, idempotency_key=idempotency_key)
+    try:
+        _queue.put_nowait(pending)
+    except queue.Full:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Servicio ocupado, reintenta en unos segundos",
+            headers={"Retry-After": "1"},
+        )
+    return pending.future
+
+
+def _timed_out(detail: str = "La venta flash está saturada, reintenta en unos segundos") -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=detail,
+        headers={"Retry-After": "1"},
+    )
+
+
+async def place(user_id: int, quantities: Dict[int, int], idempotency_key: Optional[str] = None) -> OrderOut:
+    """
+    Encola la orden y espera su lote sin ocupar un hilo. Si vence
+    FLASH_SALE_TIMEOUT_SECONDS antes de entrar a un lote se cancela (503); si ya
+    está en uno se espera como mucho otro tanto a su commit y luego 503 (el lote
+    puede confirmarla igual: reintentar con la misma Idempotency-Key la devuelve).
+    """
+    future = submit(user_id, quantities, idempotency_key)
+    waiter = asyncio.wrap_future(future)
+    timeout = settings.flash_sale_timeout_seconds
+    try:
+        return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+    except asyncio.TimeoutError:
+        if future.cancel():  # todavía no entró a un lote: no se creará
+            raise _timed_out()
+    try:
+        return await asyncio.wait_for(asyncio.shield(waiter), timeout)
+    except asyncio.TimeoutError:
+        raise _timed_out("La venta flash no confirmó la orden a tiempo; reintenta con la misma Idempotency-Key")
+
+
+def _worker_loop() -> None:
+    while True:
+        batch = [_queue.get()]
+        deadline = time.monotonic() + settings.flash_sale_window_ms / 1000
+        while len(batch) < settings.flash_sale_batch_size:
+            try:
+                batch.append(_queue.get(timeout=max(0.0, deadline - time.monotonic())))
+            except queue.Empty:
+                break
+        # Las que el llamador canceló por timeout no se procesan
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if batch:
+            _run_batch(batch)
+
+
+def _run_batch(batch: List[_Pending]) -> None:
+    registry.observe("flash_sale_batch_size", (), len(batch))
+    try:
+        with SessionLocal() as db:
+            results = process_batch(db, batch)
+    except Exception as exc:
+        logger.exception("Falló un lote de venta flash (%d órdenes)", len(batch))
+        for pending in batch:
+            pending.future.set_exception(exc)
+        return
+    for pending, result in zip(batch, results):
+        if isinstance(result, Exception):
+            pending.future.set_exception(result)
+        else:
+            pending.future.set_result(result)
+
+
+def process_batch(db: Session, batch: List[_Pending]) -> list:
+    """Procesa el lote en una transacción; devuelve OrderOut o HTTPException por orden."""
+    ids = sorted({product_id for pending in batch for product_id in pending.quantities})
+    try:
+        # Un solo lock para todo el lote (en orden de id: sin deadlocks con POST /orders)
+        products = {
+            row.id: row
+            for row in db.execute(
+                select(Product.id, Product.name, Product.price, Product.stock, Product.category)
+                .where(Product.id.in_(ids))
+                .order_by(Product.id)
+                .with_for_update()
+            )
+        }
+        # Con las filas bloqueadas ninguna reserva puede crear o borrar shards
+        sharded = inventory.sharded_ids(db, products)
+        available = {pid: p.stock for pid, p in products.items() if pid not in sharded}
+        available.update(inventory.lock_shards(db, sharded))
+
+        # Asignación en orden de llegada: cada orden entra completa o no entra
+        results: list = [None] * len(batch)
+        accepted: List[int] = []
+        for i, pending in enumerate(batch):
+            missing = next((pid for pid in pending.quantities if pid not in products), None)
+            if missing is not None:
+                results[i] = HTTPException(status_code=404, detail=f"Producto {missing} no existe")
+                continue
+            short = next((pid for pid, qty in pending.quantities.items() if available[pid] < qty), None)
+            if short is not None:
+                results[i] = HTTPException(
+                    status_code=400, detail=f"Stock insuficiente para {products[short].name}"
+                )
+                continue
+            for pid, qty in pending.quantities.items():
+                available[pid] -= qty
+            accepted.append(i)
+        if not accepted:
+            db.rollback()
+            return results
+
+        now = datetime.utcnow()
+        order_ids = db.scalars(
+            insert(Order).returning(Order.id, sort_by_parameter_order=True),
+            [{"user_id": batch[i].user_id, "status": "CREATED", "created_at": now} for i in accepted],
+        ).all()
+
+        sold: Dict[int, int] = {}
+        item_rows = []
+        revenue = Decimal("0")
+        for i, order_id in zip(accepted, order_ids):
+            items_out = []
+            for pid, qty in batch[i].quantities.items():
+                product = products[pid]
+                sold[pid] = sold.get(pid, 0) + qty
+                item_rows.append({
+                    "order_id": order_id, "product_id": pid, "quantity": qty, "unit_price": float(product.price),
+                })
+                items_out.append(OrderItemOut(
+                    product_id=pid, quantity=qty, unit_price=float(product.price), product_name=product.name,
+                ))
+                revenue += Decimal(str(float(product.price))) * qty
+            results[i] = OrderOut(id=order_id, created_at=now, status="CREATED", items=items_out)
+        db.execute(insert(OrderItem), item_rows)
+
+        # Un UPDATE de stock para todo el lote; los shards ya están bloqueados
+        plain = {pid: qty for pid, qty in sold.items() if pid not in sharded}
+        if plain:
+            db.execute(
+                update(Product)
+                .where(Product.id.in_(list(plain)))
+                .values(stock=Product.stock - case(plain, value=Product.id))
+                .execution_options(synchronize_session=False)
+            )
+        for pid in sorted(sold.keys() & sharded):
+            inventory.take(db, pid, sold[pid])
+
+        changes = [(products[pid].stock, products[pid].stock - qty) for pid, qty in plain.items()]
+        stats.bump(
+            db,
+            orders=len(accepted),
+            revenue=revenue,
+            low_stock_products=sum(stats.low_stock_delta(old, new) for old, new in changes),
+        )
+        sales.record(db, [
+            (now, [
+                (pid, products[pid].name, products[pid].category, qty, products[pid].price)
+                for pid, qty in batch[i].quantities.items()
+            ])
+            for i in accepted
+        ])
+        for i in accepted:
+            key = batch[i].idempotency_key
+            if key:
+                out = results[i]
+                idempotency.complete(db, batch[i].user_id, key, out.id, out.model_dump_json())
+
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    if availability_changed(changes):
+        catalog_cache.bump()
+    return results
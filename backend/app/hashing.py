@@ -0,0 +1,139 @@
+# backend/app/hashing.py
+"""
+Hash/verificación de contraseñas fuera del hilo de la petición.
+
+bcrypt es CPU puro: se ejecuta en un ProcessPoolExecutor acotado (HASH_WORKERS).
+Si hay más de HASH_QUEUE_LIMIT operaciones pendientes se responde 503 en vez
+de dejar crecer la latencia sin límite. HASH_WORKERS=0 hashea en línea.
+
+Este módulo se importa en los procesos del pool: no debe importar la app.
+"""
+import asyncio
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, status
+from passlib.context import CryptContext
+from passlib.exc import UnknownHashError
+
+from .config import settings
+
+# Acepta hashes legacy además de bcrypt (evita UnknownHashError).
+# deprecated="auto": todo lo que no sea bcrypt (o bcrypt con menos rondas
+# que BCRYPT_ROUNDS) se marca para re-hash al iniciar sesión.
+pwd_context = CryptContext(
+    schemes=["bcrypt", "pbkdf2_sha256", "sha256_crypt", "argon2", "plaintext"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.bcrypt_rounds,
+    bcrypt__min_rounds=settings.bcrypt_rounds,
+)
+
+
+# ===== Funciones que corren en el pool =====
+def _verify(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+    """(coincide, necesita re-hash)."""
+    if hashed_password is None:
+        return False, False
+    try:
+        ok = pwd_context.verify(plain_password, hashed_password)
+    except (UnknownHashError, ValueError):
+        # Compatibilidad: algunos datos antiguos pueden tener password en texto
+        # plano. Un hash mal formado de otro esquema no coincide nunca (si no,
+        # bastaría con enviar el propio hash como contraseña).
+        if _scheme(hashed_password) != "plaintext":
+            return False, False
+        ok = hashed_password == plain_password
+        return ok, ok
+    return ok, ok and pwd_context.needs_update(hashed_password)
+
+
+def _scheme(hashed_password: str) -> Optional[str]:
+    try:
+        return pwd_context.identify(hashed_password)
+    except (UnknownHashError, ValueError):
+        return None
+
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+# ===== Pool acotado =====
+_pool: Optional[ProcessPoolExecutor] = None
+_pending = 0
+_lock = threading.Lock()
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if settings.hash_workers <= 0:
+        return None
+    with _lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=settings.hash_workers)
+        return _pool
+
+
+def _done(_: Future) -> None:
+    global _pending
+    with _lock:
+        _pending -= 1
+
+
+def _submit(fn, *args) -> Future:
+    global _pending
+    pool = _get_pool()
+    if pool is None:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except Exception as exc:
+            fut.set_exception(exc)
+        return fut
+
+    with _lock:
+        if _pending >= settings.hash_queue_limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Servicio ocupado, reintenta en unos segundos",
+                headers={"Retry-After": "1"},
+            )
+        _pending += 1
+    try:
+        fut = pool.submit(fn, *args)
+    except Exception:
+        _done(None)
+        raise
+    fut.add_done_callback(_done)
+    return fut
+
+
+def pending() -> int:
+    return _pending
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ===== API =====
+def verify_password_sync(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+    return _submit(_verify, plain_password, hashed_password).result()
+
+
+def hash_password_sync(password: str) -> str:
+    return _submit(_hash, password).result()
+
+
+async def verify_password_async(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, bool]:
+    """No ocupa hilo del threadpool ni bloquea el event loop mientras bcrypt trabaja."""
+    return await asyncio.wrap_future(_submit(_verify, plain_password, hashed_password))
+
+
+async def hash_password_async(password: str) -> str:
+    return await asyncio.wrap_future(_submit(_hash, password))
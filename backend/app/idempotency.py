@@ -0,0 +1,217 @@
+# backend/app/idempotency.py
+"""
+Soporte de `Idempotency-Key` para POST /orders.
+
+Flujo:
+1. `begin()` (o `begin_async()`) reclama la clave insertando una fila IN_PROGRESS (única por
+   usuario + clave). Si ya existe y está DONE devuelve la respuesta guardada;
+   si está en curso espera a que termine en vez de competir con ella.
+2. `complete()` guarda la respuesta en la MISMA transacción que crea la orden.
+3. `release()` borra la reclamación si la orden falló, para poder reintentar.
+
+Las filas expiran (IDEMPOTENCY_TTL_HOURS) y un hilo las purga periódicamente.
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal, run_db
+from .models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IN_PROGRESS = "IN_PROGRESS"
+DONE = "DONE"
+
+# Resultado de `claim()`
+CLAIMED = "claimed"
+REPLAY = "replay"
+WAIT = "wait"
+
+MAX_KEY_LENGTH = 255
+WAIT_TIMEOUT_SECONDS = 10.0   # cuánto espera un duplicado a la petición en curso
+STALE_AFTER_SECONDS = 60.0    # una reclamación más vieja se considera abandonada
+
+# Peticiones en curso en este proceso: los duplicados locales esperan el evento
+# en vez de sondear la BD (entre procesos se sondea).
+_inflight: dict = {}
+_inflight_lock = threading.Lock()
+
+
+def request_fingerprint(raw: str) -> str:
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def claim(db: Session, user_id: int, key: str, request_hash: str) -> Tuple[str, Optional[str]]:
+    """
+    Un intento de reclamar la clave. Devuelve (CLAIMED, None), (REPLAY, cuerpo)
+    o (WAIT, None) si otra petición con la misma clave sigue en curso.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key demasiado larga")
+
+    while True:
+        row = db.execute(
+            select(
+                IdempotencyKey.id,
+                IdempotencyKey.request_hash,
+                IdempotencyKey.status,
+                IdempotencyKey.response_body,
+                IdempotencyKey.created_at,
+                IdempotencyKey.expires_at,
+            ).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).first()
+        now = datetime.utcnow()
+
+        abandoned = (
+            row is not None
+            and row.status == IN_PROGRESS
+            and row.created_at < now - timedelta(seconds=STALE_AFTER_SECONDS)
+        )
+        if row is None or row.expires_at <= now or abandoned:
+            if row is not None:
+                db.execute(delete(IdempotencyKey).where(IdempotencyKey.id == row.id))
+            db.add(IdempotencyKey(
+                user_id=user_id,
+                key=key,
+                request_hash=request_hash,
+                status=IN_PROGRESS,
+                created_at=now,
+                expires_at=now + timedelta(hours=settings.idempotency_ttl_hours),
+            ))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()  # otro la reclamó primero: volver a leer
+                continue
+            with _inflight_lock:
+                _inflight[(user_id, key)] = threading.Event()
+            return CLAIMED, None
+
+        if row.request_hash != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key reutilizada con otro contenido",
+            )
+        if row.status == DONE:
+            return REPLAY, row.response_body
+
+        # En curso: terminar la transacción de lectura antes de esperar
+        db.rollback()
+        return WAIT, None
+
+
+def _in_flight_conflict() -> HTTPException:
+    return HTTPException(
+        status_code=409,
+        detail="Hay una petición en curso con esta Idempotency-Key",
+    )
+
+
+def begin(db: Session, user_id: int, key: str, request_hash: str) -> Optional[str]:
+    """
+    Devuelve None si esta petición reclamó la clave (debe procesar la orden),
+    o el cuerpo JSON guardado si la clave ya se completó.
+    """
+    deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+    delay = 0.05
+    while True:
+        state, body = claim(db, user_id, key, request_hash)
+        if state == CLAIMED:
+            return None
+        if state == REPLAY:
+            return body
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise _in_flight_conflict()
+        with _inflight_lock:
+            event = _inflight.get((user_id, key))
+        if event is not None:
+            event.wait(min(remaining, STALE_AFTER_SECONDS))
+        else:
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, 0.5)
+
+
+async def begin_async(db, user_id: int, key: str, request_hash: str) -> Optional[str]:
+    """Igual que `begin` (sesión de `get_request_db`): espera sin bloquear el event loop."""
+    deadline = time.monotonic() + WAIT_TIMEOUT_SECONDS
+    delay = 0.05
+    while True:
+        state, body = await run_db(db, claim, user_id, key, request_hash)
+        if state == CLAIMED:
+            return None
+        if state == REPLAY:
+            return body
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise _in_flight_conflict()
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * 2, 0.5)
+
+
+def complete(db: Session, user_id: int, key: str, order_id: int, body: str) -> None:
+    """Guarda la respuesta; se confirma junto con la orden."""
+    db.execute(
+        update(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .values(status=DONE, response_body=body, order_id=order_id)
+        .execution_options(synchronize_session=False)
+    )
+
+
+def release(db: Session, user_id: int, key: str, succeeded: bool) -> None:
+    """Despierta a los duplicados locales; si la orden falló borra la reclamación."""
+    try:
+        if not succeeded:
+            db.execute(
+                delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id,
+                    IdempotencyKey.key == key,
+                    IdempotencyKey.status == IN_PROGRESS,
+                )
+            )
+            db.commit()
+    finally:
+        with _inflight_lock:
+            event = _inflight.pop((user_id, key), None)
+        if event is not None:
+            event.set()
+
+
+# =======================
+#   Limpieza
+# =======================
+def purge_expired(db: Session) -> int:
+    result = db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= datetime.utcnow()))
+    db.commit()
+    return result.rowcount or 0
+
+
+def _cleanup_loop(interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            with SessionLocal() as db:
+                purge_expired(db)
+        except Exception:
+            logger.exception("No se pudieron purgar las Idempotency-Key expiradas")
+
+
+def start_cleanup_job() -> None:
+    interval = settings.idempotency_cleanup_minutes * 60
+    if interval <= 0:
+        return
+    threading.Thread(target=_cleanup_loop, args=(interval,), name="idempotency-cleanup", daemon=True).start()
@@ -0,0 +1,323 @@
+# backend/app/images.py
+"""
+Subida de imágenes de producto y miniaturas.
+
+- `receive()` lee el cuerpo de la petición en streaming (multipart/form-data
+  con el campo `file`, o el binario crudo con Content-Type image/*) y lo
+  escribe a disco por bloques: nunca está entero en memoria. Calcula el
+  sha256 al vuelo y corta con 413 al pasar UPLOAD_MAX_BYTES.
+- El original queda en `static/uploads/<product_id>/<sha256[:12]>.<ext>`
+  (nombre con hash: se sirve como inmutable).
+- `schedule()` genera las variantes de SIZES (WEBP, lado mayor en px) en un
+  ProcessPoolExecutor (IMAGE_WORKERS; con 0, en un hilo aparte, nunca en el
+  event loop) y al terminar guarda sus URLs en
+  `Product.image_sizes`, solo si la imagen del producto no cambió mientras.
+
+Sin Pillow (opcional) se aceptan igual las subidas y `image_sizes` queda vacío.
+Este módulo se importa en los procesos del pool: no debe importar la app.
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+
+try:  # opcional: sin Pillow no hay miniaturas
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+UPLOADS = "uploads"
+UPLOAD_DIR = Path(__file__).resolve().parent / "static" / UPLOADS
+UPLOAD_URL = f"/static/{UPLOADS}"
+
+# Variante -> lado mayor en px (nunca se agranda el original)
+SIZES = {"thumb": 160, "card": 480}
+WEBP_QUALITY = 80
+MAX_PIXELS = 40_000_000
+
+# Firmas de los formatos aceptados (SVG no: puede llevar scripts)
+_SIGNATURES = (
+    (b"\xff\xd8\xff", "jpg"),
+    (b"\x89PNG\r\n\x1a\n", "png"),
+    (b"GIF87a", "gif"),
+    (b"GIF89a", "gif"),
+)
+
+
+def sniff(head: bytes) -> Optional[str]:
+    """Extensión según los primeros bytes, o None si no es una imagen aceptada."""
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "webp"
+    for signature, extension in _SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+# =======================
+#   Recepción en streaming
+# =======================
+class _Sink:
+    """Archivo temporal + sha256 + límite de tamaño; los bloques se escriben en el threadpool."""
+
+    def __init__(self):
+        UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+        fd, name = tempfile.mkstemp(prefix=".upload-", dir=UPLOAD_DIR)
+        self.file = os.fdopen(fd, "wb")
+        self.path = Path(name)
+        self.sha = hashlib.sha256()
+        self.size = 0
+        self.head = b""
+        self.pending: list = []
+
+    def add(self, data: bytes) -> None:
+        self.size += len(data)
+        if self.size > settings.upload_max_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"La imagen supera {settings.upload_max_bytes} bytes",
+            )
+        if len(self.head) < 16:
+            self.head += data[:16]
+        self.sha.update(data)
+        self.pending.append(data)
+
+    async def drain(self) -> None:
+        if self.pending:
+            data, self.pending = b"".join(self.pending), []
+            await run_in_threadpool(self.file.write, data)
+
+    def discard(self) -> None:
+        self.file.close()
+        self.path.unlink(missing_ok=True)
+
+
+def _multipart_parser(content_type: str, sink: _Sink):
+    from multipart.multipart import MultipartParser, parse_options_header
+
+    _, options = parse_options_header(content_type)
+    boundary = options.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="Falta el boundary de multipart")
+
+    state = {"field": b"", "value": b"", "headers": {}, "is_file": False, "found": False}
+
+    def on_part_begin():
+        state["headers"] = {}
+
+    def on_header_field(data, start, end):
+        state["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        state["value"] += data[start:end]
+
+    def on_header_end():
+        state["headers"][state["field"].lower()] = state["value"]
+        state["field"], state["value"] = b"", b""
+
+    def on_headers_finished():
+        _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+        # Solo el primer campo `file`; el resto del formulario se ignora
+        state["is_file"] = disposition.get(b"name") == b"file" and not state["found"]
+        state["found"] = state["found"] or state["is_file"]
+
+    def on_part_data(data, start, end):
+        if state["is_file"]:
+            sink.add(data[start:end])
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+        "on_part_data": on_part_data,
+    })
+    return parser, state
+
+
+async def receive(request: Request) -> Tuple[Path, str, str]:
+    """Guarda el cuerpo en un temporal de UPLOAD_DIR; devuelve (ruta, sha256[:12], extensión)."""
+    content_type = request.headers.get("content-type", "")
+    sink = _Sink()
+    try:
+        if content_type.startswith("multipart/form-data"):
+            parser, state = _multipart_parser(content_type, sink)
+            async for chunk in request.stream():
+                parser.write(chunk)
+                await sink.drain()
+            parser.finalize()
+            if not state["found"]:
+                raise HTTPException(status_code=400, detail="Falta el campo 'file'")
+        else:
+            async for chunk in request.stream():
+                sink.add(chunk)
+                await sink.drain()
+        await sink.drain()
+        await run_in_threadpool(sink.file.close)
+
+        extension = sniff(sink.head)
+        if extension is None:
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail="Formato no soportado (JPEG, PNG, WEBP o GIF)",
+            )
+        if Image is not None:
+            await run_in_threadpool(_check_dimensions, sink.path)
+    except BaseException:
+        sink.discard()
+        raise
+    return sink.path, sink.sha.hexdigest()[:12], extension
+
+
+def _check_dimensions(path: Path) -> None:
+    try:
+        with Image.open(path) as image:  # solo lee el encabezado
+            width, height = image.size
+    except Exception:
+        raise HTTPException(status_code=400, detail="La imagen está dañada")
+    if width * height > MAX_PIXELS:
+        raise HTTPException(status_code=400, detail=f"La imagen supera {MAX_PIXELS} píxeles")
+
+
+def store(tmp_path: Path, product_id: int, digest: str, extension: str) -> str:
+    """Mueve el temporal a su ruta definitiva; devuelve la URL del original."""
+    directory = UPLOAD_DIR / str(product_id)
+    directory.mkdir(parents=True, exist_ok=True)
+    os.replace(tmp_path, directory / f"{digest}.{extension}")
+    return f"{UPLOAD_URL}/{product_id}/{digest}.{extension}"
+
+
+def path_for(url: str) -> Optional[Path]:
+    """Ruta en disco de una URL de /static/uploads (None si no es una subida)."""
+    if not url or not url.startswith(UPLOAD_URL + "/"):
+        return None
+    return UPLOAD_DIR / url[len(UPLOAD_URL) + 1:]
+
+
+# =======================
+#   Variantes (en el pool)
+# =======================
+def resize(source: str) -> Dict[str, str]:
+    """Escribe `<hash>.<variante>.webp` junto al original; devuelve variante -> nombre de archivo."""
+    source_path = Path(source)
+    digest = source_path.name.split(".")[0]
+    names: Dict[str, str] = {}
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "P") else "RGB")
+        for variant, edge in SIZES.items():
+            name = f"{digest}.{variant}.webp"
+            target = source_path.with_name(name)
+            if not target.exists():  # mismo hash => misma variante
+                copy = image.copy()
+                copy.thumbnail((edge, edge), Image.LANCZOS)
+                tmp = target.with_name(f".{name}.tmp")
+                copy.save(tmp, "WEBP", quality=WEBP_QUALITY, method=4)
+                os.replace(tmp, target)
+            names[variant] = name
+    return names
+
+
+def sizes_for(url: str, names: Dict[str, str]) -> Dict[str, str]:
+    base = url.rsplit("/", 1)[0]
+    return {variant: f"{base}/{name}" for variant, name in names.items()}
+
+
+# =======================
+#   Pool y aplicación
+# =======================
+_pool: Optional[Executor] = None
+_lock = threading.Lock()
+
+
+def _get_pool() -> Executor:
+    """
+    Procesos (IMAGE_WORKERS); con IMAGE_WORKERS=0, un hilo del proceso: sin
+    paralelismo, pero Pillow y el guardado no corren en el event loop.
+    """
+    global _pool
+    with _lock:
+        if _pool is None:
+            if settings.image_workers > 0:
+                _pool = ProcessPoolExecutor(max_workers=settings.image_workers)
+            else:
+                _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="images")
+        return _pool
+
+
+def save_sizes(product_id: int, url: str, sizes: Dict[str, str]) -> bool:
+    """Guarda las variantes si el producto sigue con la misma imagen."""
+    from sqlalchemy import update
+    from .cache import catalog_cache
+    from .database import SessionLocal
+    from .models import Product
+
+    with SessionLocal() as db:
+        changed = db.execute(
+            update(Product)
+            .where(Product.id == product_id, Product.image_url == url)
+            .values(image_sizes=sizes)
+        ).rowcount
+        db.commit()
+    if changed:
+        catalog_cache.bump()
+    return bool(changed)
+
+
+def _finished(product_id: int, url: str, future: Future) -> None:
+    try:
+        save_sizes(product_id, url, sizes_for(url, future.result()))
+    except Exception:
+        logger.exception("No se generaron las miniaturas de %s", url)
+
+
+def schedule(product_id: int, url: str) -> Optional[Future]:
+    """Genera las variantes de `url` en segundo plano (None si no hay Pillow)."""
+    if Image is None:
+        logger.warning("Pillow no está instalado: %s queda sin miniaturas", url)
+        return None
+    future = _get_pool().submit(resize, str(path_for(url)))
+    # El callback corre en el hilo del pool, nunca en el de la petición
+    future.add_done_callback(lambda f: _finished(product_id, url, f))
+    return future
+
+
+def regenerate_missing(db) -> int:
+    """Variantes de las subidas que quedaron sin procesar (p. ej. reinicio a mitad)."""
+    from sqlalchemy import select
+    from .models import Product
+
+    if Image is None:
+        return 0
+    done = 0
+    for product_id, url in db.execute(
+        select(Product.id, Product.image_url).where(
+            Product.image_url.like(f"{UPLOAD_URL}/%"), Product.image_sizes.is_(None)
+        )
+    ).all():
+        path = path_for(url)
+        if path is None or not path.exists():
+            continue
+        done += save_sizes(product_id, url, sizes_for(url, resize(str(path))))
+    return done
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
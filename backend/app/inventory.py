@@ -0,0 +1,369 @@
+# backend/app/inventory.py
+"""
+Reservas de stock del carrito sin serializar el checkout en la fila del producto.
+
+- La primera reserva de un producto reparte su `stock` en STOCK_SHARDS filas
+  de `stock_shards` (una sola vez, con la fila del producto bloqueada). Desde
+  ahí el stock disponible es la suma de los shards.
+- Reservar descuenta con un UPDATE condicional (`available >= n`) en un shard
+  al azar: dos carritos del mismo SKU casi nunca esperan por la misma fila.
+  Si hacen falta varios shards se bloquean en orden de `shard`, y varios
+  productos en orden de id (igual que el FOR UPDATE de POST /orders).
+  Cada porción apartada queda en `reservations` (ACTIVE, con `expires_at`).
+- El checkout (POST /orders/checkout) pasa las reservas del usuario a
+  CONSUMED: las unidades ya estaban apartadas, no se vuelve a bloquear nada.
+  POST /orders con un producto con shards descuenta de los shards igual.
+- Un hilo vence en bloque las reservas expiradas (devuelve las unidades a su
+  shard) y sincroniza `products.stock` con la suma de los shards para el
+  catálogo, cada CART_SWEEP_SECONDS.
+
+Editar el stock de un producto (PUT o importación) borra sus shards y, en la
+misma transacción, suelta sus reservas vivas sin devolver unidades: el valor
+nuevo es todo el stock disponible (los carritos pierden esos items) y la
+próxima reserva recrea los shards. Así una reserva vieja que vence o se suelta
+después no suma sus unidades encima del valor editado.
+"""
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Set, Tuple
+
+from sqlalchemy import bindparam, delete, exists, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from .cache import availability_changed, catalog_cache
+from .config import settings
+from .database import SessionLocal
+from .models import Product, Reservation, StockShard
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "ACTIVE"
+CONSUMED = "CONSUMED"
+RELEASED = "RELEASED"
+EXPIRED = "EXPIRED"
+
+SWEEP_BATCH = 5000
+TAKE_ATTEMPTS = 3
+
+
+class OutOfStock(Exception):
+    def __init__(self, product_id: int):
+        super().__init__(f"Stock insuficiente para el producto {product_id}")
+        self.product_id = product_id
+
+
+# =======================
+#   Shards
+# =======================
+def sharded_ids(db: Session, product_ids: Iterable[int]) -> Set[int]:
+    ids = list(product_ids)
+    if not ids:
+        return set()
+    return set(db.scalars(
+        select(StockShard.product_id).where(StockShard.product_id.in_(ids)).distinct()
+    ))
+
+
+def ensure_shards(db: Session, product_ids: Iterable[int]) -> None:
+    """Reparte el stock de los productos que aún no tienen shards (sin commit)."""
+    missing = set(product_ids) - sharded_ids(db, product_ids)
+    if not missing:
+        return
+    rows = db.execute(
+        select(Product.id, Product.stock)
+        .where(Product.id.in_(missing))
+        .order_by(Product.id)
+        .with_for_update()
+    ).all()
+    # Otra transacción pudo crearlos mientras se esperaba el lock
+    missing -= sharded_ids(db, missing)
+    shards = settings.stock_shards
+    inserts = []
+    for product_id, stock in rows:
+        if product_id not in missing:
+            continue
+        base, extra = divmod(max(stock, 0), shards)
+        inserts += [
+            {"product_id": product_id, "shard": s, "available": base + (1 if s < extra else 0)}
+            for s in range(shards)
+        ]
+    if inserts:
+        db.execute(insert(StockShard), inserts)
+
+
+def unshard(db: Session, product_ids: Iterable[int]) -> int:
+    """
+    Borra los shards y suelta las reservas vivas de los productos sin devolver
+    sus unidades: `products.stock` vuelve a ser el stock disponible (sin
+    commit). Devuelve cuántas reservas soltó.
+    """
+    ids = sorted(set(product_ids))
+    if not ids:
+        return 0
+    released = db.execute(
+        update(Reservation)
+        .where(Reservation.product_id.in_(ids), Reservation.status == ACTIVE)
+        .values(status=RELEASED)
+        .execution_options(synchronize_session=False)
+    ).rowcount
+    db.execute(delete(StockShard).where(StockShard.product_id.in_(ids)))
+    return released
+
+
+def lock_shards(db: Session, product_ids: Iterable[int]) -> Dict[int, int]:
+    """Bloquea los shards de los productos; devuelve el disponible total de cada uno."""
+    ids = list(product_ids)
+    available: Dict[int, int] = defaultdict(int)
+    if ids:
+        for product_id, units in db.execute(
+            select(StockShard.product_id, StockShard.available)
+            .where(StockShard.product_id.in_(ids))
+            .order_by(StockShard.product_id, StockShard.shard)
+            .with_for_update()
+        ):
+            available[product_id] += units
+    return dict(available)
+
+
+def take(db: Session, product_id: int, quantity: int) -> List[Tuple[int, int]]:
+    """
+    Descuenta `quantity` de los shards del producto; devuelve [(shard, unidades)].
+    Lanza OutOfStock si no alcanza (la transacción debe revertirse).
+
+    Cada UPDATE deja la fila bloqueada hasta el commit, así que nunca se toman
+    dos shards del mismo producto fuera de orden:
+    - Si la cantidad cabe en un shard, UPDATE condicional de uno solo, elegido
+      al azar entre los que alcanzan (reservas concurrentes van a filas distintas).
+      Si falla no queda bloqueado y se reintenta.
+    - Si no, FOR UPDATE de todos sus shards en orden de `shard` (como
+      `lock_shards`) y se descuenta de ellos en ese orden.
+    """
+    for _ in range(TAKE_ATTEMPTS):
+        candidates = db.scalars(
+            select(StockShard.shard)
+            .where(StockShard.product_id == product_id, StockShard.available >= quantity)
+        ).all()
+        if not candidates:
+            break
+        shard = random.choice(candidates)
+        updated = db.execute(
+            update(StockShard)
+            .where(
+                StockShard.product_id == product_id,
+                StockShard.shard == shard,
+                StockShard.available >= quantity,
+            )
+            .values(available=StockShard.available - quantity)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if updated:
+            return [(shard, quantity)]
+
+    shards = db.execute(
+        select(StockShard.shard, StockShard.available)
+        .where(StockShard.product_id == product_id)
+        .order_by(StockShard.shard)
+        .with_for_update()
+    ).all()
+    if sum(available for _, available in shards) < quantity:
+        raise OutOfStock(product_id)
+    taken: List[Tuple[int, int]] = []
+    remaining = quantity
+    for shard, available in shards:
+        units = min(available, remaining)
+        if units <= 0:
+            continue
+        db.execute(
+            update(StockShard)
+            .where(StockShard.product_id == product_id, StockShard.shard == shard)
+            .values(available=StockShard.available - units)
+            .execution_options(synchronize_session=False)
+        )
+        taken.append((shard, units))
+        remaining -= units
+        if not remaining:
+            break
+    return taken
+
+
+def _return_units(db: Session, rows: Iterable[Tuple[int, int, int]]) -> None:
+    """
+    Devuelve (product_id, shard, unidades) a su shard. Si el producto ya no
+    tiene shards su stock se editó después de reservar (ver `unshard`): el
+    valor editado manda y las unidades no se suman.
+    """
+    by_shard: Dict[Tuple[int, int], int] = defaultdict(int)
+    for product_id, shard, quantity in rows:
+        by_shard[(product_id, shard)] += quantity
+    if not by_shard:
+        return
+    sharded = sharded_ids(db, {product_id for product_id, _ in by_shard})
+
+    # En orden de (producto, shard), como el resto de los locks sobre shards
+    to_shards = [
+        {"p": product_id, "s": shard, "q": by_shard[(product_id, shard)]}
+        for product_id, shard in sorted(by_shard) if product_id in sharded
+    ]
+    if to_shards:
+        table = StockShard.__table__
+        db.execute(
+            table.update()
+            .where(table.c.product_id == bindparam("p"), table.c.shard == bindparam("s"))
+            .values(available=table.c.available + bindparam("q")),
+            to_shards,
+        )
+
+
+# =======================
+#   Reservas
+# =======================
+def reserve(db: Session, user_id: int, product_id: int, quantity: int) -> datetime:
+    """Aparta `quantity` unidades para el carrito del usuario (sin commit); devuelve el vencimiento."""
+    ensure_shards(db, [product_id])
+    now = datetime.utcnow()
+    expires_at = now + timedelta(minutes=settings.cart_hold_minutes)
+    db.execute(insert(Reservation), [
+        {
+            "user_id": user_id, "product_id": product_id, "shard": shard, "quantity": units,
+            "status": ACTIVE, "created_at": now, "expires_at": expires_at,
+        }
+        for shard, units in take(db, product_id, quantity)
+    ])
+    return expires_at
+
+
+def release(db: Session, user_id: int, product_id: int | None = None) -> int:
+    """Suelta las reservas activas del usuario (de un producto o todas); sin commit."""
+    query = update(Reservation).where(Reservation.user_id == user_id, Reservation.status == ACTIVE)
+    if product_id is not None:
+        query = query.where(Reservation.product_id == product_id)
+    rows = db.execute(
+        query.values(status=RELEASED)
+        .returning(Reservation.product_id, Reservation.shard, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+    _return_units(db, rows)
+    return sum(quantity for _, _, quantity in rows)
+
+
+def consume(db: Session, user_id: int, order_id: int) -> List[Tuple[int, int]]:
+    """Pasa a CONSUMED las reservas vigentes del usuario; devuelve [(product_id, unidades)]."""
+    return db.execute(
+        update(Reservation)
+        .where(
+            Reservation.user_id == user_id,
+            Reservation.status == ACTIVE,
+            Reservation.expires_at > datetime.utcnow(),
+        )
+        .values(status=CONSUMED, order_id=order_id)
+        .returning(Reservation.product_id, Reservation.quantity)
+        .execution_options(synchronize_session=False)
+    ).all()
+
+
+def active(db: Session, user_id: int) -> list:
+    """(product_id, nombre, precio, unidades, vencimiento más próximo) del carrito."""
+    return db.execute(
+        select(
+            Reservation.product_id,
+            Product.name,
+            Product.price,
+            func.sum(Reservation.quantity),
+            func.min(Reservation.expires_at),
+        )
+        .join(Product, Product.id == Reservation.product_id)
+        .where(
+            Reservation.user_id == user_id,
+            Reservation.status == ACTIVE,
+            Reservation.expires_at > datetime.utcnow(),
+        )
+        .group_by(Reservation.product_id, Product.name, Product.price)
+        .order_by(Reservation.product_id)
+    ).all()
+
+
+# =======================
+#   Barrido periódico
+# =======================
+def sweep(db: Session) -> int:
+    """Vence en bloque las reservas expiradas y devuelve sus unidades; devuelve cuántas vencieron."""
+    expired = 0
+    while True:
+        batch = (
+            select(Reservation.id)
+            .where(Reservation.status == ACTIVE, Reservation.expires_at <= datetime.utcnow())
+            .limit(SWEEP_BATCH)
+        )
+        rows = db.execute(
+            update(Reservation)
+            .where(Reservation.id.in_(batch.scalar_subquery()), Reservation.status == ACTIVE)
+            .values(status=EXPIRED)
+            .returning(Reservation.product_id, Reservation.shard, Reservation.quantity)
+            .execution_options(synchronize_session=False)
+        ).all()
+        _return_units(db, rows)
+        db.commit()
+        expired += len(rows)
+        if len(rows) < SWEEP_BATCH:
+            return expired
+
+
+def refresh_stock(db: Session) -> int:
+    """`products.stock` = suma de sus shards (para el catálogo); devuelve productos actualizados."""
+    totals = (
+        select(StockShard.product_id, func.sum(StockShard.available).label("total"))
+        .group_by(StockShard.product_id)
+        .subquery()
+    )
+    stale = db.execute(
+        select(Product.id, Product.stock, totals.c.total)
+        .join(totals, totals.c.product_id == Product.id)
+        .where(Product.stock != totals.c.total)
+    ).all()
+    if not stale:
+        return 0
+    shard_total = (
+        select(func.sum(StockShard.available))
+        .where(StockShard.product_id == Product.id)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(Product)
+        .where(
+            Product.id.in_([product_id for product_id, _, _ in stale]),
+            exists().where(StockShard.product_id == Product.id),  # pudo perder los shards entretanto
+        )
+        .values(stock=shard_total)
+        .execution_options(synchronize_session=False)
+    )
+    stats.bump(db, low_stock_products=sum(stats.low_stock_delta(old, new) for _, old, new in stale))
+    db.commit()
+    if availability_changed((old, new) for _, old, new in stale):
+        catalog_cache.bump()
+    return len(stale)
+
+
+def _sweep_loop(interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            with SessionLocal() as db:
+                expired = sweep(db)
+                refreshed = refresh_stock(db)
+            if expired:
+                logger.info("Reservas vencidas: %d (stock actualizado en %d productos)", expired, refreshed)
+        except Exception:
+            logger.exception("Falló el barrido de reservas")
+
+
+def start_sweep_job() -> None:
+    if settings.cart_sweep_seconds <= 0:
+        return
+    threading.Thread(
+        target=_sweep_loop, args=(settings.cart_sweep_seconds,), name="cart-sweep", daemon=True
+    ).start()
@@ -1,24 +1,32 @@
 # backend/app/main.py
+import time
+
+_BOOT_STARTED = time.perf_counter()  # antes de importar FastAPI/SQLAlchemy: mide el import
+
+import logging
 import os
-from pathlib import Path
 
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 from sqlalchemy.orm import Session
 
-from .database import Base, engine
-from .models import Product
-from .auth import seed_admin
-from .routers import auth_router, products_router, orders_router, admin_router
+from .config import settings
+from .database import engine, async_engine, start_replica_job
+from .idempotency import start_cleanup_job
+from .hashing import shutdown_pool
+from . import images, inventory, metrics, migrations, profiling, stats
+from .assets import STATIC_DIR, HashedStaticFiles
+from .routers import auth_router, products_router, orders_router, cart_router, admin_router
+
+logger = logging.getLogger("app")
 
 # Usa un nombre distinto para evitar sombra con el paquete "app"
 api = FastAPI(title="Candy Marketplace API", version="1.0.0")
 
-# ---- Static files (imágenes) ----
-STATIC_DIR = Path(__file__).resolve().parent / "static"
+# ---- Static files (imágenes; rutas con hash e inmutables tras `manage assets`) ----
 STATIC_DIR.mkdir(parents=True, exist_ok=True)
-api.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+api.mount("/static", HashedStaticFiles(directory=STATIC_DIR), name="static")
 
 # ---- CORS ----
 # Lee dominios permitidos desde la variable de entorno ALLOWED_ORIGINS
@@ -45,12 +53,25 @@ api.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "X-Total-Estimate"],  # cursor, caché de /products y total de /admin/users
 )
 
+# ---- Perfilado de SQL (solo depuración: SQL_PROFILING=true) ----
+if settings.sql_profiling:
+    profiling.install(engine)
+    if async_engine is not None:
+        profiling.install(async_engine.sync_engine)
+    api.add_middleware(profiling.SQLProfilingMiddleware)
+
+# ---- Métricas (por ruta; va por fuera de CORS para medir la petición completa) ----
+if settings.metrics_enabled:
+    api.add_middleware(metrics.MetricsMiddleware)
+
 # ---- Routers ----
 api.include_router(auth_router.router, tags=["auth"])
 api.include_router(products_router.router, tags=["products"])
 api.include_router(orders_router.router, tags=["orders"])
+api.include_router(cart_router.router, tags=["cart"])
 api.include_router(admin_router.router, prefix="/admin", tags=["admin"])  # ✅ prefijo /admin
 
 # ---- Healthcheck ----
@@ -58,52 +79,36 @@ api.include_router(admin_router.router, prefix="/admin", tags=["admin"])  # ✅
 def __health():
     return {"status": "ok", "version": "1.0.0"}
 
-# ---- Startup: crear tablas y sembrar datos ----
+# ---- Métricas en formato Prometheus ----
+@api.get("/__metrics", include_in_schema=False)
+def __metrics():
+    return PlainTextResponse(metrics.collect(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+# ---- Startup: solo verifica la versión del esquema y arranca los jobs ----
+# (tablas: `python -m app.manage migrate`; datos iniciales: `python -m app.manage seed`)
 @api.on_event("startup")
 def on_startup():
-    # Crear tablas
-    Base.metadata.create_all(bind=engine)
-
-    # Semillas
-    with Session(bind=engine) as db:
-        seed_admin(db)
-
-        # Productos de ejemplo (solo si no hay)
-        if db.query(Product).count() == 0:
-            samples = [
-                Product(
-                    name="Gomitas de Fruta", description="Gomitas surtidas",
-                    price=3.50, stock=100, image_url="/static/gomitas.svg",
-                    category="Gomitas", is_vegan=True, is_gluten_free=True
-                ),
-                Product(
-                    name="Chocolate Amargo 70%", description="Tableta premium",
-                    price=5.99, stock=50, image_url="/static/chocolate.svg",
-                    category="Chocolates", is_vegan=False, is_gluten_free=True
-                ),
-                Product(
-                    name="Chicle de Menta", description="Paquete x10",
-                    price=1.99, stock=200, image_url="/static/chicle.svg",
-                    category="Caramelos", is_vegan=True, is_gluten_free=True
-                ),
-                Product(
-                    name="Galletas de Chocolate", description="Galletas crujientes",
-                    price=4.50, stock=75, image_url="/static/chocolate.svg",
-                    category="Galletas", is_vegan=False, is_gluten_free=False
-                ),
-                Product(
-                    name="Confites Colombianos", description="Dulces tradicionales",
-                    price=6.00, stock=30, image_url="/static/gomitas.svg",
-                    category="Colombianos", is_vegan=True, is_gluten_free=True
-                ),
-                Product(
-                    name="Bebida de Chocolate", description="Chocolate caliente",
-                    price=3.00, stock=40, image_url="/static/chocolate.svg",
-                    category="Bebidas", is_vegan=False, is_gluten_free=True
-                ),
-            ]
-            db.add_all(samples)
-            db.commit()
+    started = time.perf_counter()
+    version = migrations.ensure_current(engine)
+    start_cleanup_job()
+    stats.start_reconcile_job()
+    metrics.start_flush_job()
+    start_replica_job()
+    inventory.start_sweep_job()
+
+    ready = time.perf_counter()
+    metrics.registry.set("app_startup_seconds", (("phase", "import"),), started - _BOOT_STARTED)
+    metrics.registry.set("app_startup_seconds", (("phase", "startup"),), ready - started)
+    logger.info(
+        "Arranque listo en %.0f ms (import %.0f ms, startup %.0f ms), esquema v%d",
+        (ready - _BOOT_STARTED) * 1000, (started - _BOOT_STARTED) * 1000, (ready - started) * 1000, version,
+    )
+
+@api.on_event("shutdown")
+def on_shutdown():
+    shutdown_pool()
+    images.shutdown_pool()
+    metrics.write_snapshot()
 
 # Exporta con el nombre que uvicorn/gunicorn espera
 app = api
@@ -0,0 +1,69 @@
+# backend/app/manage.py
+"""
+Comandos de mantenimiento (una vez por deploy, no por worker):
+
+    python -m app.manage migrate      # aplica migraciones pendientes
+    python -m app.manage seed         # admin + productos de ejemplo (idempotente)
+    python -m app.manage assets       # hashea/comprime app/static, actualiza image_url
+                                      # y genera miniaturas pendientes de las subidas
+    python -m app.manage version      # versión del esquema aplicada / esperada
+    python -m app.manage sales-repair [--from AAAA-MM-DD] [--to AAAA-MM-DD]
+                                      # recalcula el rollup desde las órdenes
+                                      # (por defecto ayer; manual, ver app/sales.py)
+"""
+import argparse
+import logging
+from datetime import date
+
+from sqlalchemy.orm import Session
+
+from .database import engine
+from . import migrations
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    parser.add_argument("command", choices=["migrate", "seed", "assets", "version", "sales-repair"])
+    parser.add_argument("--from", dest="day_from", type=date.fromisoformat, help="sales-repair: primer día")
+    parser.add_argument("--to", dest="day_to", type=date.fromisoformat, help="sales-repair: último día")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(name)s: %(message)s")
+
+    if args.command == "migrate":
+        applied = migrations.upgrade(engine)
+        print(f"Migraciones aplicadas: {', '.join(applied) if applied else 'ninguna'} (versión {migrations.HEAD})")
+    elif args.command == "seed":
+        from . import seed
+
+        migrations.ensure_current(engine)
+        with Session(bind=engine) as db:
+            print(seed.run(db))
+    elif args.command == "assets":
+        from . import assets, images
+
+        manifest = assets.build()
+        migrations.ensure_current(engine)
+        with Session(bind=engine) as db:
+            changed = assets.ingest(db)
+            thumbnails = images.regenerate_missing(db)
+        print(
+            f"Archivos: {len(manifest['files'])}, productos actualizados: {changed}, "
+            f"miniaturas generadas: {thumbnails}"
+        )
+    elif args.command == "sales-repair":
+        from . import sales
+
+        migrations.ensure_current(engine)
+        with Session(bind=engine) as db:
+            try:
+                day_from, day_to = sales.repair(db, args.day_from, args.day_to)
+            except ValueError as exc:
+                parser.error(str(exc))
+        print(f"Rollup de ventas recalculado: {day_from} a {day_to}")
+    else:
+        with engine.connect() as conn:
+            print(f"aplicada={migrations.current_version(conn)} esperada={migrations.HEAD}")
+
+
+if __name__ == "__main__":
+    main()
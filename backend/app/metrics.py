@@ -0,0 +1,338 @@
+# backend/app/metrics.py
+"""
+Métricas en proceso expuestas en formato de texto Prometheus (GET /__metrics).
+
+- `MetricsMiddleware` (ASGI puro, sin BaseHTTPMiddleware) registra por ruta
+  (plantilla de FastAPI, no la URL: cardinalidad acotada) el total por código
+  de estado y un histograma de latencia; además peticiones en curso.
+- `TimedQueuePool` mide la espera al pedir una conexión al pool; tamaño,
+  conexiones en uso y overflow se leen del pool al momento del scrape.
+- Multi-worker (METRICS_MULTIPROC_DIR): cada proceso vuelca su registro a
+  `<dir>/<pid>.json` cada METRICS_FLUSH_SECONDS y /__metrics suma los archivos.
+  Contadores e histogramas de workers muertos se conservan; los gauges solo
+  se suman de procesos vivos.
+
+Costo por petición: un perf_counter, un bisect y dos sumas bajo un lock.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Tuple
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0)
+FLASH_SALE_BATCH_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 200, 500)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.help: Dict[str, Tuple[str, str]] = {}  # nombre -> (tipo, ayuda)
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self.gauges: Dict[str, Dict[Labels, float]] = {}
+        # nombre -> labels -> [cuentas por bucket..., +Inf, suma]
+        self.histograms: Dict[str, Dict[Labels, list]] = {}
+        self.buckets: Dict[str, tuple] = {}
+        self.collectors: list = []
+
+    # ---- Declaración
+    def counter(self, name: str, doc: str) -> None:
+        self.help[name] = ("counter", doc)
+        self.counters.setdefault(name, {})
+
+    def gauge(self, name: str, doc: str) -> None:
+        self.help[name] = ("gauge", doc)
+        self.gauges.setdefault(name, {})
+
+    def histogram(self, name: str, doc: str, buckets: tuple) -> None:
+        self.help[name] = ("histogram", doc)
+        self.histograms.setdefault(name, {})
+        self.buckets[name] = buckets
+
+    def collector(self, fn: Callable[[], Iterable[Tuple[str, Labels, float]]]) -> None:
+        """`fn()` -> (gauge, labels, valor) leídos al momento del scrape."""
+        self.collectors.append(fn)
+
+    # ---- Registro
+    def inc(self, name: str, labels: Labels, amount: float = 1.0) -> None:
+        with self._lock:
+            series = self.counters[name]
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def add(self, name: str, labels: Labels, amount: float) -> None:
+        with self._lock:
+            series = self.gauges[name]
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def set(self, name: str, labels: Labels, value: float) -> None:
+        with self._lock:
+            self.gauges[name][labels] = value
+
+    def observe(self, name: str, labels: Labels, value: float) -> None:
+        bounds = self.buckets[name]
+        index = bisect_left(bounds, value)  # los buckets son "le": value <= bound
+        with self._lock:
+            series = self.histograms[name]
+            counts = series.get(labels)
+            if counts is None:
+                counts = series[labels] = [0] * (len(bounds) + 1) + [0.0]
+            counts[index] += 1
+            counts[-1] += value
+
+    # ---- Exportación
+    def snapshot(self) -> dict:
+        gauges: Dict[str, Dict[Labels, float]] = {}
+        for fn in self.collectors:
+            try:
+                for name, labels, value in fn():
+                    gauges.setdefault(name, {})[labels] = value
+            except Exception:
+                logger.exception("Falló un colector de métricas")
+        with self._lock:
+            for name, series in self.gauges.items():
+                gauges.setdefault(name, {}).update(series)
+            return {
+                "pid": os.getpid(),
+                "counters": {n: [[list(l), v] for l, v in s.items()] for n, s in self.counters.items()},
+                "gauges": {n: [[list(l), v] for l, v in s.items()] for n, s in gauges.items()},
+                "histograms": {n: [[list(l), list(v)] for l, v in s.items()] for n, s in self.histograms.items()},
+            }
+
+
+registry = Registry()
+
+registry.counter("http_requests_total", "Peticiones HTTP por ruta, método y código de estado")
+registry.histogram("http_request_duration_seconds", "Latencia de las peticiones HTTP", LATENCY_BUCKETS)
+registry.gauge("http_requests_in_flight", "Peticiones HTTP en curso")
+registry.histogram("db_pool_checkout_wait_seconds", "Espera para obtener una conexión del pool", POOL_WAIT_BUCKETS)
+registry.gauge("app_startup_seconds", "Duración del arranque del proceso (import y startup)")
+registry.gauge("db_pool_size", "Tamaño configurado del pool")
+registry.gauge("db_pool_checked_out", "Conexiones del pool en uso")
+registry.gauge("db_pool_overflow", "Conexiones abiertas por encima de pool_size")
+registry.counter("db_read_routing_total", "Sesiones de solo lectura por destino (replica/primary) y motivo")
+registry.gauge("db_replica_lag_seconds", "Retraso de la réplica de lectura (-1: no disponible)")
+registry.histogram("flash_sale_batch_size", "Órdenes por lote de la venta flash", FLASH_SALE_BATCH_BUCKETS)
+registry.gauge("flash_sale_queue_depth", "Órdenes de venta flash esperando lote")
+
+
+# =======================
+#   Middleware
+# =======================
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        in_flight = (("method", scope["method"]),)
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        registry.add("http_requests_in_flight", in_flight, 1)
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            registry.add("http_requests_in_flight", in_flight, -1)
+            # FastAPI deja la ruta resuelta en el scope: se usa su plantilla
+            route = scope.get("route")
+            path = getattr(route, "path_format", None) or "other"
+            labels = (("method", scope["method"]), ("route", path))
+            registry.inc("http_requests_total", labels + (("status", str(status_code)),))
+            registry.observe("http_request_duration_seconds", labels, elapsed)
+
+
+# =======================
+#   Pool de conexiones
+# =======================
+class _TimedCheckout:
+    metrics_name = "sync"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            registry.observe(
+                "db_pool_checkout_wait_seconds", (("engine", self.metrics_name),), time.perf_counter() - start
+            )
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    metrics_name = "sync"
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    metrics_name = "async"
+
+
+class TimedReplicaQueuePool(TimedQueuePool):
+    metrics_name = "replica"
+
+
+class TimedAsyncReplicaQueuePool(TimedAsyncQueuePool):
+    metrics_name = "async_replica"
+
+
+def watch_pool(name: str, pool) -> None:
+    """Gauges de tamaño/uso/overflow de `pool`, leídos al momento del scrape."""
+    if not isinstance(pool, QueuePool):
+        return
+    labels = (("engine", name),)
+    registry.collector(lambda: [
+        ("db_pool_size", labels, pool.size()),
+        ("db_pool_checked_out", labels, pool.checkedout()),
+        ("db_pool_overflow", labels, max(pool.overflow(), 0)),
+    ])
+
+
+# =======================
+#   Formato Prometheus
+# =======================
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels, extra: tuple = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(snapshot: dict) -> str:
+    out = []
+    for name, (kind, doc) in registry.help.items():
+        out.append(f"# HELP {name} {doc}")
+        out.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            bounds = registry.buckets[name]
+            for labels, counts in snapshot["histograms"].get(name, []):
+                cumulative = 0
+                for bound, count in zip(bounds + ("+Inf",), counts[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _number(bound)
+                    out.append(f"{name}_bucket{_labels(labels, (('le', le),))} {cumulative}")
+                out.append(f"{name}_sum{_labels(labels)} {_number(counts[-1])}")
+                out.append(f"{name}_count{_labels(labels)} {cumulative}")
+        else:
+            section = "counters" if kind == "counter" else "gauges"
+            for labels, value in snapshot[section].get(name, []):
+                out.append(f"{name}{_labels(labels)} {_number(value)}")
+    return "\n".join(out) + "\n"
+
+
+# =======================
+#   Multi-worker
+# =======================
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def write_snapshot() -> None:
+    directory = settings.metrics_multiproc_dir
+    if not directory:
+        return
+    path = os.path.join(directory, f"{os.getpid()}.json")
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp, path)
+
+
+def _merge(snapshots: list) -> dict:
+    counters: Dict[str, Dict[tuple, float]] = {}
+    gauges: Dict[str, Dict[tuple, float]] = {}
+    histograms: Dict[str, Dict[tuple, list]] = {}
+    for snap in snapshots:
+        for name, series in snap["counters"].items():
+            target = counters.setdefault(name, {})
+            for labels, value in series:
+                key = tuple(map(tuple, labels))
+                target[key] = target.get(key, 0.0) + value
+        if snap.get("alive", True):
+            for name, series in snap["gauges"].items():
+                target = gauges.setdefault(name, {})
+                for labels, value in series:
+                    key = tuple(map(tuple, labels))
+                    target[key] = target.get(key, 0.0) + value
+        for name, series in snap["histograms"].items():
+            target = histograms.setdefault(name, {})
+            for labels, counts in series:
+                key = tuple(map(tuple, labels))
+                acc = target.get(key)
+                target[key] = list(counts) if acc is None else [a + b for a, b in zip(acc, counts)]
+    return {
+        "counters": {n: list(s.items()) for n, s in counters.items()},
+        "gauges": {n: list(s.items()) for n, s in gauges.items()},
+        "histograms": {n: list(s.items()) for n, s in histograms.items()},
+    }
+
+
+def collect() -> str:
+    """Texto Prometheus de este proceso o, en modo multi-worker, de todos."""
+    directory = settings.metrics_multiproc_dir
+    if not directory:
+        return render(registry.snapshot())
+
+    write_snapshot()
+    snapshots = []
+    for entry in os.scandir(directory):
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue  # archivo a medio escribir o borrado entre scandir y open
+        snap["alive"] = _alive(snap["pid"])
+        snapshots.append(snap)
+    return render(_merge(snapshots))
+
+
+def _flush_loop(interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            write_snapshot()
+        except Exception:
+            logger.exception("No se pudieron volcar las métricas")
+
+
+def start_flush_job() -> None:
+    if not settings.metrics_multiproc_dir or settings.metrics_flush_seconds <= 0:
+        return
+    os.makedirs(settings.metrics_multiproc_dir, exist_ok=True)
+    threading.Thread(
+        target=_flush_loop, args=(settings.metrics_flush_seconds,), name="metrics-flush", daemon=True
+    ).start()
@@ -0,0 +1,11 @@
+"""Línea base: tablas de la app (create_all solo crea las que falten)."""
+from ..database import Base
+
+TABLES = (
+    "users", "products", "orders", "order_items",
+    "idempotency_keys", "stat_counters", "sales_rollup",
+)
+
+
+def upgrade(conn) -> None:
+    Base.metadata.create_all(conn, tables=[Base.metadata.tables[t] for t in TABLES])
@@ -0,0 +1,11 @@
+"""
+Índices agregados a tablas existentes (create_all no los crea si la tabla ya
+estaba): historial por usuario de /orders/my e items por orden.
+"""
+from ..database import Base
+
+
+def upgrade(conn) -> None:
+    for table in ("orders", "order_items"):
+        for index in Base.metadata.tables[table].indexes:
+            index.create(conn, checkfirst=True)
@@ -0,0 +1,6 @@
+"""Búsqueda full-text/trigram en Postgres (ver app/search.py). No-op en otros motores."""
+from ..search import create_search_objects
+
+
+def upgrade(conn) -> None:
+    create_search_objects(conn)
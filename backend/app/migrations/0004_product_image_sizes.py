@@ -0,0 +1,14 @@
+"""
+products.image_sizes: URLs de las miniaturas de una imagen subida.
+(Idempotente: en una base nueva 0001 ya crea la columna desde los modelos.)
+"""
+from sqlalchemy import inspect, text
+
+from ..models import Product
+
+
+def upgrade(conn) -> None:
+    if "image_sizes" in {c["name"] for c in inspect(conn).get_columns("products")}:
+        return
+    column_type = Product.__table__.c.image_sizes.type.compile(dialect=conn.dialect)
+    conn.execute(text(f"ALTER TABLE products ADD COLUMN image_sizes {column_type}"))
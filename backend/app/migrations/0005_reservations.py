@@ -0,0 +1,11 @@
+"""
+Reservas del carrito: stock_shards y reservations (ver app/inventory.py).
+0001 no las incluye (su TABLES es fijo): se crean aquí, también en una base
+nueva. `checkfirst` la vuelve idempotente si ya existían.
+"""
+from ..database import Base
+
+
+def upgrade(conn) -> None:
+    tables = [Base.metadata.tables[name] for name in ("stock_shards", "reservations")]
+    Base.metadata.create_all(conn, tables=tables, checkfirst=True)
@@ -0,0 +1,11 @@
+"""
+products.flash_sale: órdenes procesadas en lotes (ver app/flash_sale.py).
+(Idempotente: en una base nueva 0001 ya crea la columna desde los modelos.)
+"""
+from sqlalchemy import inspect, text
+
+
+def upgrade(conn) -> None:
+    if "flash_sale" in {c["name"] for c in inspect(conn).get_columns("products")}:
+        return
+    conn.execute(text("ALTER TABLE products ADD COLUMN flash_sale BOOLEAN NOT NULL DEFAULT false"))
@@ -0,0 +1,15 @@
+"""
+Índices compuestos y parciales de los filtros/ordenamientos de GET /products
+(ver Product.__table_args__ y `python -m bench.explain`). Los de una sola
+columna de name y category quedan cubiertos por los compuestos: se borran.
+"""
+from sqlalchemy import text
+
+from ..database import Base
+
+
+def upgrade(conn) -> None:
+    for index in Base.metadata.tables["products"].indexes:
+        index.create(conn, checkfirst=True)
+    for name in ("ix_products_name", "ix_products_category"):
+        conn.execute(text(f"DROP INDEX IF EXISTS {name}"))
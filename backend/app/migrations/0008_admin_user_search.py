@@ -0,0 +1,39 @@
+"""
+Búsqueda de usuarios del admin (GET /admin/users):
+- keyset (created_at, id) del listado (Index de User)
+- lower(email): btree para el email exacto y el prefijo (text_pattern_ops en
+  Postgres, para LIKE 'abc%') y, en Postgres, GIN trigram para "contiene".
+Sin permiso para pg_trgm se revierte solo ese índice: "contiene" recorre la tabla.
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+from ..database import Base
+
+logger = logging.getLogger(__name__)
+
+POSTGRES_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email) text_pattern_ops)",
+]
+POSTGRES_TRGM_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_email_trgm ON users USING GIN (lower(email) gin_trgm_ops)",
+]
+
+
+def upgrade(conn) -> None:
+    for index in Base.metadata.tables["users"].indexes:
+        index.create(conn, checkfirst=True)
+    if conn.dialect.name != "postgresql":
+        conn.execute(text("CREATE INDEX IF NOT EXISTS ix_users_email_lower ON users (lower(email))"))
+        return
+    for ddl in POSTGRES_DDL:
+        conn.execute(text(ddl))
+    try:
+        with conn.begin_nested():
+            for ddl in POSTGRES_TRGM_DDL:
+                conn.execute(text(ddl))
+    except SQLAlchemyError as exc:
+        logger.warning("Sin índice trigram para la búsqueda de usuarios: %s", exc)
@@ -0,0 +1,11 @@
+"""
+Orden por nombre con filtro vegano / sin gluten (ix_products_*_name): sin
+ellos el planificador usaba el índice de precio y ordenaba en memoria
+(`python -m bench.explain` ahora falla en ese caso).
+"""
+from ..database import Base
+
+
+def upgrade(conn) -> None:
+    for index in Base.metadata.tables["products"].indexes:
+        index.create(conn, checkfirst=True)
@@ -0,0 +1,24 @@
+"""
+Contador `search_index` (stats.VERSIONS): versión del texto del catálogo para
+que cada worker sepa cuándo reconstruir su índice de búsqueda en memoria
+(ver app/search.py). Crea sus filas en stat_counters; idempotente.
+"""
+from sqlalchemy import insert, select
+
+from ..models import StatCounter
+from ..stats import SHARDS, VERSIONS
+
+
+def upgrade(conn) -> None:
+    existing = {
+        (name, shard)
+        for name, shard in conn.execute(
+            select(StatCounter.name, StatCounter.shard).where(StatCounter.name.in_(VERSIONS))
+        )
+    }
+    rows = [
+        {"name": name, "shard": shard, "value": 0}
+        for name in VERSIONS for shard in range(SHARDS) if (name, shard) not in existing
+    ]
+    if rows:
+        conn.execute(insert(StatCounter), rows)
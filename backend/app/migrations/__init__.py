@@ -0,0 +1,116 @@
+# backend/app/migrations/__init__.py
+"""
+Migraciones versionadas del esquema.
+
+Cada archivo `NNNN_nombre.py` de este paquete define `upgrade(conn)` y se
+aplica una sola vez, en su propia transacción, registrando la versión en la
+tabla `schema_version`. En Postgres un advisory lock evita que dos procesos
+migren a la vez.
+
+- Arranque de la app: `ensure_current()` hace UNA consulta (la versión). Si el
+  esquema está atrasado migra (AUTO_MIGRATE=true) o se niega a arrancar.
+- Deploy: `python -m app.manage migrate` (y `seed` para los datos iniciales).
+
+0001 es la línea base: crea las tablas que falten a partir de los modelos,
+así que en una base creada con create_all solo registra la versión. Como en
+una base nueva 0001 ya crea todo lo de los modelos actuales, las migraciones
+posteriores deben ser idempotentes (checkfirst o inspección de columnas).
+"""
+import importlib
+import logging
+import pkgutil
+from datetime import datetime
+from typing import List, Tuple
+
+from sqlalchemy import func, insert, select, text
+from sqlalchemy.exc import DBAPIError
+
+from ..config import settings
+from ..models import SchemaVersion
+
+logger = logging.getLogger(__name__)
+
+ADVISORY_LOCK_ID = 0x63616E6479  # "candy"
+
+
+def _discover() -> List[Tuple[int, str, object]]:
+    found = []
+    for info in pkgutil.iter_modules(__path__):
+        number, _, name = info.name.partition("_")
+        if number.isdigit():
+            found.append((int(number), info.name, importlib.import_module(f"{__name__}.{info.name}")))
+    found.sort(key=lambda m: m[0])
+    versions = [v for v, _, _ in found]
+    if len(set(versions)) != len(versions):
+        raise RuntimeError(f"Números de migración repetidos: {versions}")
+    return found
+
+
+MIGRATIONS = _discover()
+HEAD = MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(conn) -> int:
+    """Versión aplicada (0 si la tabla schema_version todavía no existe)."""
+    try:
+        version = conn.scalar(select(func.max(SchemaVersion.version))) or 0
+    except DBAPIError:
+        version = 0
+    conn.rollback()  # cierra la transacción de la lectura (o la abortada)
+    return version
+
+
+def upgrade(engine, target: int = HEAD) -> List[str]:
+    """Aplica las migraciones pendientes hasta `target`; devuelve las aplicadas."""
+    applied: List[str] = []
+    with engine.connect() as conn:
+        postgres = conn.dialect.name == "postgresql"
+        if postgres:
+            conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": ADVISORY_LOCK_ID})
+            conn.commit()
+        try:
+            SchemaVersion.__table__.create(conn, checkfirst=True)
+            conn.commit()
+            current = current_version(conn)  # releída con el lock tomado
+            for version, name, module in MIGRATIONS:
+                if version <= current or version > target:
+                    continue
+                logger.info("Aplicando migración %s", name)
+                with conn.begin():
+                    module.upgrade(conn)
+                    conn.execute(insert(SchemaVersion).values(
+                        version=version, name=name, applied_at=datetime.utcnow()
+                    ))
+                applied.append(name)
+        finally:
+            if postgres:
+                conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": ADVISORY_LOCK_ID})
+                conn.commit()
+    if applied:
+        _after_upgrade(engine)
+    return applied
+
+
+def _after_upgrade(engine) -> None:
+    """Datos derivados que dependen del esquema: contadores y rollup de ventas."""
+    from sqlalchemy.orm import Session
+    from .. import sales, stats
+
+    with Session(bind=engine) as db:
+        stats.reconcile(db)
+        sales.backfill_if_empty(db)
+
+
+def ensure_current(engine) -> int:
+    """Chequeo de arranque: una consulta si el esquema está al día."""
+    with engine.connect() as conn:
+        version = current_version(conn)
+    if version >= HEAD:
+        return version
+    if not settings.auto_migrate:
+        raise RuntimeError(
+            f"Esquema en la versión {version} y la app necesita la {HEAD}: "
+            "ejecuta `python -m app.manage migrate`"
+        )
+    upgrade(engine)
+    return HEAD
@@ -1,6 +1,6 @@
-from datetime import datetime
+from datetime import date, datetime
 from enum import Enum
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Numeric, Text
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Index, JSON, Numeric, Text, UniqueConstraint, false, text
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from .database import Base
 
@@ -10,6 +10,8 @@ class RoleEnum(str, Enum):
 
 class User(Base):
     __tablename__ = "users"
+    # Listado admin: keyset (created_at, id). Búsqueda por email: migración 0008
+    __table_args__ = (Index("ix_users_created_id", "created_at", "id"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     email: Mapped[str] = mapped_column(String(120), unique=True, index=True, nullable=False)
     password_hash: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -19,23 +21,53 @@ class User(Base):
 
     orders = relationship("Order", back_populates="user", cascade="all,delete")
 
+# Partes WHERE de los índices parciales, por dialecto (deben coincidir con el
+# filtro que genera el router para que el planificador los use)
+def _partial(flag: str) -> dict:
+    return {"postgresql_where": text(flag), "sqlite_where": text(f"{flag} = 1")}
+
 class Product(Base):
     __tablename__ = "products"
+    # Filtros y ordenamientos de GET /products (keyset: columna de orden + id).
+    # Revisados con `python -m bench.explain` (falla si alguno cae en seq scan).
+    __table_args__ = (
+        Index("ix_products_created_id", "created_at", "id"),
+        Index("ix_products_price_id", "price", "id"),
+        Index("ix_products_name_id", "name", "id"),
+        Index("ix_products_category_created", "category", "created_at", "id"),
+        Index("ix_products_category_price", "category", "price", "id"),
+        Index("ix_products_category_name", "category", "name", "id"),
+        # Vegano / sin gluten con cada orden (por defecto, precio y nombre)
+        Index("ix_products_vegan_created", "created_at", "id", **_partial("is_vegan")),
+        Index("ix_products_vegan_price", "price", "id", **_partial("is_vegan")),
+        Index("ix_products_vegan_name", "name", "id", **_partial("is_vegan")),
+        Index("ix_products_gluten_free_created", "created_at", "id", **_partial("is_gluten_free")),
+        Index("ix_products_gluten_free_price", "price", "id", **_partial("is_gluten_free")),
+        Index("ix_products_gluten_free_name", "name", "id", **_partial("is_gluten_free")),
+        # Pocos productos marcados: app/flash_sale.py los relee cada pocos segundos
+        Index("ix_products_flash_sale", "id", **_partial("flash_sale")),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    name: Mapped[str] = mapped_column(String(120), nullable=False, index=True)
+    name: Mapped[str] = mapped_column(String(120), nullable=False)
     description: Mapped[str] = mapped_column(Text, default="", nullable=False)
     price: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
     stock: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
     image_url: Mapped[str | None] = mapped_column(String(255), nullable=True)
-    category: Mapped[str] = mapped_column(String(50), default="General", nullable=False, index=True)
+    # Variantes de una imagen subida: {"thumb": url, "card": url} (ver app/images.py)
+    image_sizes: Mapped[dict | None] = mapped_column(JSON(none_as_null=True), nullable=True)
+    category: Mapped[str] = mapped_column(String(50), default="General", nullable=False)
     is_vegan: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
     is_gluten_free: Mapped[bool] = mapped_column(Boolean, default=False, nullable=False)
+    # Venta flash: sus órdenes se procesan en lotes (ver app/flash_sale.py)
+    flash_sale: Mapped[bool] = mapped_column(Boolean, default=False, server_default=false(), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
     items = relationship("OrderItem", back_populates="product")
 
 class Order(Base):
     __tablename__ = "orders"
+    # Historial por usuario: keyset (created_at, id) de GET /orders/my
+    __table_args__ = (Index("ix_orders_user_created", "user_id", "created_at", "id"),)
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -47,10 +79,79 @@ class Order(Base):
 class OrderItem(Base):
     __tablename__ = "order_items"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
-    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False)
+    order_id: Mapped[int] = mapped_column(ForeignKey("orders.id"), nullable=False, index=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
     quantity: Mapped[int] = mapped_column(Integer, nullable=False)
     unit_price: Mapped[float] = mapped_column(Numeric(10,2), nullable=False)
 
     order = relationship("Order", back_populates="items")
     product = relationship("Product", back_populates="items")
+
+class IdempotencyKey(Base):
+    """Respuesta guardada de POST /orders por (usuario, Idempotency-Key)."""
+    __tablename__ = "idempotency_keys"
+    __table_args__ = (UniqueConstraint("user_id", "key", name="uq_idempotency_user_key"),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    key: Mapped[str] = mapped_column(String(255), nullable=False)
+    request_hash: Mapped[str] = mapped_column(String(64), nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="IN_PROGRESS", nullable=False)
+    response_body: Mapped[str | None] = mapped_column(Text, nullable=True)
+    order_id: Mapped[int | None] = mapped_column(ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, index=True)
+
+class StatCounter(Base):
+    """Contadores del dashboard admin, repartidos en shards para no serializar escrituras."""
+    __tablename__ = "stat_counters"
+    name: Mapped[str] = mapped_column(String(40), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    value: Mapped[float] = mapped_column(Numeric(14,2), default=0, nullable=False)
+
+class SalesRollup(Base):
+    """
+    Ventas agregadas por día y dimensión ('day' con key '', 'category' o 'product').
+    La mantiene app/sales.py a medida que se confirman órdenes.
+    """
+    __tablename__ = "sales_rollup"
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    dimension: Mapped[str] = mapped_column(String(10), primary_key=True)
+    key: Mapped[str] = mapped_column(String(60), primary_key=True)
+    label: Mapped[str] = mapped_column(String(120), default="", nullable=False)
+    revenue: Mapped[float] = mapped_column(Numeric(14,2), default=0, nullable=False)
+    units: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+    orders: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class StockShard(Base):
+    """
+    Stock disponible de un producto repartido en shards (app/inventory.py):
+    reservas concurrentes del mismo SKU descuentan de filas distintas.
+    """
+    __tablename__ = "stock_shards"
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), primary_key=True)
+    shard: Mapped[int] = mapped_column(Integer, primary_key=True)
+    available: Mapped[int] = mapped_column(Integer, default=0, nullable=False)
+
+class Reservation(Base):
+    """Unidades apartadas por un carrito (de un shard) hasta `expires_at`."""
+    __tablename__ = "reservations"
+    __table_args__ = (
+        Index("ix_reservations_user_status", "user_id", "status"),
+        Index("ix_reservations_status_expires", "status", "expires_at"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id", ondelete="CASCADE"), nullable=False)
+    shard: Mapped[int] = mapped_column(Integer, nullable=False)
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), default="ACTIVE", nullable=False)
+    order_id: Mapped[int | None] = mapped_column(ForeignKey("orders.id", ondelete="SET NULL"), nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+
+class SchemaVersion(Base):
+    """Migraciones aplicadas (ver app/migrations)."""
+    __tablename__ = "schema_version"
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String(120), nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -0,0 +1,160 @@
+# backend/app/profiling.py
+"""
+Perfilado de SQL por petición (modo depuración, SQL_PROFILING=true).
+
+- Eventos del engine cuentan sentencias y tiempo de BD de la petición en curso
+  (ContextVar: viaja al threadpool y al greenlet de run_sync).
+- La respuesta lleva `Server-Timing: db;dur=..;desc="N queries", app;dur=..`.
+- La misma sentencia repetida SQL_N_PLUS_ONE_THRESHOLD veces o más en una
+  petición se registra como probable N+1 (logger "app.sql").
+- Sentencias de más de SQL_SLOW_QUERY_MS van al log "app.sql.slow" en JSON.
+
+Para tests: `assert_max_queries(n)` cuenta las sentencias ejecutadas desde
+el contexto del bloque, con o sin SQL_PROFILING. También es un ContextVar:
+TestClient lo copia al hilo de la app y de ahí al threadpool, pero no llega a
+los hilos de fondo (barridos, rollups, lote flash), que no se cuentan.
+
+    with assert_max_queries(3):
+        client.get("/orders/my", headers=auth)
+"""
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, List, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger("app.sql")
+slow_logger = logging.getLogger("app.sql.slow")
+
+
+class QueryProfile:
+    def __init__(self, label: str = ""):
+        self.label = label
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, statement: str, seconds: float) -> None:
+        with self._lock:
+            self.count += 1
+            self.seconds += seconds
+            self.statements[statement] += 1
+
+    def repeated(self, threshold: int) -> List[tuple]:
+        return [(s, n) for s, n in self.statements.most_common() if n >= threshold]
+
+
+_current: ContextVar[Optional[QueryProfile]] = ContextVar("sql_profile", default=None)
+_capture: ContextVar[Optional[QueryProfile]] = ContextVar("sql_capture", default=None)
+
+
+# =======================
+#   Eventos del engine
+# =======================
+def _before(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+def _after(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    profile = _current.get()
+    if profile is not None:
+        profile.record(statement, elapsed)
+    capture = _capture.get()
+    if capture is not None:
+        capture.record(statement, elapsed)
+    if (
+        settings.sql_profiling
+        and settings.sql_slow_query_ms > 0
+        and elapsed * 1000 >= settings.sql_slow_query_ms
+    ):
+        slow_logger.warning(json.dumps({
+            "duration_ms": round(elapsed * 1000, 2),
+            "request": profile.label if profile is not None else None,  # None: job en segundo plano
+            "statement": " ".join(statement.split())[:2000],
+            "executemany": executemany,
+        }, ensure_ascii=False))
+
+
+def install(engine: Engine) -> None:
+    """Registra los eventos en `engine` (idempotente). Para AsyncEngine usa .sync_engine."""
+    if not event.contains(engine, "before_cursor_execute", _before):
+        event.listen(engine, "before_cursor_execute", _before)
+        event.listen(engine, "after_cursor_execute", _after)
+
+
+# =======================
+#   Middleware
+# =======================
+class SQLProfilingMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile = QueryProfile(f"{scope['method']} {scope['path']}")
+        token = _current.set(profile)
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                app_ms = (time.perf_counter() - start) * 1000
+                timing = (
+                    f'db;dur={profile.seconds * 1000:.1f};desc="{profile.count} queries", '
+                    f"app;dur={app_ms:.1f}"
+                )
+                message["headers"] = list(message.get("headers", [])) + [
+                    (b"server-timing", timing.encode()),
+                    (b"timing-allow-origin", b"*"),
+                ]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+            for statement, times in profile.repeated(settings.sql_n_plus_one_threshold):
+                logger.warning(
+                    "Probable N+1 en %s: %d ejecuciones de: %s",
+                    profile.label, times, " ".join(statement.split())[:300],
+                )
+
+
+# =======================
+#   Helper para tests
+# =======================
+@contextmanager
+def capture_queries() -> Iterator[QueryProfile]:
+    """Cuenta las sentencias que ejecutan los engines de la app desde este contexto."""
+    from .database import async_engine, engine
+
+    install(engine)
+    if async_engine is not None:
+        install(async_engine.sync_engine)
+    profile = QueryProfile("capture")
+    token = _capture.set(profile)
+    try:
+        yield profile
+    finally:
+        _capture.reset(token)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryProfile]:
+    with capture_queries() as profile:
+        yield profile
+    if profile.count > limit:
+        detail = "\n".join(f"  {n}x {' '.join(s.split())[:200]}" for s, n in profile.statements.most_common())
+        raise AssertionError(f"Se esperaban como máximo {limit} consultas y hubo {profile.count}:\n{detail}")
@@ -1,14 +1,23 @@
 # backend/app/routers/admin_router.py
 from __future__ import annotations
 
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+import re
+from datetime import date, datetime, timedelta
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 
-from ..database import get_db
-from ..models import User, Product, RoleEnum
+from ..database import get_db, get_read_db, db_endpoint, SessionLocal
+from ..models import User, Product, RoleEnum, Order, OrderItem, SalesRollup
+from ..pagination import encode_cursor, decode_cursor, estimated_count, keyset_filter
 from ..auth import get_current_user
+from ..cache import catalog_cache
+from ..schemas import ProductOut
+from .. import bulk, images, stats
 
 router = APIRouter(tags=["admin"])
 
@@ -25,7 +34,7 @@ def _role_to_str(r) -> str:
 def _is_admin(role_value) -> bool:
     return _role_to_str(role_value).upper() == "ADMIN"
 
-def admin_only(current=Depends(get_current_user)):
+async def admin_only(current=Depends(get_current_user)):
     if not _is_admin(getattr(current, "role", None)):
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Solo ADMIN")
     return current
@@ -50,6 +59,22 @@ class AdminProductBrief(BaseModel):
     stock: Optional[int] = None
     createdAt: Optional[str] = None
 
+class AdminOrderBrief(BaseModel):
+    id: int
+    userId: int
+    userEmail: str
+    status: str
+    createdAt: Optional[str] = None
+    total: float
+    itemCount: int
+
+class SalesRow(BaseModel):
+    key: str
+    label: str
+    revenue: float
+    units: int
+    orders: int
+
 class AdminOverviewOut(BaseModel):
     counts: dict
     latestUsers: List[AdminUserBrief]
@@ -59,12 +84,13 @@ class AdminOverviewOut(BaseModel):
 #   Endpoints
 # =======================
 @router.get("/overview", response_model=AdminOverviewOut)
+@db_endpoint
 def admin_overview(
-    db: Session = Depends(get_db),
+    db: Session = Depends(get_read_db),
     _=Depends(admin_only),
 ):
-    users_count = db.query(User).count()
-    products_count = db.query(Product).count()
+    # Contadores mantenidos en línea (app/stats.py): sin COUNT(*) por request
+    counts = stats.read(db)
 
     latest_users = db.query(User).order_by(User.created_at.desc()).limit(5).all()
     latest_products = db.query(Product).order_by(Product.created_at.desc()).limit(10).all()
@@ -91,37 +117,282 @@ def admin_overview(
     ]
 
     return AdminOverviewOut(
-        counts={"users": users_count, "products": products_count},
+        counts={
+            "users": counts["users"],
+            "products": counts["products"],
+            "orders": counts["orders"],
+            "revenue": counts["revenue"],
+            "lowStockProducts": counts["low_stock_products"],
+        },
         latestUsers=users_out,
         products=prods_out,
     )
 
+# Parece un email completo: se busca exacto (índice sobre lower(email))
+_FULL_EMAIL = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+
+
+def _like_escape(value: str) -> str:
+    return value.replace("/", "//").replace("%", "/%").replace("_", "/_")
+
+
+def _email_filter(q: str):
+    """
+    - email completo -> igualdad sobre lower(email)
+    - con "@" (parte local escrita) -> prefijo: LIKE 'q%' (btree text_pattern_ops)
+    - resto -> contiene: LIKE '%q%' (GIN trigram en Postgres)
+    """
+    email = func.lower(User.email)
+    if _FULL_EMAIL.match(q):
+        return email == q
+    if "@" in q:
+        return email.like(f"{_like_escape(q)}%", escape="/")
+    return email.like(f"%{_like_escape(q)}%", escape="/")
+
+
 @router.get("/users", response_model=List[AdminUserBrief])
+@db_endpoint
 def list_admin_users(
-    db: Session = Depends(get_db),
+    response: Response,
+    db: Session = Depends(get_read_db),
     _=Depends(admin_only),
-    q: Optional[str] = Query(None, description="Filtra por email/username (contiene)"),
+    q: Optional[str] = Query(None, max_length=120, description="Filtra por email (exacto, prefijo o contiene)"),
     limit: int = Query(20, ge=1, le=200),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en X-Next-Cursor"),
+    estimate_total: bool = Query(False, description="Agrega X-Total-Estimate (aproximado, sin COUNT(*))"),
 ):
-    query = db.query(User)
+    """
+    Usuarios más recientes primero, paginados por keyset (created_at, id).
+    `q` sin distinguir mayúsculas; el total estimado sale de los contadores
+    del dashboard (sin filtro) o del planificador de Postgres (con filtro).
+    """
+    query = (
+        select(User.id, User.email, User.role, User.created_at)
+        .order_by(User.created_at.desc(), User.id.desc())
+    )
+    q = q.strip().lower() if q else None
     if q:
-        like = f"%{q}%"
-        if hasattr(User, "email") and hasattr(User, "username"):
-            query = query.filter((User.email.ilike(like)) | (User.username.ilike(like)))
-        elif hasattr(User, "email"):
-            query = query.filter(User.email.ilike(like))
-        elif hasattr(User, "username"):
-            query = query.filter(User.username.ilike(like))
+        query = query.where(_email_filter(q))
+
+    if estimate_total:
+        total = estimated_count(db, query) if q else stats.read(db)["users"]
+        response.headers["X-Total-Estimate"] = str(total)
+
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, "admin-users")
+        query = query.where(keyset_filter([User.created_at, User.id], True, [last_created, last_id]))
 
-    rows = query.order_by(User.created_at.desc()).offset(offset).limit(limit).all()
+    rows = db.execute(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("admin-users", [rows[-1].created_at, rows[-1].id])
 
     return [
         AdminUserBrief(
             id=u.id,
-            email=(getattr(u, "email", None) or getattr(u, "username", "")),
-            role=_role_to_str(getattr(u, "role", None)),
-            createdAt=_iso(getattr(u, "created_at", None)),
+            email=u.email,
+            role=_role_to_str(u.role),
+            createdAt=_iso(u.created_at),
         )
         for u in rows
     ]
+
+
+@router.get("/orders", response_model=List[AdminOrderBrief])
+@db_endpoint
+def list_admin_orders(
+    response: Response,
+    db: Session = Depends(get_read_db),
+    _=Depends(admin_only),
+    status_: Optional[str] = Query(None, alias="status", max_length=20),
+    user_id: Optional[int] = Query(None, ge=1),
+    date_from: Optional[date] = Query(None, description="Desde (inclusive, UTC)"),
+    date_to: Optional[date] = Query(None, description="Hasta (inclusive, UTC)"),
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en X-Next-Cursor"),
+):
+    """
+    Órdenes de todos los usuarios, más recientes primero, paginadas por keyset
+    (created_at, id). Total e items se agregan en SQL solo para la página.
+    """
+    query = (
+        select(Order.id, Order.user_id, Order.status, Order.created_at, User.email)
+        .join(User, User.id == Order.user_id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    if status_:
+        query = query.where(Order.status == status_.upper())
+    if user_id is not None:
+        query = query.where(Order.user_id == user_id)
+    if date_from:
+        query = query.where(Order.created_at >= datetime.combine(date_from, datetime.min.time()))
+    if date_to:
+        query = query.where(Order.created_at < datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    if cursor:
+        last_created, last_id = decode_cursor(cursor, "admin-orders")
+        query = query.where(keyset_filter([Order.created_at, Order.id], True, [last_created, last_id]))
+
+    rows = db.execute(query.limit(limit + 1)).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor("admin-orders", [rows[-1].created_at, rows[-1].id])
+
+    totals = {}
+    if rows:
+        totals = {
+            order_id: (total, count)
+            for order_id, total, count in db.execute(
+                select(
+                    OrderItem.order_id,
+                    func.sum(OrderItem.quantity * OrderItem.unit_price),
+                    func.sum(OrderItem.quantity),
+                )
+                .where(OrderItem.order_id.in_([r.id for r in rows]))
+                .group_by(OrderItem.order_id)
+            )
+        }
+
+    return [
+        AdminOrderBrief(
+            id=r.id,
+            userId=r.user_id,
+            userEmail=r.email or "",
+            status=r.status,
+            createdAt=_iso(r.created_at),
+            total=float(totals.get(r.id, (0, 0))[0] or 0),
+            itemCount=int(totals.get(r.id, (0, 0))[1] or 0),
+        )
+        for r in rows
+    ]
+
+@router.get("/sales", response_model=List[SalesRow])
+@db_endpoint
+def sales_report(
+    db: Session = Depends(get_read_db),
+    _=Depends(admin_only),
+    group_by: Literal["day", "category", "product"] = Query("day"),
+    date_from: Optional[date] = Query(None, description="Desde (inclusive, UTC)"),
+    date_to: Optional[date] = Query(None, description="Hasta (inclusive, UTC)"),
+):
+    """
+    Ingresos, unidades y órdenes por día, categoría o producto. Se agrega sobre
+    la tabla sales_rollup (app/sales.py, al día con cada orden confirmada),
+    no sobre order_items.
+    """
+    # En la dimensión 'day' la clave es el propio día
+    key = SalesRollup.day if group_by == "day" else SalesRollup.key
+    query = (
+        select(
+            key,
+            func.max(SalesRollup.label),
+            func.sum(SalesRollup.revenue),
+            func.sum(SalesRollup.units),
+            func.sum(SalesRollup.orders),
+        )
+        .where(SalesRollup.dimension == group_by)
+        .group_by(key)
+        .order_by(key if group_by == "day" else func.sum(SalesRollup.revenue).desc())
+    )
+    if date_from:
+        query = query.where(SalesRollup.day >= date_from)
+    if date_to:
+        query = query.where(SalesRollup.day <= date_to)
+
+    return [
+        SalesRow(
+            key=_iso(k) or str(k),
+            label=_iso(k) if group_by == "day" else (label or ""),
+            revenue=float(revenue or 0),
+            units=int(units or 0),
+            orders=int(orders or 0),
+        )
+        for k, label, revenue, units, orders in db.execute(query)
+    ]
+
+
+@router.post("/products/import")
+async def import_products(
+    request: Request,
+    format: Optional[Literal["csv", "ndjson"]] = Query(None, description="Por defecto según Content-Type"),
+    _=Depends(admin_only),
+):
+    """
+    Alta/actualización masiva desde un cuerpo CSV (con encabezado) o NDJSON,
+    leído en streaming y aplicado por bloques (ver app/bulk.py).
+    Devuelve el reporte con los errores por línea.
+    """
+    if format is None:
+        content_type = request.headers.get("content-type", "")
+        format = "ndjson" if "ndjson" in content_type or "jsonl" in content_type else "csv"
+    records = bulk.ndjson_records if format == "ndjson" else bulk.csv_records
+
+    report = bulk.ImportReport()
+    chunk: list = []
+    try:
+        async for line, data in records(request.stream()):
+            report.processed += 1
+            row = bulk.validate(line, data, report)
+            if row is not None:
+                chunk.append(row)
+            if len(chunk) >= bulk.IMPORT_CHUNK_SIZE:
+                await run_in_threadpool(bulk.apply_chunk, chunk, report)
+                chunk = []
+    except ValueError as exc:
+        # Encabezado inválido o comillas sin cerrar: lo confirmado hasta aquí queda
+        raise HTTPException(status_code=400, detail={"message": str(exc), "report": report.as_dict()})
+    if chunk:
+        await run_in_threadpool(bulk.apply_chunk, chunk, report)
+    return report.as_dict()
+
+@router.get("/products/export")
+def export_products(
+    format: Literal["csv", "ndjson"] = Query("csv"),
+    _=Depends(admin_only),
+):
+    """Catálogo completo en CSV (re-importable) o NDJSON, sin materializarlo en memoria."""
+    if format == "ndjson":
+        return StreamingResponse(bulk.export_ndjson(), media_type="application/x-ndjson")
+    return StreamingResponse(
+        bulk.export_csv(),
+        media_type="text/csv; charset=utf-8",
+        headers={"Content-Disposition": 'attachment; filename="productos.csv"'},
+    )
+
+
+def _product_exists(product_id: int) -> bool:
+    with SessionLocal() as db:
+        return db.get(Product, product_id) is not None
+
+def _set_uploaded_image(product_id: int, url: str) -> Optional[ProductOut]:
+    with SessionLocal() as db:
+        product = db.get(Product, product_id)
+        if product is None:
+            return None
+        product.image_url = url
+        product.image_sizes = None  # se completan al terminar las miniaturas
+        db.commit()
+        catalog_cache.bump()
+        return ProductOut.model_validate(product)
+
+@router.post("/products/{product_id}/image", response_model=ProductOut, status_code=202)
+async def upload_product_image(product_id: int, request: Request, _=Depends(admin_only)):
+    """
+    Sube la imagen del producto: multipart/form-data (campo `file`) o el
+    binario con Content-Type image/*. Se escribe a disco en streaming; las
+    miniaturas (`image_sizes`) se generan en segundo plano (ver app/images.py).
+    """
+    if not await run_in_threadpool(_product_exists, product_id):
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    tmp_path, digest, extension = await images.receive(request)
+    url = await run_in_threadpool(images.store, tmp_path, product_id, digest, extension)
+    product = await run_in_threadpool(_set_uploaded_image, product_id, url)
+    if product is None:  # borrado mientras se subía
+        raise HTTPException(status_code=404, detail="Producto no encontrado")
+    images.schedule(product_id, url)
+    return product
+
+
+@router.get("/cache")
+def catalog_cache_stats(_=Depends(admin_only)):
+    """Aciertos/fallos y tamaño de la caché del catálogo (de este proceso)."""
+    return catalog_cache.stats()
@@ -1,18 +1,20 @@
 # backend/app/routers/auth_router.py
-from fastapi import APIRouter, Depends, HTTPException, status, Header
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status, Header
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 
-from ..database import get_db
+from ..database import get_request_db, run_db
 from ..models import User, RoleEnum
 from ..schemas import UserCreate, UserOut, TokenOut
 from ..auth import (
-    get_password_hash,
-    verify_password,
+    Principal,
     create_access_token,
     get_current_user,
+    upgrade_password_hash,
 )
+from ..hashing import hash_password_async, verify_password_async
 from ..config import settings
+from .. import stats
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -23,19 +25,35 @@ class LoginIn(BaseModel):
     password: str
 
 
-# ---------- ENDPOINTS ----------
-@router.post("/register", response_model=UserOut, status_code=201)
-def register(payload: UserCreate, db: Session = Depends(get_db)):
+# ---------- HELPERS (tramos de BD) ----------
+def _find_user(db: Session, email: str):
+    return db.query(User).filter(User.email == email).first()
+
+
+def _lookup_user(db: Session, email: str):
+    """
+    `_find_user` antes de bcrypt: cierra la transacción para devolver la
+    conexión al pool mientras se hashea (el usuario queda desligado, con sus
+    columnas cargadas). Si no, cada login en cola retiene una conexión.
+    """
+    try:
+        user = _find_user(db, email)
+        if user is not None:
+            db.expunge(user)
+        return user
+    finally:
+        db.rollback()
+
+
+def _create_user(db: Session, email: str, password_hash: str, role_val: str):
     # Unicidad por email
-    if db.query(User).filter(User.email == payload.email).first():
+    if _find_user(db, email):
         raise HTTPException(status_code=400, detail="El correo ya está registrado")
 
-    role_val = getattr(getattr(RoleEnum, "USER", "USER"), "value", "USER")
-
     # Construcción tolerante a diferencias del modelo (is_active / enabled)
     kwargs = {
-        "email": payload.email,
-        "password_hash": get_password_hash(payload.password),
+        "email": email,
+        "password_hash": password_hash,
         "role": role_val,
     }
     if hasattr(User, "is_active"):
@@ -45,20 +63,43 @@ def register(payload: UserCreate, db: Session = Depends(get_db)):
 
     user = User(**kwargs)
     db.add(user)
+    stats.bump(db, users=1)
     db.commit()
     db.refresh(user)
     return user
 
 
+# ---------- ENDPOINTS ----------
+# register/login son async: bcrypt corre en el pool de procesos y la petición
+# no ocupa un hilo del threadpool mientras tanto (503 si el pool está saturado).
+@router.post("/register", response_model=UserOut, status_code=201)
+async def register(payload: UserCreate, db=Depends(get_request_db)):
+    # Chequeo previo barato para no hashear si el correo ya existe
+    if await run_db(db, _lookup_user, payload.email):
+        raise HTTPException(status_code=400, detail="El correo ya está registrado")
+
+    role_val = getattr(getattr(RoleEnum, "USER", "USER"), "value", "USER")
+    password_hash = await hash_password_async(payload.password)
+    return await run_db(db, _create_user, payload.email, password_hash, role_val)
+
+
 @router.post("/login", response_model=TokenOut)
-def login(payload: LoginIn, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == payload.email).first()
-    if not user or not verify_password(payload.password, user.password_hash):
+async def login(payload: LoginIn, background: BackgroundTasks, db=Depends(get_request_db)):
+    user = await run_db(db, _lookup_user, payload.email)
+    ok, needs_update = await verify_password_async(
+        payload.password, user.password_hash if user else None
+    )
+    if not user or not ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Credenciales inválidas",
         )
 
+    # Hash legacy (pbkdf2/sha256_crypt/texto plano) o bcrypt de menor costo:
+    # se actualiza en segundo plano, sin demorar la respuesta
+    if needs_update:
+        background.add_task(upgrade_password_hash, user.id, user.password_hash, payload.password)
+
     # 🔑 CLAVE: coloca la identidad en 'sub' (lo que lee get_current_user)
     role_str = getattr(getattr(user, "role", None), "value", getattr(user, "role", "USER"))
     token = create_access_token({
@@ -75,14 +116,14 @@ def login(payload: LoginIn, db: Session = Depends(get_db)):
 
 
 @router.get("/me", response_model=UserOut)
-def me(current_user: User = Depends(get_current_user)):
+def me(current_user: Principal = Depends(get_current_user)):
     return current_user
 
 
 @router.post("/register-admin", response_model=UserOut, status_code=201)
-def register_admin(
+async def register_admin(
     payload: UserCreate,
-    db: Session = Depends(get_db),
+    db=Depends(get_request_db),
     x_admin_invite: str | None = Header(default=None, alias="X-Admin-Invite"),
 ):
     """
@@ -94,23 +135,9 @@ def register_admin(
     if not x_admin_invite or x_admin_invite != settings.admin_invite_code:
         raise HTTPException(status_code=401, detail="Código de invitación inválido")
 
-    if db.query(User).filter(User.email == payload.email).first():
+    if await run_db(db, _lookup_user, payload.email):
         raise HTTPException(status_code=400, detail="El correo ya está registrado")
 
     role_val = getattr(getattr(RoleEnum, "ADMIN", "ADMIN"), "value", "ADMIN")
-
-    kwargs = {
-        "email": payload.email,
-        "password_hash": get_password_hash(payload.password),
-        "role": role_val,
-    }
-    if hasattr(User, "is_active"):
-        kwargs["is_active"] = True
-    elif hasattr(User, "enabled"):
-        kwargs["enabled"] = True
-
-    user = User(**kwargs)
-    db.add(user)
-    db.commit()
-    db.refresh(user)
-    return user
+    password_hash = await hash_password_async(payload.password)
+    return await run_db(db, _create_user, payload.email, password_hash, role_val)
@@ -0,0 +1,80 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+
+from ..database import get_db, db_endpoint
+from ..models import Product
+from ..schemas import CartItemOut, CartOut, OrderItemIn
+from ..auth import Principal, get_current_user
+from .. import inventory
+
+# Carrito = reservas de stock con vencimiento (ver app/inventory.py);
+# se confirma con POST /orders/checkout
+router = APIRouter(prefix="/cart", tags=["cart"])
+
+
+def _cart(db: Session, user_id: int) -> CartOut:
+    items = [
+        CartItemOut(
+            product_id=product_id,
+            product_name=name,
+            unit_price=float(price),
+            quantity=quantity,
+            expires_at=expires_at,
+        )
+        for product_id, name, price, quantity, expires_at in inventory.active(db, user_id)
+    ]
+    return CartOut(
+        items=items,
+        total=round(sum(i.unit_price * i.quantity for i in items), 2),
+        expires_at=min((i.expires_at for i in items), default=None),
+    )
+
+
+@router.get("", response_model=CartOut)
+@db_endpoint
+def get_cart(db: Session = Depends(get_db), current: Principal = Depends(get_current_user)):
+    return _cart(db, current.id)
+
+
+@router.post("/items", response_model=CartOut, status_code=status.HTTP_201_CREATED)
+@db_endpoint
+def add_item(
+    payload: OrderItemIn,
+    db: Session = Depends(get_db),
+    current: Principal = Depends(get_current_user),
+):
+    """Aparta `quantity` unidades más del producto durante CART_HOLD_MINUTES."""
+    user_id = current.id
+    try:
+        if db.get(Product, payload.product_id) is None:
+            raise HTTPException(status_code=404, detail=f"Producto {payload.product_id} no existe")
+        inventory.reserve(db, user_id, payload.product_id, payload.quantity)
+        db.commit()
+    except inventory.OutOfStock:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=f"Stock insuficiente para el producto {payload.product_id}")
+    except Exception:
+        db.rollback()
+        raise
+    return _cart(db, user_id)
+
+
+@router.delete("/items/{product_id}", response_model=CartOut)
+@db_endpoint
+def remove_item(
+    product_id: int,
+    db: Session = Depends(get_db),
+    current: Principal = Depends(get_current_user),
+):
+    """Suelta las reservas del producto: las unidades vuelven al stock al instante."""
+    user_id = current.id
+    inventory.release(db, user_id, product_id)
+    db.commit()
+    return _cart(db, user_id)
+
+
+@router.delete("", status_code=status.HTTP_204_NO_CONTENT)
+@db_endpoint
+def clear_cart(db: Session = Depends(get_db), current: Principal = Depends(get_current_user)):
+    inventory.release(db, current.id)
+    db.commit()
@@ -1,131 +1,361 @@
 from __future__ import annotations
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session, joinedload
+from decimal import Decimal
+from typing import Callable, List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Header, Query, Request, Response, status
+from sqlalchemy import case, func, insert, select, update
+from sqlalchemy.orm import Session
 
-from ..database import get_db
+from ..database import get_db, get_read_db, get_request_db, db_endpoint, replica, run_db
 from ..models import Order, OrderItem, Product, User
 from ..schemas import OrderCreate, OrderOut, OrderItemOut
-from ..auth import get_current_user
+from ..auth import Principal, get_current_user
+from ..cache import availability_changed, catalog_cache
+from .. import flash_sale, idempotency, inventory, sales, stats
+from ..pagination import encode_cursor, decode_cursor, keyset_filter
+from ..serializers import FastJSONResponse, order_item_row, order_row
 
 # Mantén este prefijo: el FE llama /orders/... (y en main.py ya está incluido)
 router = APIRouter(prefix="/orders", tags=["orders"])
 
 
-@router.post("", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
-def create_order(
+async def create_order(
     payload: OrderCreate,
-    db: Session = Depends(get_db),
-    current: User = Depends(get_current_user),
+    request: Request,
+    db=Depends(get_request_db),
+    current: Principal = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
 ):
     """
     Crea una orden para el usuario autenticado.
-    - Valida que haya items
-    - Bloquea filas de productos (SELECT ... FOR UPDATE)
-    - Verifica stock y descuenta de forma atómica
+    Con `Idempotency-Key`, los reintentos devuelven la respuesta guardada
+    (sin bloquear filas ni descontar stock otra vez).
+    Async en los dos modos: los tramos de BD van por `run_db` (threadpool o
+    run_sync) y ni la espera por una Idempotency-Key en curso ni la del lote de
+    venta flash ocupan un hilo.
     """
+    user_id = current.id
+    replica.pin(request)  # read-your-writes: /orders/my lee del primario un rato
+    quantities = _quantities(payload)
+    # Productos en venta flash: la orden va al lote (ver app/flash_sale.py)
+    flash = await run_db(db, flash_sale.applies, quantities)
+    if not idempotency_key:
+        if flash:
+            return await _place_flash(db, user_id, quantities)
+        return await run_db(db, _place_order, user_id, payload)
+
+    stored = await idempotency.begin_async(
+        db, user_id, idempotency_key, idempotency.request_fingerprint(payload.model_dump_json())
+    )
+    if stored is not None:
+        return _replayed(stored)
+
+    succeeded = False
+    try:
+        if flash:
+            out = await _place_flash(db, user_id, quantities, idempotency_key)
+        else:
+            out = await run_db(db, _place_order_with_key, user_id, payload, idempotency_key)
+        succeeded = True
+        return out
+    finally:
+        await run_db(db, idempotency.release, user_id, idempotency_key, succeeded)
+
+
+router.add_api_route(
+    "",
+    create_order,
+    methods=["POST"],
+    response_model=OrderOut,
+    status_code=status.HTTP_201_CREATED,
+)
+
+
+def _replayed(body: str) -> Response:
+    return Response(
+        content=body,
+        status_code=status.HTTP_201_CREATED,
+        media_type="application/json",
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _quantities(payload: OrderCreate) -> dict[int, int]:
+    """Cantidades por producto (agrupa product_id repetidos), en el orden en que llegaron."""
     if not payload.items:
         raise HTTPException(status_code=400, detail="La orden está vacía")
+    quantities: dict[int, int] = {}
+    for item in payload.items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
 
-    try:
-        # Orden base
-        order = Order(user_id=current.id, status="CREATED")
-        db.add(order)
-        db.flush()  # genera order.id sin commit
 
-        items_out: List[OrderItemOut] = []
+async def _place_flash(db, user_id: int, quantities: dict[int, int], key: Optional[str] = None) -> OrderOut:
+    await run_db(db, Session.rollback)  # sin transacción abierta (ni conexión tomada) mientras se espera el lote
+    return await flash_sale.place(user_id, quantities, key)
+
+
+def _place_order_with_key(db: Session, user_id: int, payload: OrderCreate, key: str) -> OrderOut:
+    # La respuesta se guarda en la misma transacción que la orden
+    return _place_order(
+        db, user_id, payload,
+        before_commit=lambda o: idempotency.complete(db, user_id, key, o.id, o.model_dump_json()),
+    )
 
-        for item in payload.items:
-            # Bloquea el producto para evitar carreras de stock
-            product = (
-                db.query(Product)
-                .filter(Product.id == item.product_id)
+
+def _place_order(
+    db: Session,
+    user_id: int,
+    payload: OrderCreate,
+    before_commit: Optional[Callable[[OrderOut], None]] = None,
+) -> OrderOut:
+    """
+    - Valida que haya items y agrupa product_id repetidos
+    - Bloquea todas las filas en una sola consulta, en orden de id
+      (WHERE id IN (...) ORDER BY id FOR UPDATE): sin deadlocks entre carritos
+    - Verifica stock y descuenta con un único UPDATE; inserta items en lote
+    - Productos con stock en shards (ver app/inventory.py): sin FOR UPDATE,
+      descuenta de los shards con UPDATEs condicionales
+    """
+    quantities = _quantities(payload)
+
+    try:
+        columns = (Product.id, Product.name, Product.price, Product.stock, Product.category)
+        sharded = inventory.sharded_ids(db, quantities)
+        plain_ids = [pid for pid in quantities if pid not in sharded]
+
+        # Bloquea los productos sin shards para evitar carreras de stock (un round trip)
+        products = {
+            row.id: row
+            for row in (
+                db.query(*columns)
+                .filter(Product.id.in_(plain_ids))
+                .order_by(Product.id)
                 .with_for_update()
-                .first()
+                .all()
             )
+        } if plain_ids else {}
+        # Una reserva pudo repartirlos en shards mientras se esperaba el lock
+        if products:
+            sharded |= inventory.sharded_ids(db, products)
+        if sharded:
+            products.update({
+                row.id: row
+                for row in db.query(*columns).filter(Product.id.in_(list(sharded))).all()
+            })
+
+        for product_id, qty in quantities.items():
+            product = products.get(product_id)
             if not product:
                 raise HTTPException(
                     status_code=404,
-                    detail=f"Producto {item.product_id} no existe",
+                    detail=f"Producto {product_id} no existe",
                 )
-
-            if getattr(product, "stock", 0) < item.quantity:
+            if product_id not in sharded and product.stock < qty:
                 raise HTTPException(
                     status_code=400,
                     detail=f"Stock insuficiente para {product.name}",
                 )
 
-            # Descontar stock
-            product.stock -= item.quantity
+        # Orden base
+        order = Order(user_id=user_id, status="CREATED")
+        db.add(order)
+        db.flush()  # genera order.id sin commit
 
-            # Registrar item con precio unitario "congelado"
-            unit_price = float(product.price)
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=product.id,
-                quantity=item.quantity,
-                unit_price=unit_price,
+        # Descontar stock de los productos sin shards en un solo UPDATE
+        plain = {pid: qty for pid, qty in quantities.items() if pid not in sharded}
+        if plain:
+            db.execute(
+                update(Product)
+                .where(Product.id.in_(list(plain)))
+                .values(stock=Product.stock - case(plain, value=Product.id))
+                .execution_options(synchronize_session=False)
             )
-            db.add(order_item)
-
-            items_out.append(
-                OrderItemOut(
-                    product_id=product.id,
-                    quantity=item.quantity,
-                    unit_price=unit_price,
-                    product_name=product.name,
+        for product_id in sorted(sharded):  # en orden de id, como el FOR UPDATE de arriba
+            try:
+                inventory.take(db, product_id, quantities[product_id])
+            except inventory.OutOfStock:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Stock insuficiente para {products[product_id].name}",
                 )
-            )
 
-        db.commit()
-        db.refresh(order)
-
-        return OrderOut(
-            id=order.id,
-            created_at=order.created_at,
-            status=order.status,
-            items=items_out,
+        # Los productos con shards los corrige el barrido de inventory
+        changes = [(products[pid].stock, products[pid].stock - qty) for pid, qty in plain.items()]
+        return _finish_order(
+            db, order, quantities, products,
+            low_stock_products=sum(stats.low_stock_delta(old, new) for old, new in changes),
+            sold_out=availability_changed(changes),
+            before_commit=before_commit,
         )
     except Exception:
         db.rollback()
         raise
 
 
-@router.get("/my", response_model=List[OrderOut])
-def my_orders(
+@router.post("/checkout", response_model=OrderOut, status_code=status.HTTP_201_CREATED)
+@db_endpoint
+def checkout(
+    request: Request,
     db: Session = Depends(get_db),
-    current: User = Depends(get_current_user),
+    current: Principal = Depends(get_current_user),
 ):
     """
-    Devuelve las órdenes del usuario autenticado, más eficiente
-    (evita N+1) cargando items y productos con joinedload.
+    Convierte el carrito (reservas vigentes de /cart) en una orden.
+    Las unidades ya estaban apartadas: no bloquea productos ni vuelve a
+    descontar stock, solo marca las reservas como consumidas.
     """
-    orders: List[Order] = (
-        db.query(Order)
-        .options(joinedload(Order.items).joinedload(OrderItem.product))
-        .filter(Order.user_id == current.id)
-        .order_by(Order.created_at.desc())
-        .all()
-    )
+    user_id = current.id
+    replica.pin(request)
+    try:
+        order = Order(user_id=user_id, status="CREATED")
+        db.add(order)
+        db.flush()
+
+        quantities: dict[int, int] = {}
+        for product_id, qty in inventory.consume(db, user_id, order.id):
+            quantities[product_id] = quantities.get(product_id, 0) + qty
+        if not quantities:
+            raise HTTPException(status_code=400, detail="El carrito está vacío o sus reservas vencieron")
+
+        products = {
+            row.id: row
+            for row in (
+                db.query(Product.id, Product.name, Product.price, Product.category)
+                .filter(Product.id.in_(list(quantities)))
+                .all()
+            )
+        }
+        return _finish_order(db, order, quantities, products)
+    except Exception:
+        db.rollback()
+        raise
+
+
+def _finish_order(
+    db: Session,
+    order: Order,
+    quantities: dict[int, int],
+    products: dict,
+    low_stock_products: int = 0,
+    sold_out: bool = False,
+    before_commit: Optional[Callable[[OrderOut], None]] = None,
+) -> OrderOut:
+    """
+    Items con precio "congelado" (INSERT en lote), contadores y commit.
+    `sold_out`: algún producto se agotó (solo entonces se invalida el catálogo).
+    """
+    order_id, created_at, order_status = order.id, order.created_at, order.status
 
-    result: List[OrderOut] = []
-    for o in orders:
-        items_out = [
+    items_out: List[OrderItemOut] = []
+    rows = []
+    for product_id, qty in quantities.items():
+        product = products[product_id]
+        unit_price = float(product.price)
+        rows.append({
+            "order_id": order_id,
+            "product_id": product_id,
+            "quantity": qty,
+            "unit_price": unit_price,
+        })
+        items_out.append(
             OrderItemOut(
-                product_id=i.product_id,
-                quantity=i.quantity,
-                unit_price=float(i.unit_price),
-                product_name=i.product.name if i.product else "",
+                product_id=product_id,
+                quantity=qty,
+                unit_price=unit_price,
+                product_name=product.name,
+            )
+        )
+    db.execute(insert(OrderItem), rows)
+
+    # Contadores y rollup de ventas del dashboard, en la misma transacción que la orden
+    stats.bump(
+        db,
+        orders=1,
+        revenue=sum(Decimal(str(r["unit_price"])) * r["quantity"] for r in rows),
+        low_stock_products=low_stock_products,
+    )
+    sales.record(db, [(created_at, [
+        (pid, products[pid].name, products[pid].category, qty, products[pid].price)
+        for pid, qty in quantities.items()
+    ])])
+
+    out = OrderOut(
+        id=order_id,
+        created_at=created_at,
+        status=order_status,
+        items=items_out,
+    )
+    if before_commit:
+        before_commit(out)
+
+    db.commit()
+    if sold_out:
+        catalog_cache.bump()  # el catálogo cacheado lo muestra disponible
+    return out
+
+
+MY_ORDERS_DEFAULT_PAGE = 50
+# Columnas en el orden que espera el serializador precompilado de OrderOut
+ORDER_COLUMNS = order_row.columns(Order)
+
+
+@router.get("/my", response_model=List[OrderOut])
+@db_endpoint
+def my_orders(
+    db: Session = Depends(get_read_db),
+    current: Principal = Depends(get_current_user),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Tamaño de página (activa la paginación)"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en X-Next-Cursor"),
+):
+    """
+    Devuelve las órdenes del usuario autenticado (más recientes primero).
+    - Keyset por (created_at, id): con `limit`/`cursor` pagina y devuelve el
+      siguiente cursor en `X-Next-Cursor`; sin ellos devuelve todas.
+    - Solo columnas: órdenes en una consulta e items + nombre de producto en
+      otra (sin joinedload ni hidratar Product, sin explosión cartesiana).
+    - Serializadores precompilados + orjson, sin construir modelos Pydantic.
+    """
+    query = (
+        select(*ORDER_COLUMNS)
+        .where(Order.user_id == current.id)
+        .order_by(Order.created_at.desc(), Order.id.desc())
+    )
+    page_size = None
+    if limit is not None or cursor is not None:
+        page_size = limit or MY_ORDERS_DEFAULT_PAGE
+        if cursor:
+            last_created, last_id = decode_cursor(cursor, "orders")
+            query = query.where(
+                keyset_filter([Order.created_at, Order.id], True, [last_created, last_id])
             )
-            for i in (o.items or [])
-        ]
-        result.append(
-            OrderOut(
-                id=o.id,
-                created_at=o.created_at,
-                status=o.status,
-                items=items_out,
+        query = query.limit(page_size + 1)
+
+    orders = db.execute(query).all()
+    headers = {}
+    if page_size is not None and len(orders) > page_size:
+        orders = orders[:page_size]
+        headers["X-Next-Cursor"] = encode_cursor("orders", [orders[-1].created_at, orders[-1].id])
+
+    items_by_order: dict[int, list] = {o.id: [] for o in orders}
+    if orders:
+        # Columnas en el orden de OrderItemOut + order_id al final para agrupar
+        items = db.execute(
+            select(
+                OrderItem.product_id,
+                OrderItem.quantity,
+                OrderItem.unit_price,
+                func.coalesce(Product.name, ""),
+                OrderItem.order_id,
             )
+            .outerjoin(Product, Product.id == OrderItem.product_id)
+            .where(OrderItem.order_id.in_(list(items_by_order)))
+            .order_by(OrderItem.order_id, OrderItem.id)
         )
-    return result
+        for row in items:
+            items_by_order[row[-1]].append(order_item_row.one(row))
+
+    return FastJSONResponse(
+        [order_row.one(o, items=items_by_order[o.id]) for o in orders],
+        headers=headers,
+    )
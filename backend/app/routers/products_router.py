@@ -1,16 +1,133 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import async_session
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy import and_, case, func, select, true
 
-from ..database import get_db
+from ..database import get_db, get_read_db, db_endpoint
 from ..models import Product
-from ..schemas import ProductCreate, ProductUpdate, ProductOut
+from ..schemas import ProductCreate, ProductUpdate, ProductOut, ProductFacetsOut
+from ..pagination import encode_cursor, decode_cursor, keyset_filter
+from ..search import search_clause
+from ..cache import CachedBody, catalog_cache, etag_matches
+from ..serializers import dumps, product_row
+from .. import assets, flash_sale, inventory, stats
 from ..auth import require_role  # para proteger endpoints de admin
 
 router = APIRouter(tags=["Products"])
 
+# Ordenamientos soportados: (clave del cursor, columna, descendente).
+# Todos usan Product.id como desempate para que el orden sea total.
+SORTS = {
+    "Precio: Menor a Mayor": ("price_asc", Product.price, False),
+    "Precio: Mayor a Menor": ("price_desc", Product.price, True),
+    "Nombre A-Z": ("name_asc", Product.name, False),
+    "Nombre Z-A": ("name_desc", Product.name, True),
+}
+DEFAULT_SORT = ("recent", Product.created_at, True)  # Relevancia sin búsqueda
+
+# Columnas en el orden que espera el serializador precompilado de ProductOut
+PRODUCT_COLUMNS = product_row.columns(Product)
+
+DEFAULT_PAGE_SIZE = 50
+STREAM_CHUNK_SIZE = 1000
+
+# Cortes por defecto de los rangos de precio de /products/facets (los del slider del FE)
+PRICE_EDGES = (5000.0, 10000.0, 15000.0)
+MAX_PRICE_EDGES = 20
+
+
+def _product_filters(category, max_price, vegan_only, gluten_free) -> list:
+    filters = []
+
+    # Filtro por categoría
+    if category:
+        filters.append(Product.category == category)
+
+    # Filtro por precio máximo
+    if max_price:
+        filters.append(Product.price <= max_price)
+
+    # Filtro vegano
+    if vegan_only:
+        filters.append(Product.is_vegan == True)
+
+    # Filtro sin gluten
+    if gluten_free:
+        filters.append(Product.is_gluten_free == True)
+
+    return filters
+
+
+def _order_by(column, descending: bool) -> list:
+    if descending:
+        return [column.desc(), Product.id.desc()]
+    return [column.asc(), Product.id.asc()]
+
+
+def catalog_query(db: Session, q, category, max_price, vegan_only, gluten_free, sort_by) -> tuple:
+    """
+    (filtros, clave del cursor, columna de orden, descendente) de GET /products.
+    También lo usa `bench.explain` para revisar los planes de cada combinación.
+    """
+    filters = _product_filters(category, max_price, vegan_only, gluten_free)
+    sort_key, sort_col, descending = SORTS.get(sort_by, DEFAULT_SORT)
+
+    # Búsqueda: full-text/trigram en Postgres, índice invertido en otros motores.
+    # Con "Relevancia" se ordena por el puntaje de la búsqueda.
+    if q:
+        search_filter, rank = search_clause(db, q)
+        filters.append(search_filter)
+        if sort_by not in SORTS:
+            sort_key, sort_col, descending = "relevance", rank, True
+    return filters, sort_key, sort_col, descending
+
+
+def _stream_ndjson(db: Session, stmt):
+    """
+    Genera NDJSON por bloques desde un cursor del lado del servidor
+    (yield_per => stream_results), sin materializar todo el catálogo.
+    Usa la sesión de lectura de la petición (réplica o primario; en modo async
+    la AsyncSession detrás de `db`): su dependencia ya la cerró al empezar el
+    streaming, así que toma otra conexión del mismo engine y la suelta al final.
+    """
+    stmt = stmt.execution_options(yield_per=STREAM_CHUNK_SIZE)
+    adb = async_session(db)
+    if adb is not None:
+        return _stream_ndjson_async(adb, stmt)
+    return _stream_ndjson_sync(db, stmt)
+
+
+def _stream_ndjson_sync(db: Session, stmt):
+    try:
+        for chunk in db.execute(stmt).partitions():
+            yield b"".join(dumps(product_row.one(r)) + b"\n" for r in chunk)
+    finally:
+        db.close()
+
+
+async def _stream_ndjson_async(adb, stmt):
+    try:
+        result = await adb.stream(stmt)
+        async for chunk in result.partitions():
+            yield b"".join(dumps(product_row.one(r)) + b"\n" for r in chunk)
+    finally:
+        await adb.close()
+
+
+def _cached_response(entry: CachedBody, if_none_match: Optional[str]) -> Response:
+    if etag_matches(if_none_match, entry.etag):
+        return Response(status_code=304, headers={"ETag": entry.etag})
+    return Response(
+        content=entry.body,
+        media_type="application/json",
+        headers={"ETag": entry.etag, **dict(entry.headers)},
+    )
+
+
 @router.get("/products", response_model=List[ProductOut])
+@db_endpoint
 def list_products(
     q: Optional[str] = Query(None, description="Búsqueda por nombre o descripción"),
     category: Optional[str] = Query(None, description="Filtrar por categoría"),
@@ -18,55 +135,185 @@ def list_products(
     vegan_only: Optional[bool] = Query(None, description="Solo productos veganos"),
     gluten_free: Optional[bool] = Query(None, description="Solo productos sin gluten"),
     sort_by: Optional[str] = Query("Relevancia", description="Criterio de ordenamiento"),
-    db: Session = Depends(get_db)
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Tamaño de página (activa la paginación)"),
+    cursor: Optional[str] = Query(None, description="Cursor opaco devuelto en X-Next-Cursor"),
+    format: Optional[str] = Query(None, pattern="^(json|ndjson)$", description="ndjson = exportación en streaming"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db)
 ):
-    query = db.query(Product)
-    
-    # Filtro de búsqueda
-    if q:
-        query = query.filter(
-            or_(
-                Product.name.ilike(f"%{q}%"),
-                Product.description.ilike(f"%{q}%")
-            )
+    """
+    Sin `limit` ni `cursor` devuelve el catálogo completo (compatibilidad con el FE).
+    Con `limit`/`cursor` pagina por keyset y devuelve el siguiente cursor en el
+    header `X-Next-Cursor` (ausente en la última página).
+    Con `format=ndjson` transmite todas las filas por bloques.
+    Las respuestas JSON salen de la caché del catálogo y llevan ETag.
+    """
+    q = " ".join(q.split()) if q else None
+    if sort_by not in SORTS:
+        sort_by = "Relevancia"
+
+    # Caché: clave = parámetros normalizados (los filtros falsy no filtran)
+    cache_key = None
+    if format != "ndjson":
+        cache_key = (
+            "list", q.lower() if q else None, category or None, max_price or None,
+            bool(vegan_only), bool(gluten_free), sort_by, limit, cursor,
         )
-    
-    # Filtro por categoría
-    if category:
-        query = query.filter(Product.category == category)
-    
-    # Filtro por precio máximo
-    if max_price:
-        query = query.filter(Product.price <= max_price)
-    
-    # Filtro vegano
-    if vegan_only:
-        query = query.filter(Product.is_vegan == True)
-    
-    # Filtro sin gluten
-    if gluten_free:
-        query = query.filter(Product.is_gluten_free == True)
-    
-    # Ordenamiento
-    if sort_by == "Precio: Menor a Mayor":
-        query = query.order_by(Product.price.asc())
-    elif sort_by == "Precio: Mayor a Menor":
-        query = query.order_by(Product.price.desc())
-    elif sort_by == "Nombre A-Z":
-        query = query.order_by(Product.name.asc())
-    elif sort_by == "Nombre Z-A":
-        query = query.order_by(Product.name.desc())
-    else:  # Relevancia (por defecto)
-        query = query.order_by(Product.created_at.desc())
-    
-    return query.all()
+        cached = catalog_cache.get(cache_key)
+        if cached is not None:
+            return _cached_response(cached, if_none_match)
+    version = catalog_cache.version
+
+    filters, sort_key, sort_col, descending = catalog_query(
+        db, q, category, max_price, vegan_only, gluten_free, sort_by
+    )
+    order_by = _order_by(sort_col, descending)
+
+    if format == "ndjson":
+        stmt = select(*PRODUCT_COLUMNS).where(*filters).order_by(*order_by)
+        return StreamingResponse(_stream_ndjson(db, stmt), media_type="application/x-ndjson")
+
+    # Solo columnas (sin hidratar Product) y serializador precompilado
+    headers = ()
+    if limit is None and cursor is None:
+        rows = db.execute(select(*PRODUCT_COLUMNS).where(*filters).order_by(*order_by)).all()
+    else:
+        # El valor de ordenamiento viaja al final de cada fila para armar el
+        # cursor (la relevancia es una expresión, no un atributo del producto).
+        query = select(*PRODUCT_COLUMNS, sort_col.label("sort_value")).where(*filters).order_by(*order_by)
+
+        page_size = limit or DEFAULT_PAGE_SIZE
+        if cursor:
+            last_value, last_id = decode_cursor(cursor, sort_key)
+            query = query.where(keyset_filter([sort_col, Product.id], descending, [last_value, last_id]))
+
+        rows = db.execute(query.limit(page_size + 1)).all()
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            last = rows[-1]
+            headers = (("X-Next-Cursor", encode_cursor(sort_key, [last.sort_value, last.id])),)
+
+    body = dumps(product_row.many(rows))
+    entry = catalog_cache.make(version, body, headers)
+    catalog_cache.put(cache_key, version, entry)
+    return _cached_response(entry, if_none_match)
+
+def _count_where(*conditions):
+    return func.sum(case((and_(true(), *conditions), 1), else_=0))
+
+
+def _parse_edges(price_edges: Optional[str]) -> tuple:
+    if not price_edges:
+        return PRICE_EDGES
+    try:
+        edges = tuple(sorted({float(e) for e in price_edges.split(",") if e.strip()}))
+    except ValueError:
+        raise HTTPException(status_code=422, detail="price_edges: lista de números separados por coma")
+    if not edges or len(edges) > MAX_PRICE_EDGES:
+        raise HTTPException(status_code=422, detail=f"price_edges: entre 1 y {MAX_PRICE_EDGES} cortes")
+    return edges
+
+
+# Va antes de /products/{product_id}: "facets" no es un id
+@router.get("/products/facets", response_model=ProductFacetsOut)
+@db_endpoint
+def product_facets(
+    q: Optional[str] = Query(None, description="Búsqueda por nombre o descripción"),
+    category: Optional[str] = Query(None, description="Filtrar por categoría"),
+    max_price: Optional[float] = Query(None, description="Precio máximo"),
+    vegan_only: Optional[bool] = Query(None, description="Solo productos veganos"),
+    gluten_free: Optional[bool] = Query(None, description="Solo productos sin gluten"),
+    price_edges: Optional[str] = Query(None, description="Cortes de los rangos de precio, p. ej. 5000,10000"),
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Conteos para el panel de filtros con los mismos parámetros que GET /products.
+    Cada faceta cuenta con todos los filtros salvo el suyo (elegir una categoría
+    no deja las demás en 0). Una sola consulta agrupada por categoría con
+    sumas condicionales; la respuesta sale de la caché del catálogo con ETag.
+    """
+    q = " ".join(q.split()) if q else None
+    edges = _parse_edges(price_edges)
+    cache_key = (
+        "facets", q.lower() if q else None, category or None, max_price or None,
+        bool(vegan_only), bool(gluten_free), edges,
+    )
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return _cached_response(cached, if_none_match)
+    version = catalog_cache.version
+
+    # Mismas reglas que _product_filters, separadas por faceta
+    by_price = [Product.price <= max_price] if max_price else []
+    by_vegan = [Product.is_vegan == True] if vegan_only else []
+    by_gluten = [Product.is_gluten_free == True] if gluten_free else []
+    where = [search_clause(db, q)[0]] if q else []
+
+    bounds = list(zip((None,) + edges, edges + (None,)))
+    buckets = [
+        _count_where(
+            *by_vegan, *by_gluten,
+            *([Product.price > low] if low is not None else []),
+            *([Product.price <= high] if high is not None else []),
+        )
+        for low, high in bounds
+    ]
+    rows = db.execute(
+        select(
+            Product.category,
+            _count_where(*by_price, *by_vegan, *by_gluten),
+            _count_where(Product.is_vegan == True, *by_price, *by_gluten),
+            _count_where(Product.is_vegan == False, *by_price, *by_gluten),
+            _count_where(Product.is_gluten_free == True, *by_price, *by_vegan),
+            _count_where(Product.is_gluten_free == False, *by_price, *by_vegan),
+            *buckets,
+        )
+        .where(*where)
+        .group_by(Product.category)
+    ).all()
+
+    # El filtro de categoría se aplica aquí: cada fila es una categoría
+    selected = [r for r in rows if not category or r[0] == category]
+    totals = [sum(r[i] or 0 for r in selected) for i in range(1, 6 + len(bounds))]
+    body = dumps({
+        "total": totals[0],
+        "category": [
+            {"value": name, "count": count}
+            for name, count in sorted(((r[0], r[1] or 0) for r in rows), key=lambda c: (-c[1], c[0]))
+            if count
+        ],
+        "is_vegan": {"true": totals[1], "false": totals[2]},
+        "is_gluten_free": {"true": totals[3], "false": totals[4]},
+        "price": [
+            {"min": low, "max": high, "count": count}
+            for (low, high), count in zip(bounds, totals[5:])
+        ],
+    })
+    entry = catalog_cache.make(version, body)
+    catalog_cache.put(cache_key, version, entry)
+    return _cached_response(entry, if_none_match)
 
 @router.get("/products/{product_id}", response_model=ProductOut)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    p = db.query(Product).filter(Product.id == product_id).first()
-    if not p:
+@db_endpoint
+def get_product(
+    product_id: int,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_read_db),
+):
+    cache_key = ("product", product_id)
+    cached = catalog_cache.get(cache_key)
+    if cached is not None:
+        return _cached_response(cached, if_none_match)
+    version = catalog_cache.version
+
+    row = db.execute(select(*PRODUCT_COLUMNS).where(Product.id == product_id)).first()
+    if not row:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    return p
+
+    entry = catalog_cache.make(version, dumps(product_row.one(row)))
+    catalog_cache.put(cache_key, version, entry)
+    return _cached_response(entry, if_none_match)
 
 @router.post(
     "/products",
@@ -74,10 +321,15 @@ def get_product(product_id: int, db: Session = Depends(get_db)):
     status_code=201,
     dependencies=[Depends(require_role("ADMIN"))],
 )
+@db_endpoint
 def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
-    p = Product(**payload.model_dump())
+    values = payload.model_dump()
+    values["image_url"] = assets.hashed_url(values["image_url"])
+    p = Product(**values)
     db.add(p)
+    stats.bump(db, products=1, low_stock_products=int(stats.is_low_stock(p.stock)))
     db.commit()
+    catalog_cache.bump()
     db.refresh(p)
     return p
 
@@ -86,13 +338,27 @@ def create_product(payload: ProductCreate, db: Session = Depends(get_db)):
     response_model=ProductOut,
     dependencies=[Depends(require_role("ADMIN"))],
 )
+@db_endpoint
 def update_product(product_id: int, payload: ProductUpdate, db: Session = Depends(get_db)):
     p = db.query(Product).filter(Product.id == product_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
-    for k, v in payload.model_dump(exclude_unset=True).items():
+    old_stock = p.stock
+    changes = payload.model_dump(exclude_unset=True)
+    for k, v in changes.items():
+        if k == "image_url":
+            v = assets.hashed_url(v)
+            if v != p.image_url:
+                p.image_sizes = None  # las miniaturas eran de la imagen anterior
         setattr(p, k, v)
+    if "stock" in changes:
+        db.flush()  # primero la fila del producto, luego los shards (mismo orden que las órdenes)
+        inventory.unshard(db, [p.id])  # el stock editado manda sobre los shards
+    stats.bump(db, low_stock_products=stats.low_stock_delta(old_stock, p.stock))
     db.commit()
+    catalog_cache.bump()
+    if "flash_sale" in changes:
+        flash_sale.invalidate()
     db.refresh(p)
     return p
 
@@ -101,9 +367,12 @@ def update_product(product_id: int, payload: ProductUpdate, db: Session = Depend
     status_code=204,
     dependencies=[Depends(require_role("ADMIN"))],
 )
+@db_endpoint
 def delete_product(product_id: int, db: Session = Depends(get_db)):
     p = db.query(Product).filter(Product.id == product_id).first()
     if not p:
         raise HTTPException(status_code=404, detail="Producto no encontrado")
     db.delete(p)
-    db.commit()
\ No newline at end of file
+    stats.bump(db, products=-1, low_stock_products=-int(stats.is_low_stock(p.stock)))
+    db.commit()
+    catalog_cache.bump()
\ No newline at end of file
@@ -0,0 +1,155 @@
+# backend/app/sales.py
+"""
+Rollup de ventas diarias (tabla sales_rollup) para GET /admin/sales.
+
+- `record()` suma los deltas de las órdenes con un upsert (ON CONFLICT suma)
+  dentro de la transacción que las crea, antes del commit: el rollup y la
+  orden se confirman o se revierten juntos y el dashboard no re-escanea
+  order_items. Las filas se tocan en orden de clave (sin deadlocks entre
+  checkouts); un lote de venta flash hace un solo upsert para todo el lote.
+- `rebuild()` recalcula días completos desde orders/order_items: backfill
+  inicial y `python -m app.manage sales-repair` (herramienta manual, p. ej.
+  tras corregir órdenes a mano). Las órdenes que se confirmen mientras corre
+  sobre un día con ventas pueden contarse dos veces: úsalo sobre días cerrados
+  o con poco tráfico.
+"""
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import cast, delete, func, insert, literal, select, update, String
+from sqlalchemy.orm import Session
+
+from .models import Order, OrderItem, Product, SalesRollup
+
+DIMENSIONS = ("day", "category", "product")
+
+
+def record(db: Session, orders: Iterable[tuple]) -> int:
+    """
+    Suma al rollup las órdenes (created_at, lines) en la transacción de `db`
+    (sin commit). `lines`: (product_id, product_name, category, quantity,
+    unit_price). Devuelve cuántas filas tocó.
+    """
+    # (day, dimension, key) -> [label, revenue, units, orders]
+    deltas: dict = {}
+
+    def add(day, dimension, key, label, revenue, units, count):
+        acc = deltas.setdefault((day, dimension, key), [label, Decimal(0), 0, 0])
+        acc[1] += revenue
+        acc[2] += units
+        acc[3] += count
+
+    for created_at, lines in orders:
+        day = created_at.date()
+        total_revenue, total_units = Decimal(0), 0
+        categories: dict = {}
+        for product_id, name, category, quantity, unit_price in lines:
+            revenue = Decimal(str(unit_price)) * quantity
+            total_revenue += revenue
+            total_units += quantity
+            add(day, "product", str(product_id), name, revenue, quantity, 1)
+            cat = categories.setdefault(category, [Decimal(0), 0])
+            cat[0] += revenue
+            cat[1] += quantity
+        for category, (revenue, units) in categories.items():
+            add(day, "category", category, category, revenue, units, 1)
+        add(day, "day", "", "", total_revenue, total_units, 1)
+
+    if deltas:
+        _upsert(db, [
+            {"day": day, "dimension": dim, "key": key, "label": label[:120],
+             "revenue": revenue, "units": units, "orders": count}
+            for (day, dim, key), (label, revenue, units, count) in sorted(deltas.items())
+        ])
+    return len(deltas)
+
+
+def _upsert(db: Session, rows: list) -> None:
+    dialect = db.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        if dialect == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(SalesRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "dimension", "key"],
+            set_={
+                "label": stmt.excluded.label,
+                "revenue": SalesRollup.revenue + stmt.excluded.revenue,
+                "units": SalesRollup.units + stmt.excluded.units,
+                "orders": SalesRollup.orders + stmt.excluded.orders,
+            },
+        )
+        db.execute(stmt, rows)
+        return
+
+    # Otros motores: UPDATE y, si no existía, INSERT
+    for r in rows:
+        updated = db.execute(
+            update(SalesRollup)
+            .where(
+                SalesRollup.day == r["day"],
+                SalesRollup.dimension == r["dimension"],
+                SalesRollup.key == r["key"],
+            )
+            .values(
+                label=r["label"],
+                revenue=SalesRollup.revenue + r["revenue"],
+                units=SalesRollup.units + r["units"],
+                orders=SalesRollup.orders + r["orders"],
+            )
+        )
+        if not updated.rowcount:
+            db.execute(insert(SalesRollup), [r])
+
+
+def rebuild(db: Session, day_from: date, day_to: date) -> None:
+    """Recalcula en SQL los días [day_from, day_to] desde orders/order_items."""
+    start = datetime.combine(day_from, datetime.min.time())
+    end = datetime.combine(day_to + timedelta(days=1), datetime.min.time())
+    day = func.date(Order.created_at)
+    revenue = func.sum(OrderItem.quantity * OrderItem.unit_price)
+    units = func.sum(OrderItem.quantity)
+    orders = func.count(func.distinct(Order.id))
+    base = (
+        select()
+        .select_from(Order)
+        .join(OrderItem, OrderItem.order_id == Order.id)
+        .join(Product, Product.id == OrderItem.product_id)
+        .where(Order.created_at >= start, Order.created_at < end)
+    )
+    queries = {
+        "day": base.add_columns(day, literal("day"), literal(""), literal(""), revenue, units, orders)
+                   .group_by(day),
+        "category": base.add_columns(day, literal("category"), Product.category, Product.category,
+                                     revenue, units, orders)
+                        .group_by(day, Product.category),
+        "product": base.add_columns(day, literal("product"), cast(Product.id, String), Product.name,
+                                    revenue, units, orders)
+                       .group_by(day, Product.id, Product.name),
+    }
+    cols = ["day", "dimension", "key", "label", "revenue", "units", "orders"]
+    db.execute(delete(SalesRollup).where(SalesRollup.day >= day_from, SalesRollup.day <= day_to))
+    for q in queries.values():
+        db.execute(insert(SalesRollup).from_select(cols, q))
+    db.commit()
+
+
+def backfill_if_empty(db: Session) -> None:
+    if db.scalar(select(SalesRollup.day).limit(1)) is not None:
+        return
+    first, last = db.execute(select(func.min(Order.created_at), func.max(Order.created_at))).one()
+    if first is not None:
+        rebuild(db, first.date(), last.date())
+
+
+def repair(db: Session, day_from: Optional[date] = None, day_to: Optional[date] = None) -> Tuple[date, date]:
+    """Recalcula [day_from, day_to] (por defecto ayer, UTC) desde las órdenes."""
+    day_to = day_to or day_from or datetime.utcnow().date() - timedelta(days=1)
+    day_from = day_from or day_to
+    if day_from > day_to:
+        raise ValueError(f"Rango vacío: {day_from} es posterior a {day_to}")
+    rebuild(db, day_from, day_to)
+    return day_from, day_to
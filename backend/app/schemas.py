@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr, Field
 from pydantic import BaseModel, ConfigDict
 from datetime import datetime
@@ -48,12 +48,31 @@ class ProductUpdate(BaseModel):
     category: str | None = None
     is_vegan: bool | None = None
     is_gluten_free: bool | None = None
+    flash_sale: bool | None = None
 
 class ProductOut(ProductBase):
     id: int
     created_at: datetime
+    image_sizes: Dict[str, str] | None = None
+    flash_sale: bool = False
     model_config = ConfigDict(from_attributes=True)
 
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+class PriceBucket(BaseModel):
+    min: float | None  # exclusivo (None = desde 0)
+    max: float | None  # inclusivo, como max_price (None = sin tope)
+    count: int
+
+class ProductFacetsOut(BaseModel):
+    total: int
+    category: List[FacetCount]
+    is_vegan: Dict[str, int]
+    is_gluten_free: Dict[str, int]
+    price: List[PriceBucket]
+
 # Orders
 class OrderItemIn(BaseModel):
     product_id: int
@@ -65,6 +84,19 @@ class OrderItemOut(BaseModel):
     unit_price: float
     product_name: str
 
+class CartItemOut(BaseModel):
+    product_id: int
+    product_name: str
+    unit_price: float
+    quantity: int
+    expires_at: datetime
+
+class CartOut(BaseModel):
+    items: List[CartItemOut]
+    total: float
+    # Vencimiento más próximo de las reservas (None con el carrito vacío)
+    expires_at: Optional[datetime] = None
+
 class OrderCreate(BaseModel):
     items: List[OrderItemIn]
 
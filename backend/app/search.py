@@ -0,0 +1,264 @@
+# backend/app/search.py
+"""
+Búsqueda de productos para el parámetro `q` de GET /products.
+
+- Postgres: columna `search_vector` (tsvector generado, config 'spanish')
+  con índice GIN + pg_trgm (`<%`, word_similarity) para tolerar errores de tipeo.
+- Otros motores (SQLite / pruebas locales): índice invertido en memoria
+  que se reconstruye cuando cambia el nombre/descripción de algún producto.
+  El índice es por proceso: cada escritura de texto sube, en su transacción,
+  el contador `search_index` (app/stats.py) y cada búsqueda lo compara con la
+  versión con que se construyó, así los cambios hechos por otro worker se ven
+  en la siguiente búsqueda.
+
+Ambos devuelven (filtro, expresión de relevancia) para usar en la consulta.
+La relevancia es numeric con 6 decimales en los dos: el cursor guarda ese
+valor exacto y la página siguiente compara contra la misma expresión (un
+float4 de ts_rank_cd vuelto a calcular como float8 saltaba o repetía empates).
+"""
+import logging
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from typing import Any, Tuple
+
+from sqlalchemy import Numeric, case, cast, event, false, func, inspect, literal, literal_column, or_, select, text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from .models import Product
+from . import stats
+
+logger = logging.getLogger(__name__)
+
+TS_CONFIG = "spanish"
+TRGM_THRESHOLD = 0.4  # similitud mínima para aceptar un término "parecido"
+RANK_TYPE = Numeric(12, 6)
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    f"""
+    ALTER TABLE products ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (search_vector)",
+    "CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING GIN (name gin_trgm_ops)",
+]
+
+_pg_ready = None  # None: aún no se comprobó si existe la columna (migración 0003)
+
+
+def create_search_objects(conn) -> bool:
+    """
+    Crea columna/índices de búsqueda en Postgres (migración 0003). Si falla
+    (p. ej. sin permiso para pg_trgm) se revierte solo esto y queda el índice
+    en memoria.
+    """
+    if conn.dialect.name != "postgresql":
+        return False
+    try:
+        with conn.begin_nested():
+            for ddl in POSTGRES_DDL:
+                conn.execute(text(ddl))
+        return True
+    except SQLAlchemyError as exc:
+        logger.warning("Búsqueda full-text no disponible, uso índice en memoria: %s", exc)
+        return False
+
+
+def _postgres_ready(db: Session) -> bool:
+    """Se comprueba una vez por proceso, en la primera búsqueda (no al arrancar)."""
+    global _pg_ready
+    if _pg_ready is None:
+        _pg_ready = db.execute(text(
+            "SELECT 1 FROM information_schema.columns"
+            " WHERE table_name = 'products' AND column_name = 'search_vector'"
+        )).first() is not None
+    return _pg_ready
+
+
+def search_clause(db: Session, q: str) -> Tuple[Any, Any]:
+    """Devuelve (filtro, relevancia) para la búsqueda `q`."""
+    if db.get_bind().dialect.name == "postgresql" and _postgres_ready(db):
+        return _postgres_clause(q)
+    return memory_index.clause(db, q)
+
+
+def _postgres_clause(q: str):
+    vector = literal_column("products.search_vector")
+    tsq = func.websearch_to_tsquery(TS_CONFIG, q)
+    # `q <% name` usa el índice trigram (word_similarity sobre palabras del nombre)
+    flt = or_(vector.op("@@")(tsq), literal(q).op("<%")(Product.name))
+    rank = func.ts_rank_cd(vector, tsq) + func.word_similarity(q, Product.name)
+    return flt, cast(rank, RANK_TYPE)
+
+
+# =======================
+#   Índice en memoria
+# =======================
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def _normalize(s: str) -> str:
+    s = unicodedata.normalize("NFKD", s.lower())
+    return "".join(ch for ch in s if not unicodedata.combining(ch))
+
+
+def _stem(token: str) -> str:
+    # Stemming mínimo en español: plurales (sabor-es, dulce-s)
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lrndj":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+def tokenize(s: str) -> list:
+    return [_stem(t) for t in _WORD_RE.findall(_normalize(s or ""))]
+
+
+def _trigrams(token: str) -> set:
+    padded = f"  {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class InvertedIndex:
+    """token -> {product_id: peso}. Nombre pesa más que descripción."""
+
+    NAME_WEIGHT = 2.0
+    DESCRIPTION_WEIGHT = 1.0
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stale = True
+        self._version = None  # stats.version("search_index") con que se construyó
+        self._postings: dict = {}
+        self._by_trigram: dict = {}
+
+    def mark_stale(self) -> None:
+        self._stale = True
+
+    def _rebuild(self, db: Session, version: int) -> None:
+        postings: dict = defaultdict(lambda: defaultdict(float))
+        rows = db.execute(select(Product.id, Product.name, Product.description))
+        for pid, name, description in rows:
+            for tok in tokenize(name):
+                postings[tok][pid] += self.NAME_WEIGHT
+            for tok in tokenize(description):
+                postings[tok][pid] += self.DESCRIPTION_WEIGHT
+        by_trigram: dict = defaultdict(set)
+        for tok in postings:
+            for tri in _trigrams(tok):
+                by_trigram[tri].add(tok)
+        self._postings = {k: dict(v) for k, v in postings.items()}
+        self._by_trigram = dict(by_trigram)
+        self._version = version
+        self._stale = False
+
+    def _expand(self, token: str) -> dict:
+        """Términos del vocabulario que casan con `token`: exacto, prefijo o parecido."""
+        matches = {}
+        if token in self._postings:
+            matches[token] = 1.0
+        for term in self._postings:
+            if term != token and term.startswith(token):
+                matches.setdefault(term, 0.8)
+        if not matches:
+            grams = _trigrams(token)
+            candidates = set()
+            for tri in grams:
+                candidates |= self._by_trigram.get(tri, set())
+            for term in candidates:
+                other = _trigrams(term)
+                sim = len(grams & other) / len(grams | other)
+                if sim >= TRGM_THRESHOLD:
+                    matches[term] = sim
+        return matches
+
+    def search(self, db: Session, q: str) -> dict:
+        """Devuelve {product_id: score}; todos los términos deben casar (AND)."""
+        with self._lock:
+            # Versión leída antes que los productos: si otro proceso confirma
+            # entretanto, la próxima búsqueda vuelve a reconstruir
+            version = stats.version(db, "search_index")
+            if self._stale or version != self._version:
+                self._rebuild(db, version)
+            postings = self._postings
+            scores = None
+            for token in tokenize(q):
+                token_scores: dict = defaultdict(float)
+                for term, quality in self._expand(token).items():
+                    for pid, weight in postings[term].items():
+                        token_scores[pid] = max(token_scores[pid], weight * quality)
+                if scores is None:
+                    scores = dict(token_scores)
+                else:
+                    scores = {pid: s + token_scores[pid] for pid, s in scores.items() if pid in token_scores}
+            return scores or {}
+
+    def clause(self, db: Session, q: str):
+        scores = self.search(db, q)
+        if not scores:
+            return false(), literal(0.0)
+        scores = {pid: round(score, 6) for pid, score in scores.items()}
+        rank = cast(case(scores, value=Product.id, else_=0.0), RANK_TYPE)
+        return Product.id.in_(list(scores)), rank
+
+
+memory_index = InvertedIndex()
+
+
+# Mantener el índice en memoria al día: se marca la sesión en el flush y
+# el índice se invalida al confirmar (no antes, para no reconstruirlo a medias).
+@event.listens_for(Product, "after_insert")
+@event.listens_for(Product, "after_delete")
+def _product_written(mapper, connection, target):
+    _flag_session(target)
+
+
+@event.listens_for(Product, "after_update")
+def _product_updated(mapper, connection, target):
+    state = inspect(target)
+    if state.attrs.name.history.has_changes() or state.attrs.description.history.has_changes():
+        _flag_session(target)
+
+
+def _flag_session(target) -> None:
+    session = Session.object_session(target)
+    if session is not None:
+        session.info["search_dirty"] = True
+
+
+def touch(db: Session) -> None:
+    """
+    Invalida el índice en memoria de todos los procesos: sube `search_index`
+    en la transacción de `db` (sin commit). Para escrituras de productos que no
+    pasan por el ORM (p. ej. la importación masiva).
+    """
+    db.info["search_dirty"] = True
+    if not db.info.get("search_touched"):
+        db.info["search_touched"] = True
+        stats.bump(db, search_index=1)
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session, flush_context):
+    if session.info.get("search_dirty") and not session.info.get("search_touched"):
+        touch(session)
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(session):
+    session.info.pop("search_touched", None)
+    if session.info.pop("search_dirty", False):
+        memory_index.mark_stale()
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("search_dirty", None)
+    session.info.pop("search_touched", None)
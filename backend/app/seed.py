@@ -0,0 +1,63 @@
+# backend/app/seed.py
+"""
+Datos iniciales (admin y productos de ejemplo). Se ejecuta explícitamente con
+`python -m app.manage seed`, no en cada arranque: es idempotente.
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .auth import seed_admin
+from .models import Product
+from . import assets, stats
+
+SAMPLE_PRODUCTS = [
+    dict(
+        name="Gomitas de Fruta", description="Gomitas surtidas",
+        price=3.50, stock=100, image_url="/static/gomitas.svg",
+        category="Gomitas", is_vegan=True, is_gluten_free=True
+    ),
+    dict(
+        name="Chocolate Amargo 70%", description="Tableta premium",
+        price=5.99, stock=50, image_url="/static/chocolate.svg",
+        category="Chocolates", is_vegan=False, is_gluten_free=True
+    ),
+    dict(
+        name="Chicle de Menta", description="Paquete x10",
+        price=1.99, stock=200, image_url="/static/chicle.svg",
+        category="Caramelos", is_vegan=True, is_gluten_free=True
+    ),
+    dict(
+        name="Galletas de Chocolate", description="Galletas crujientes",
+        price=4.50, stock=75, image_url="/static/chocolate.svg",
+        category="Galletas", is_vegan=False, is_gluten_free=False
+    ),
+    dict(
+        name="Confites Colombianos", description="Dulces tradicionales",
+        price=6.00, stock=30, image_url="/static/gomitas.svg",
+        category="Colombianos", is_vegan=True, is_gluten_free=True
+    ),
+    dict(
+        name="Bebida de Chocolate", description="Chocolate caliente",
+        price=3.00, stock=40, image_url="/static/chocolate.svg",
+        category="Bebidas", is_vegan=False, is_gluten_free=True
+    ),
+]
+
+
+def seed_sample_products(db: Session) -> int:
+    """Productos de ejemplo (solo si no hay ninguno)."""
+    if db.scalar(select(func.count()).select_from(Product)):
+        return 0
+    db.add_all(
+        Product(**{**data, "image_url": assets.hashed_url(data["image_url"])}) for data in SAMPLE_PRODUCTS
+    )
+    db.commit()
+    return len(SAMPLE_PRODUCTS)
+
+
+def run(db: Session) -> dict:
+    seed_admin(db)
+    created = seed_sample_products(db)
+    # Contadores del dashboard: crea filas faltantes y corrige deriva
+    stats.reconcile(db)
+    return {"sample_products": created}
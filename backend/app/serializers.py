@@ -0,0 +1,106 @@
+# backend/app/serializers.py
+"""
+Camino rápido de serialización JSON (opt-in por endpoint).
+
+- `dumps()` usa orjson si está instalado y cae a la json estándar si no.
+- `FastJSONResponse` es el response class respaldado por `dumps()`.
+- `RowSerializer` se "compila" una vez a partir de un modelo Pydantic de
+  salida (ProductOut, OrderItemOut, OrderOut) y convierte filas Row de
+  SQLAlchemy a dict leyendo por índice: sin hidratar ORM, sin validar de
+  nuevo con from_attributes, y con Decimal -> float hecho una sola vez.
+
+El JSON producido es el mismo que el de `model_dump_json()` para esos modelos.
+"""
+import json
+import typing
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Iterable, Sequence
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependencia opcional
+    orjson = None
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Tipo no serializable: {type(value).__name__}")
+
+
+def dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, separators=(",", ":"), ensure_ascii=False).encode()
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def _converter(annotation) -> str:
+    """Expresión de conversión para un campo; '{v}' es el valor leído de la fila."""
+    args = typing.get_args(annotation)
+    optional = type(None) in args
+    if optional:
+        annotation = next(a for a in args if a is not type(None))
+    if annotation is float:
+        expr = "float({v})"  # Numeric -> Decimal: se convierte aquí, una vez
+    elif annotation is datetime and orjson is None:
+        expr = "{v}.isoformat()"
+    else:
+        return "{v}"
+    return f"(None if {{v}} is None else {expr})" if optional else expr
+
+
+class RowSerializer:
+    """
+    Serializador precompilado de filas -> dict para `model`.
+
+    `fields` es el orden de columnas que se espera en la fila (por defecto, los
+    campos del modelo menos `exclude`); los campos excluidos se pasan como
+    keyword a `one()` (p. ej. `items` de OrderOut).
+    """
+
+    def __init__(self, model: type[BaseModel], fields: Sequence[str] = (), exclude: Iterable[str] = ()):
+        exclude = set(exclude)
+        self.model = model
+        self.fields = tuple(fields) or tuple(n for n in model.model_fields if n not in exclude)
+        self.extra = tuple(n for n in model.model_fields if n not in self.fields)
+
+        index = {name: i for i, name in enumerate(self.fields)}
+        entries = []
+        for name, info in model.model_fields.items():  # mismo orden que model_dump_json()
+            if name in index:
+                value = _converter(info.annotation).format(v=f"row[{index[name]}]")
+            else:
+                value = name
+            entries.append(f"{name!r}: {value}")
+        keywords = ", *, " + ", ".join(self.extra) if self.extra else ""
+        src = f"def serialize(row{keywords}):\n    return {{{', '.join(entries)}}}\n"
+        namespace: dict = {}
+        exec(compile(src, f"<serializer {model.__name__}>", "exec"), namespace)
+        # Se expone la función generada tal cual: sin envoltorio por fila
+        self.one = namespace["serialize"]
+
+    def columns(self, entity) -> list:
+        """Columnas del modelo ORM `entity` en el orden que espera el serializador."""
+        return [getattr(entity, name) for name in self.fields]
+
+    def many(self, rows) -> list:
+        return list(map(self.one, rows))
+
+
+# ===== Serializadores precompilados =====
+from .schemas import OrderItemOut, OrderOut, ProductOut  # noqa: E402
+
+product_row = RowSerializer(ProductOut)
+order_row = RowSerializer(OrderOut, exclude=("items",))
+order_item_row = RowSerializer(OrderItemOut)
@@ -0,0 +1,147 @@
+# backend/app/stats.py
+"""
+Contadores del dashboard admin (GET /admin/overview) mantenidos en línea.
+
+Cada escritura relevante (registro, alta/edición/baja de producto, orden)
+llama a `bump()` dentro de SU transacción, así el contador se confirma o se
+revierte junto con el dato. Cada contador está repartido en SHARDS filas y
+cada escritura toca una al azar: las órdenes concurrentes no se serializan en
+una única fila. Leer es sumar NAMES x SHARDS filas (O(1) respecto a las tablas).
+
+`reconcile()` recalcula los valores reales y corrige la deriva; corre al
+arrancar y periódicamente en un hilo (STATS_RECONCILE_MINUTES).
+
+VERSIONS son contadores que solo crecen (p. ej. la versión del texto del
+catálogo para el índice de búsqueda en memoria): mismas filas y `bump()`,
+pero no se reconcilian ni salen en el dashboard. Se leen con `version()`.
+"""
+import logging
+import random
+import threading
+import time
+from decimal import Decimal
+
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .database import SessionLocal
+from .models import Order, OrderItem, Product, StatCounter, User
+
+logger = logging.getLogger(__name__)
+
+SHARDS = 8
+NAMES = ("users", "products", "orders", "revenue", "low_stock_products")
+VERSIONS = ("search_index",)
+
+
+def is_low_stock(stock) -> bool:
+    return stock is not None and stock <= settings.low_stock_threshold
+
+
+def low_stock_delta(old_stock, new_stock) -> int:
+    """+1 si el producto entra en stock bajo, -1 si sale, 0 si no cambia."""
+    return int(is_low_stock(new_stock)) - int(is_low_stock(old_stock))
+
+
+def bump(db: Session, **deltas) -> None:
+    """Suma `deltas` a los contadores (sin commit: va con la transacción actual)."""
+    shard = random.randrange(SHARDS)
+    for name, delta in deltas.items():
+        if not delta:
+            continue
+        db.execute(
+            update(StatCounter)
+            .where(StatCounter.name == name, StatCounter.shard == shard)
+            .values(value=StatCounter.value + delta)
+            .execution_options(synchronize_session=False)
+        )
+
+
+def version(db: Session, name: str) -> int:
+    return int(db.scalar(select(func.sum(StatCounter.value)).where(StatCounter.name == name)) or 0)
+
+
+def read(db: Session) -> dict:
+    rows = db.execute(
+        select(StatCounter.name, func.sum(StatCounter.value))
+        .where(StatCounter.name.in_(NAMES))
+        .group_by(StatCounter.name)
+    ).all()
+    values = {name: Decimal(0) for name in NAMES}
+    values.update({name: Decimal(total or 0) for name, total in rows})
+    return {
+        name: (float(v) if name == "revenue" else int(v))
+        for name, v in values.items()
+    }
+
+
+def _actual(db: Session) -> dict:
+    revenue = db.scalar(select(func.coalesce(func.sum(OrderItem.quantity * OrderItem.unit_price), 0)))
+    return {
+        "users": db.scalar(select(func.count()).select_from(User)),
+        "products": db.scalar(select(func.count()).select_from(Product)),
+        "orders": db.scalar(select(func.count()).select_from(Order)),
+        "revenue": Decimal(revenue or 0),
+        "low_stock_products": db.scalar(
+            select(func.count()).select_from(Product).where(Product.stock <= settings.low_stock_threshold)
+        ),
+    }
+
+
+def reconcile(db: Session) -> dict:
+    """
+    Recalcula con conteos completos y ajusta la deriva en el shard 0.
+    En Postgres usa REPEATABLE READ para que conteos y contadores vean la misma foto.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+
+    existing = {(n, s) for n, s in db.execute(select(StatCounter.name, StatCounter.shard))}
+    missing = [
+        StatCounter(name=n, shard=s, value=0)
+        for n in NAMES + VERSIONS for s in range(SHARDS) if (n, s) not in existing
+    ]
+    if missing:
+        db.add_all(missing)
+        db.flush()
+
+    actual = _actual(db)
+    current = {
+        name: Decimal(total or 0)
+        for name, total in db.execute(
+            select(StatCounter.name, func.sum(StatCounter.value)).group_by(StatCounter.name)
+        )
+    }
+    drift = {}
+    for name in NAMES:
+        delta = Decimal(actual[name]) - current.get(name, Decimal(0))
+        if delta:
+            drift[name] = delta
+            db.execute(
+                update(StatCounter)
+                .where(StatCounter.name == name, StatCounter.shard == 0)
+                .values(value=StatCounter.value + delta)
+                .execution_options(synchronize_session=False)
+            )
+    db.commit()
+    if drift:
+        logger.info("Contadores del dashboard corregidos: %s", drift)
+    return drift
+
+
+def _reconcile_loop(interval_seconds: float) -> None:
+    while True:
+        time.sleep(interval_seconds)
+        try:
+            with SessionLocal() as db:
+                reconcile(db)
+        except Exception:
+            logger.exception("No se pudieron reconciliar los contadores del dashboard")
+
+
+def start_reconcile_job() -> None:
+    interval = settings.stats_reconcile_minutes * 60
+    if interval <= 0:
+        return
+    threading.Thread(target=_reconcile_loop, args=(interval,), name="stats-reconcile", daemon=True).start()
@@ -0,0 +1,188 @@
+# backend/bench/explain.py
+"""
+Planes de consulta del catálogo: EXPLAIN de la primera página de GET /products
+(`limit`) y de la siguiente (`cursor`, keyset desde la última fila) para cada
+`sort_by` y cada combinación de filtros (categoría, precio máximo, vegano, sin
+gluten), con la misma consulta que arma el router.
+
+    cd backend && python -m bench.explain --database-url sqlite:///bench.db --reset --products 20000
+
+Sale con código 1 si alguna consulta recorre `products` entera (seq scan) u
+ordena en memoria (filesort: TEMP B-TREE en SQLite, Sort en Postgres) en vez
+de leer un índice en orden, y la tabla tiene más de --max-seq-rows filas.
+
+Sin `limit` el catálogo completo se devuelve igual: ahí un scan es legítimo y
+no se revisa. La búsqueda (`q`) tiene sus propios índices (app/search.py).
+"""
+import argparse
+import itertools
+import json
+import re
+import sys
+from typing import List, Optional
+
+from sqlalchemy import func, select, text
+
+from .seed import CATEGORIES, add_arguments as add_seed_arguments
+
+MAX_PRICE = 10
+
+
+def combinations() -> List[dict]:
+    from app.routers.products_router import SORTS
+
+    combos = []
+    for sort_by, category, max_price, vegan_only, gluten_free in itertools.product(
+        ("Relevancia",) + tuple(SORTS), (None, CATEGORIES[0]), (None, MAX_PRICE), (None, True), (None, True),
+    ):
+        combos.append({
+            "sort_by": sort_by, "category": category, "max_price": max_price,
+            "vegan_only": vegan_only, "gluten_free": gluten_free,
+        })
+    return combos
+
+
+def first_page(db, params: dict):
+    from app.routers.products_router import DEFAULT_PAGE_SIZE, PRODUCT_COLUMNS, _order_by, catalog_query
+
+    filters, _, sort_col, descending = catalog_query(db, None, **params)
+    return (
+        select(*PRODUCT_COLUMNS, sort_col.label("sort_value"))
+        .where(*filters)
+        .order_by(*_order_by(sort_col, descending))
+        .limit(DEFAULT_PAGE_SIZE + 1)
+    )
+
+
+def cursor_page(db, params: dict):
+    """
+    La página siguiente a la primera, como la arma el router con `cursor`
+    (keyset desde la última fila). None si la combinación cabe en una página.
+    """
+    from app.models import Product
+    from app.pagination import keyset_filter
+    from app.routers.products_router import DEFAULT_PAGE_SIZE, catalog_query
+
+    _, _, sort_col, descending = catalog_query(db, None, **params)
+    page = first_page(db, params)
+    rows = db.execute(page).all()
+    if len(rows) <= DEFAULT_PAGE_SIZE:
+        return None
+    last = rows[DEFAULT_PAGE_SIZE - 1]
+    return page.where(keyset_filter([sort_col, Product.id], descending, [last.sort_value, last.id]))
+
+
+# =======================
+#   Planes por motor
+# =======================
+_SQLITE_SCAN = re.compile(r"^SCAN products(?! USING)")
+_SQLITE_INDEX = re.compile(r"USING (?:COVERING )?INDEX (\w+)")
+
+
+def _sqlite_plan(db, sql: str) -> dict:
+    details = [row[3] for row in db.execute(text(f"EXPLAIN QUERY PLAN {sql}"))]
+    return {
+        "seq_scan": any(_SQLITE_SCAN.match(d) for d in details),
+        "sort": any("TEMP B-TREE FOR ORDER BY" in d for d in details),
+        "indexes": sorted({m for d in details for m in _SQLITE_INDEX.findall(d)}),
+        "plan": details,
+    }
+
+
+def _postgres_plan(db, sql: str) -> dict:
+    root = db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()[0]["Plan"]
+    nodes, stack = [], [root]
+    while stack:
+        node = stack.pop()
+        nodes.append(node)
+        stack.extend(node.get("Plans", []))
+    return {
+        "seq_scan": any(n["Node Type"] == "Seq Scan" and n.get("Relation Name") == "products" for n in nodes),
+        "sort": any(n["Node Type"] in ("Sort", "Incremental Sort") for n in nodes),
+        "indexes": sorted({n["Index Name"] for n in nodes if "Index Name" in n}),
+        "plan": [n["Node Type"] for n in nodes],
+    }
+
+
+def explain(db, stmt) -> dict:
+    dialect = db.get_bind().dialect
+    sql = str(stmt.compile(dialect=dialect, compile_kwargs={"literal_binds": True}))
+    if dialect.name == "sqlite":
+        return _sqlite_plan(db, sql)
+    if dialect.name == "postgresql":
+        return _postgres_plan(db, sql)
+    raise SystemExit(f"EXPLAIN no soportado para {dialect.name}")
+
+
+def run(db, max_seq_rows: int) -> dict:
+    from app.models import Product
+
+    db.execute(text("ANALYZE"))  # estadísticas frescas para el planificador
+    db.commit()
+    rows = db.scalar(select(func.count()).select_from(Product))
+    results, failures = [], []
+    for params in combinations():
+        pages = (("first", first_page(db, params)), ("cursor", cursor_page(db, params)))
+        for page, stmt in pages:
+            if stmt is None:
+                continue
+            plan = explain(db, stmt)
+            entry = {"params": {k: v for k, v in params.items() if v is not None}, "page": page, **plan}
+            results.append(entry)
+            if (plan["seq_scan"] or plan["sort"]) and rows > max_seq_rows:
+                failures.append(entry)
+    return {
+        "products": rows,
+        "max_seq_rows": max_seq_rows,
+        "checked": len(results),
+        "seq_scans": sum(r["seq_scan"] for r in results),
+        "sorts": sum(r["sort"] for r in results),
+        "failures": failures,
+        "results": results,
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_seed_arguments(parser)
+    parser.set_defaults(products=20000, users=10, orders=0)
+    parser.add_argument("--max-seq-rows", type=int, default=1000,
+                        help="Con más productos que esto, un seq scan o un sort es un fallo")
+    parser.add_argument("--out", help="Archivo JSON con el plan de cada combinación")
+    args = parser.parse_args(argv)
+
+    import os
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from app import migrations
+    from app.database import SessionLocal, engine
+    from .seed import reset, seed
+
+    if args.reset:
+        reset(engine)
+    else:
+        migrations.upgrade(engine)
+    with SessionLocal() as db:
+        seed(db, args.products, args.users, args.orders, args.seed)
+        report = run(db, args.max_seq_rows)
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False, default=str)
+    for r in report["results"]:
+        flags = ("SEQ SCAN " if r["seq_scan"] else "") + ("SORT " if r["sort"] else "")
+        print(
+            f"{flags or 'ok '}{r['page']:6} {json.dumps(r['params'], ensure_ascii=False)} "
+            f"-> {', '.join(r['indexes']) or '-'}"
+        )
+    print(
+        f"{report['checked']} consultas, {report['seq_scans']} seq scans, "
+        f"{report['sorts']} con sort en memoria ({report['products']} productos)"
+    )
+    if report["failures"]:
+        print(f"FALLO: {len(report['failures'])} consultas con seq scan o sort en memoria", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+# backend/bench/load.py
+"""
+Prueba de carga reproducible de los caminos calientes de la API.
+
+    # En proceso (sin servidor), contra un SQLite de prueba:
+    cd backend && python -m bench.load --database-url sqlite:///bench.db --reset \
+        --products 2000 --users 200 --orders 5000 --duration 10 --out bench.json
+
+    # Contra un servidor levantado (la BD se siembra directo con --database-url):
+    python -m bench.load --url http://localhost:8000 --database-url postgresql+psycopg2://...
+
+    # Comparar con una corrida anterior (sale con código 1 si hay regresión):
+    python -m bench.load ... --baseline bench-main.json --max-regression 0.15
+
+Escenarios (lazo cerrado, `--concurrency` clientes durante `--duration` s c/u):
+- products: GET /products con mezcla fija de filtros, orden, búsqueda y páginas
+- login: POST /auth/login
+- orders: POST /orders sobre pocos SKUs calientes (contención de filas)
+- my_orders: GET /orders/my?limit=20
+
+Imprime (y con --out guarda) JSON: rps, p50/p95/p99/max en ms y códigos por escenario.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+from .seed import BENCH_PASSWORD, add_arguments as add_seed_arguments, user_email
+
+SCENARIOS = ("products", "login", "orders", "my_orders")
+# Mezcla de consultas del catálogo (misma distribución en todas las corridas)
+PRODUCT_QUERIES = (
+    {},
+    {"category": "Chocolates"},
+    {"category": "Gomitas", "sort_by": "Precio: Menor a Mayor"},
+    {"max_price": 10, "vegan_only": "true"},
+    {"gluten_free": "true", "sort_by": "Nombre A-Z"},
+    {"q": "chocolate"},
+    {"q": "menta fresa"},
+    {"limit": 50},
+    {"limit": 50, "sort_by": "Precio: Mayor a Menor"},
+)
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Rango más cercano
+    k = max(0, min(len(sorted_values), math.ceil(p / 100 * len(sorted_values))) - 1)
+    return sorted_values[k]
+
+
+def summarize(latencies: List[float], statuses: Dict[int, int], elapsed: float) -> dict:
+    values = sorted(latencies)
+    ok = sum(n for s, n in statuses.items() if s < 400)
+    return {
+        "requests": len(values),
+        "errors": len(values) - ok,
+        "rps": round(len(values) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(values, 50) * 1000, 2),
+        "p95_ms": round(percentile(values, 95) * 1000, 2),
+        "p99_ms": round(percentile(values, 99) * 1000, 2),
+        "max_ms": round(values[-1] * 1000, 2) if values else 0.0,
+        "status": {str(s): n for s, n in sorted(statuses.items())},
+    }
+
+
+async def run_scenario(
+    client: httpx.AsyncClient,
+    make_request: Callable[[random.Random], tuple],
+    concurrency: int,
+    duration: float,
+    seed_value: int,
+) -> dict:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(n: int) -> None:
+        rng = random.Random(seed_value * 1000 + n)
+        while time.perf_counter() < deadline:
+            method, url, kwargs = make_request(rng)
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+                status = response.status_code
+            except httpx.HTTPError:
+                status = 599
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - start)
+
+
+async def _login(client: httpx.AsyncClient, email: str) -> Optional[str]:
+    r = await client.post("/auth/login", json={"email": email, "password": BENCH_PASSWORD})
+    return r.json().get("access_token") if r.status_code == 200 else None
+
+
+async def bench(client: httpx.AsyncClient, args, hot_skus: List[int]) -> dict:
+    # Tokens de un subconjunto de usuarios (el login se mide aparte)
+    emails = [user_email(i) for i in range(args.users)]
+    token_users = emails[: max(1, min(len(emails), args.token_users))]
+    tokens = [t for t in await asyncio.gather(*(_login(client, e) for e in token_users)) if t]
+    if not tokens:
+        raise SystemExit("No se pudo iniciar sesión con los usuarios de benchmark (¿falta sembrar?)")
+
+    def products(rng):
+        return "GET", "/products", {"params": rng.choice(PRODUCT_QUERIES)}
+
+    def login(rng):
+        return "POST", "/auth/login", {"json": {"email": rng.choice(emails), "password": BENCH_PASSWORD}}
+
+    def orders(rng):
+        items = [
+            {"product_id": pid, "quantity": rng.randint(1, 3)}
+            for pid in rng.sample(hot_skus, k=min(len(hot_skus), rng.randint(1, 3)))
+        ]
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        return "POST", "/orders", {"json": {"items": items}, "headers": headers}
+
+    def my_orders(rng):
+        headers = {"Authorization": f"Bearer {rng.choice(tokens)}"}
+        return "GET", "/orders/my", {"params": {"limit": 20}, "headers": headers}
+
+    makers = {"products": products, "login": login, "orders": orders, "my_orders": my_orders}
+    results = {}
+    for name in args.scenarios:
+        if args.warmup:
+            await run_scenario(client, makers[name], args.concurrency, args.warmup, args.seed)
+        results[name] = await run_scenario(client, makers[name], args.concurrency, args.duration, args.seed)
+        print(f"{name}: {json.dumps(results[name])}", file=sys.stderr)
+    return results
+
+
+def _hot_skus(count: int) -> List[int]:
+    from sqlalchemy import select
+    from app.database import SessionLocal
+    from app.models import Product
+
+    with SessionLocal() as db:
+        return db.scalars(
+            select(Product.id).where(Product.stock >= 1_000_000).order_by(Product.id).limit(count)
+        ).all()
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current: dict, baseline: dict, max_regression: float) -> List[str]:
+    """Regresiones de p95 o rps por encima de `max_regression` (fracción)."""
+    problems = []
+    for name, now in current["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before:
+            continue
+        if before["p95_ms"] and now["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            problems.append(f"{name}: p95 {before['p95_ms']} -> {now['p95_ms']} ms")
+        if before["rps"] and now["rps"] < before["rps"] * (1 - max_regression):
+            problems.append(f"{name}: rps {before['rps']} -> {now['rps']}")
+    return problems
+
+
+async def _main(args) -> dict:
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from app import migrations
+    from app.database import SessionLocal, engine
+    from .seed import reset, seed
+
+    if args.reset:
+        reset(engine)
+    else:
+        migrations.upgrade(engine)
+    with SessionLocal() as db:
+        seeded = seed(db, args.products, args.users, args.orders, args.seed)
+    hot_skus = _hot_skus(args.hot_skus)
+    if not hot_skus:
+        raise SystemExit("No hay SKUs calientes (productos con stock >= 1e6): usa --reset")
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    if args.url:
+        async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=30) as client:
+            scenarios = await bench(client, args, hot_skus)
+        target = args.url
+    else:
+        from app.main import app
+
+        await app.router.startup()
+        try:
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30) as client:
+                scenarios = await bench(client, args, hot_skus)
+        finally:
+            await app.router.shutdown()
+        target = "in-process"
+
+    return {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "target": target,
+        "database": engine.dialect.name,
+        "python": platform.python_version(),
+        "params": {
+            "products": args.products, "users": args.users, "orders": args.orders, "seed": args.seed,
+            "concurrency": args.concurrency, "duration": args.duration, "hot_skus": len(hot_skus),
+            "db_async": os.getenv("DB_ASYNC", "false"),
+        },
+        "dataset": seeded,
+        "scenarios": scenarios,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark de la API (RPS y latencias p50/p95/p99)")
+    add_seed_arguments(parser)
+    parser.add_argument("--url", help="Servidor a medir; sin --url la app corre en proceso")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        type=lambda s: [x for x in s.split(",") if x in SCENARIOS])
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0, help="Segundos por escenario")
+    parser.add_argument("--warmup", type=float, default=1.0, help="Segundos de calentamiento (no se miden)")
+    parser.add_argument("--hot-skus", type=int, default=5, help="SKUs que comparten todas las órdenes")
+    parser.add_argument("--token-users", type=int, default=20, help="Usuarios con sesión para órdenes")
+    parser.add_argument("--out", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    result = asyncio.run(_main(args))
+    output = json.dumps(result, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            problems = compare(result, json.load(f), args.max_regression)
+        for p in problems:
+            print(f"REGRESIÓN {p}", file=sys.stderr)
+        if problems:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
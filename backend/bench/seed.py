@@ -0,0 +1,149 @@
+# backend/bench/seed.py
+"""
+Dataset sintético y determinista para los benchmarks (N productos, M usuarios,
+K órdenes), insertado por lotes con los modelos de app/models.py.
+
+    cd backend && python -m bench.seed --database-url sqlite:///bench.db \
+        --products 2000 --users 200 --orders 5000 --reset
+
+Todos los usuarios tienen la contraseña BENCH_PASSWORD (se hashea una sola vez).
+"""
+import argparse
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+from sqlalchemy.orm import Session
+
+BENCH_PASSWORD = "bench123"
+BENCH_EMAIL = "bench{}@bench-dulces.com"
+CATEGORIES = ("Gomitas", "Chocolates", "Caramelos", "Galletas", "Colombianos", "Bebidas")
+WORDS = ("Gomitas", "Chocolate", "Chicle", "Galleta", "Caramelo", "Menta", "Fresa", "Coco",
+         "Arequipe", "Maní", "Limón", "Amargo", "Leche", "Frutal", "Ácido", "Crujiente")
+BATCH = 5000
+
+
+def user_email(i: int) -> str:
+    return BENCH_EMAIL.format(i)
+
+
+def _batches(rows, size: int = BATCH):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def seed(db: Session, products: int, users: int, orders: int, seed_value: int = 42) -> dict:
+    """Inserta el dataset si no existe ya (mismo tamaño de usuarios de benchmark)."""
+    from app.hashing import hash_password_sync
+    from app.models import Order, OrderItem, Product, User
+
+    existing = db.scalar(select(func.count()).select_from(User).where(User.email.like(BENCH_EMAIL.format("%"))))
+    if existing:
+        return {"seeded": False, "bench_users": existing}
+
+    rng = random.Random(seed_value)
+    now = datetime.utcnow()
+
+    product_rows = [
+        {
+            "name": f"{rng.choice(WORDS)} {rng.choice(WORDS)} {i}",
+            "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+            "price": round(rng.uniform(0.5, 40), 2),
+            # Stock alto: los escenarios de órdenes no deben agotar los SKUs calientes
+            "stock": rng.randint(0, 50) if i % 10 else 10_000_000,
+            "image_url": "/static/gomitas.svg",
+            "category": rng.choice(CATEGORIES),
+            "is_vegan": rng.random() < 0.3,
+            "is_gluten_free": rng.random() < 0.4,
+            "created_at": now - timedelta(minutes=i),
+        }
+        for i in range(products)
+    ]
+    for batch in _batches(product_rows):
+        db.execute(insert(Product), batch)
+
+    password_hash = hash_password_sync(BENCH_PASSWORD)
+    user_rows = [
+        {"email": user_email(i), "password_hash": password_hash, "role": "USER",
+         "is_active": True, "created_at": now - timedelta(minutes=i)}
+        for i in range(users)
+    ]
+    for batch in _batches(user_rows):
+        db.execute(insert(User), batch)
+    db.flush()
+
+    product_prices = db.execute(select(Product.id, Product.price)).all()
+    user_ids = db.scalars(select(User.id).where(User.email.like(BENCH_EMAIL.format("%")))).all()
+
+    if orders and user_ids and product_prices:
+        order_rows, baskets = [], []
+        for _ in range(orders):
+            order_rows.append({
+                "user_id": rng.choice(user_ids), "status": "CREATED",
+                "created_at": now - timedelta(seconds=rng.randint(0, 90 * 86400)),
+            })
+            baskets.append(rng.sample(product_prices, k=min(rng.randint(1, 4), len(product_prices))))
+        # ids generados por la BD (no romper la secuencia de orders.id)
+        order_ids = []
+        for batch in _batches(order_rows):
+            order_ids += db.scalars(
+                insert(Order).returning(Order.id, sort_by_parameter_order=True), batch
+            ).all()
+        item_rows = [
+            {"order_id": order_id, "product_id": product_id,
+             "quantity": rng.randint(1, 5), "unit_price": price}
+            for order_id, basket in zip(order_ids, baskets)
+            for product_id, price in basket
+        ]
+        for batch in _batches(item_rows):
+            db.execute(insert(OrderItem), batch)
+    db.commit()
+
+    # Contadores del dashboard y rollup de ventas al día con los datos nuevos
+    from app import sales, stats
+    stats.reconcile(db)
+    if orders:
+        first, last = db.execute(select(func.min(Order.created_at), func.max(Order.created_at))).one()
+        sales.rebuild(db, first.date(), last.date())
+    return {"seeded": True, "products": products, "users": users, "orders": orders}
+
+
+def reset(engine) -> None:
+    """Borra TODAS las tablas y aplica las migraciones. Solo para bases de benchmark."""
+    from app import migrations
+    from app.database import Base
+
+    Base.metadata.drop_all(bind=engine)  # incluye schema_version
+    migrations.upgrade(engine)
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--database-url", help="Por defecto DATABASE_URL / .env")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=42, help="Semilla del generador (reproducible)")
+    parser.add_argument("--reset", action="store_true", help="Borra y recrea las tablas antes de sembrar")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    import os
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+    from app import migrations
+    from app.database import SessionLocal, engine
+
+    if args.reset:
+        reset(engine)
+    else:
+        migrations.upgrade(engine)
+    with SessionLocal() as db:
+        print(seed(db, args.products, args.users, args.orders, args.seed))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+# backend/bench/serialization.py
+"""
+Micro-benchmark de serialización: tiempo por 1k filas, antes y después del
+camino rápido (app/serializers.py).
+
+    cd backend && python -m bench.serialization [--rows 1000] [--repeat 20]
+
+- antes: objetos ORM -> ProductOut/OrderOut (from_attributes) -> JSON (Pydantic/stdlib)
+- después: filas Row -> serializador precompilado -> orjson
+
+Usa SQLite en memoria, no toca la base configurada. Imprime JSON.
+"""
+import argparse
+import json
+import statistics
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import Session
+
+from app.database import Base
+from app.models import Order, OrderItem, Product, User
+from app.schemas import OrderItemOut, OrderOut, ProductOut
+from app.serializers import dumps, order_item_row, order_row, orjson, product_row
+
+
+def _seed(db: Session, rows: int) -> None:
+    now = datetime.utcnow()
+    db.add(User(id=1, email="bench@mail.com", password_hash="x", role="CUSTOMER"))
+    db.add_all(
+        Product(
+            id=i, name=f"Producto {i}", description="Dulce de prueba " * 4, price=f"{i % 97}.{i % 100:02d}",
+            stock=i % 50, image_url=f"/static/{i}.svg", category=("Gomitas", "Chocolates", "Caramelos")[i % 3],
+            is_vegan=bool(i % 2), is_gluten_free=bool(i % 3), created_at=now - timedelta(minutes=i),
+        )
+        for i in range(1, rows + 1)
+    )
+    db.add_all(Order(id=i, user_id=1, created_at=now - timedelta(minutes=i)) for i in range(1, rows + 1))
+    db.add_all(
+        OrderItem(order_id=i, product_id=(i + k) % rows + 1, quantity=k + 1, unit_price="2.50")
+        for i in range(1, rows + 1) for k in range(3)
+    )
+    db.commit()
+
+
+def _time(fn, repeat: int) -> float:
+    fn()  # calentamiento
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    engine = create_engine("sqlite://", future=True)
+    Base.metadata.create_all(engine)
+    with Session(engine) as db:
+        _seed(db, args.rows)
+
+    products_adapter = TypeAdapter(List[ProductOut])
+    orders_adapter = TypeAdapter(List[OrderOut])
+
+    with Session(engine) as db:
+        products = db.scalars(select(Product).order_by(Product.id)).all()
+        product_rows = db.execute(select(*product_row.columns(Product)).order_by(Product.id)).all()
+        orders = db.scalars(select(Order).order_by(Order.id)).all()
+        order_rows = db.execute(select(*order_row.columns(Order)).order_by(Order.id)).all()
+        items = {o.id: [] for o in orders}
+        item_rows = {o.id: [] for o in orders}
+        for it, name in db.execute(
+            select(OrderItem, Product.name).join(Product, Product.id == OrderItem.product_id).order_by(OrderItem.id)
+        ):
+            items[it.order_id].append(OrderItemOut(
+                product_id=it.product_id, quantity=it.quantity, unit_price=float(it.unit_price), product_name=name,
+            ))
+            item_rows[it.order_id].append(
+                (it.product_id, it.quantity, it.unit_price, name)
+            )
+
+        cases = {
+            # GET /products antes: ORM -> validación from_attributes -> dump_json
+            "products_before": lambda: products_adapter.dump_json(
+                products_adapter.validate_python(products, from_attributes=True)
+            ),
+            # respuesta por defecto de FastAPI (response_model + jsonable_encoder + json)
+            "products_fastapi_default": lambda: json.dumps(
+                jsonable_encoder(products_adapter.validate_python(products, from_attributes=True))
+            ).encode(),
+            "products_after": lambda: dumps(product_row.many(product_rows)),
+            # GET /orders/my antes: OrderOut a mano + revalidación por response_model
+            "orders_before": lambda: orders_adapter.dump_json(orders_adapter.validate_python([
+                OrderOut(id=o.id, created_at=o.created_at, status=o.status, items=items[o.id]) for o in orders
+            ], from_attributes=True)),
+            "orders_after": lambda: dumps([
+                order_row.one(o, items=[order_item_row.one(r) for r in item_rows[o.id]]) for o in order_rows
+            ]),
+        }
+
+        # Mismo JSON en ambos caminos
+        assert json.loads(cases["products_before"]()) == json.loads(cases["products_after"]())
+        assert json.loads(cases["orders_before"]()) == json.loads(cases["orders_after"]())
+
+        per_1k = 1000 / args.rows
+        results = {name: round(_time(fn, args.repeat) * per_1k * 1000, 3) for name, fn in cases.items()}
+
+    print(json.dumps({
+        "rows": args.rows,
+        "repeat": args.repeat,
+        "encoder": "orjson" if orjson is not None else "json",
+        "ms_per_1k_rows": results,
+        "speedup": {
+            "products": round(results["products_before"] / results["products_after"], 1),
+            "orders": round(results["orders_before"] / results["orders_after"], 1),
+        },
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+# backend/tests/conftest.py
+"""
+Fixtures de la API sobre un SQLite temporal (sin jobs de fondo: el TestClient
+no se abre como context manager, así que no corre el startup).
+
+    cd backend && python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp(prefix="dulces-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ.setdefault("DB_ASYNC", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from app import migrations, seed
+    from app.database import SessionLocal, engine
+    from app.main import app
+
+    migrations.upgrade(engine)
+    with SessionLocal() as db:
+        seed.run(db)
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def admin_headers(client):
+    r = client.post("/auth/login", json={"email": "admin@mail.com", "password": "admin123"})
+    assert r.status_code == 200, r.text
+    return {"Authorization": f"Bearer {r.json()['access_token']}"}
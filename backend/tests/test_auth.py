@@ -0,0 +1,32 @@
+# backend/tests/test_auth.py
+from app.hashing import _verify, pwd_context
+
+
+def test_verify_rejects_malformed_hash_used_as_password():
+    malformed = "$2b$12$notreallyabcrypthash"
+    assert _verify(malformed, malformed) == (False, False)
+
+
+def test_verify_accepts_legacy_plaintext_and_bcrypt():
+    assert _verify("secreto", "secreto") == (True, True)
+    assert _verify("secreto", pwd_context.hash("secreto"))[0]
+    assert _verify("otro", "secreto") == (False, False)
+
+
+def test_login_releases_connection_before_hashing(client, monkeypatch):
+    from app.database import async_engine, engine
+    from app.routers import auth_router
+
+    pool = (async_engine or engine).pool
+    seen = []
+    verify = auth_router.verify_password_async
+
+    async def spy(plain, hashed):
+        seen.append(pool.checkedout())
+        return await verify(plain, hashed)
+
+    monkeypatch.setattr(auth_router, "verify_password_async", spy)
+    r = client.post("/auth/login", json={"email": "admin@mail.com", "password": "admin123"})
+    assert r.status_code == 200, r.text
+    assert r.json()["user"]["email"] == "admin@mail.com"
+    assert seen == [0]
@@ -0,0 +1,44 @@
+# backend/tests/test_profiling.py
+from app.profiling import assert_max_queries, capture_queries
+
+
+def _order(client, headers, product_id):
+    r = client.post("/orders", json={"items": [{"product_id": product_id, "quantity": 1}]}, headers=headers)
+    assert r.status_code == 201, r.text
+
+
+def test_my_orders_queries_do_not_grow_with_orders(client, admin_headers):
+    products = [p["id"] for p in client.get("/products").json()[:3]]
+    _order(client, admin_headers, products[0])
+    client.get("/orders/my", headers=admin_headers)  # calienta el principal cacheado
+
+    with capture_queries() as few:
+        assert len(client.get("/orders/my", headers=admin_headers).json()) == 1
+    assert few.count > 0  # la captura ve las consultas del endpoint
+
+    for i in range(20):
+        _order(client, admin_headers, products[i % len(products)])
+    client.get("/orders/my", headers=admin_headers)
+
+    # Órdenes en una consulta e items en otra, sin importar cuántas haya
+    with assert_max_queries(few.count):
+        assert len(client.get("/orders/my", headers=admin_headers).json()) == 21
+
+
+def test_capture_ignores_other_threads(client):
+    import threading
+
+    from sqlalchemy import text
+
+    from app.database import SessionLocal
+
+    def background():
+        with SessionLocal() as db:
+            for _ in range(5):
+                db.execute(text("SELECT 1"))
+
+    with capture_queries() as profile:
+        worker = threading.Thread(target=background)
+        worker.start()
+        worker.join()
+    assert profile.count == 0
@@ -38,6 +38,16 @@ export async function apiGet(path, token) {
   return parseResponse(res);
 }
 
+// GET paginado: devuelve { data, next } con el cursor de X-Next-Cursor (null en la última página)
+export async function apiGetPage(path, token) {
+  const res = await fetch(`${API_URL}${path}`, {
+    method: "GET",
+    headers: headers(token),
+  });
+  const data = await parseResponse(res);
+  return { data, next: res.headers.get("X-Next-Cursor") };
+}
+
 export async function apiPost(path, body, token) {
   const res = await fetch(`${API_URL}${path}`, {
     method: "POST",
@@ -86,6 +96,7 @@ export async function api(path, opts = {}) {
 // === Export tipo objeto para { api } ===
 api.base = API_URL;
 api.get  = apiGet;
+api.page = apiGetPage;
 api.post = apiPost;
 api.put  = apiPut;
 api.del  = apiDel;
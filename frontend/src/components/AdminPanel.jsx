@@ -146,6 +146,8 @@ export default function AdminPanel({ token }) {
           <h3 className="card-title">Productos</h3>
           <div style={{ marginBottom: '.5rem', opacity: .8 }}>
             Total productos: <b>{counts.products}</b>
+            {counts.lowStockProducts != null && <> · Stock bajo: <b>{counts.lowStockProducts}</b></>}
+            {counts.orders != null && <> · Órdenes: <b>{counts.orders}</b></>}
           </div>
 
           {loading
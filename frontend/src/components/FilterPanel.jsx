@@ -1,6 +1,6 @@
 import React, { useState } from 'react'
 
-export default function FilterPanel({ onFiltersChange }) {
+export default function FilterPanel({ onFiltersChange, facets }) {
   const [filters, setFilters] = useState({
     category: 'Todas',
     maxPrice: 15000,
@@ -19,6 +19,14 @@ export default function FilterPanel({ onFiltersChange }) {
     'Nombre A-Z', 'Nombre Z-A'
   ]
 
+  // Conteos de GET /products/facets (cada faceta ignora su propio filtro)
+  const categoryCount = (category) => {
+    if (!facets) return null
+    if (category === 'Todas') return facets.category.reduce((sum, c) => sum + c.count, 0)
+    return facets.category.find(c => c.value === category)?.count ?? 0
+  }
+  const countLabel = (n) => (n == null ? '' : ` (${n})`)
+
   const updateFilter = (key, value) => {
     const newFilters = { ...filters, [key]: value }
     setFilters(newFilters)
@@ -37,7 +45,7 @@ export default function FilterPanel({ onFiltersChange }) {
               className={`category-tag ${filters.category === category ? 'active' : ''}`}
               onClick={() => updateFilter('category', category)}
             >
-              {category}
+              {category}{countLabel(categoryCount(category))}
             </button>
           ))}
         </div>
@@ -76,7 +84,7 @@ export default function FilterPanel({ onFiltersChange }) {
               onChange={(e) => updateFilter('veganOnly', e.target.checked)}
               className="checkbox"
             />
-            <span className="checkbox-text">Solo vegano</span>
+            <span className="checkbox-text">Solo vegano{countLabel(facets?.is_vegan.true)}</span>
           </label>
           <label className="checkbox-label">
             <input
@@ -85,7 +93,7 @@ export default function FilterPanel({ onFiltersChange }) {
               onChange={(e) => updateFilter('glutenFree', e.target.checked)}
               className="checkbox"
             />
-            <span className="checkbox-text">Sin gluten</span>
+            <span className="checkbox-text">Sin gluten{countLabel(facets?.is_gluten_free.true)}</span>
           </label>
         </div>
       </div>
@@ -5,6 +5,7 @@ import FilterPanel from './FilterPanel'
 
 export default function ProductList({ token, user }) {
   const [products, setProducts] = useState([])
+  const [facets, setFacets] = useState(null)
   const [q, setQ] = useState('')
   const [loading, setLoading] = useState(false)
   const [err, setErr] = useState('')
@@ -30,9 +31,15 @@ export default function ProductList({ token, user }) {
       if (filterParams.sortBy) params.append('sort_by', filterParams.sortBy)
       
       if (params.toString()) url += `?${params.toString()}`
-      
-      const data = await api(url)
+
+      // Conteos del panel de filtros con los mismos filtros (sin el orden)
+      const facetParams = new URLSearchParams(params)
+      facetParams.delete('sort_by')
+      const facetsUrl = `/products/facets${facetParams.toString() ? `?${facetParams.toString()}` : ''}`
+
+      const [data, counts] = await Promise.all([api(url), api(facetsUrl).catch(() => null)])
       setProducts(data)
+      setFacets(counts)
     } catch (e) { setErr('No se pudo cargar el catálogo') }
     finally { setLoading(false) }
   }
@@ -52,7 +59,7 @@ export default function ProductList({ token, user }) {
 
   return (
     <>
-      <FilterPanel onFiltersChange={handleFiltersChange} />
+      <FilterPanel onFiltersChange={handleFiltersChange} facets={facets} />
       
       <div className="card">
         <div style={{display:'grid', gridTemplateColumns:'1fr auto', gap:'.6rem'}}>
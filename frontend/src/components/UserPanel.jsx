@@ -2,20 +2,35 @@ import React, { useEffect, useState, useMemo } from 'react'
 import { api } from '../api'
 import ProductCard from './ProductCard'
 
+const ORDERS_PAGE = 50
+
 export default function UserPanel({ token }) {
   const [products, setProducts] = useState([])
   const [cart, setCart] = useState([])
   const [orders, setOrders] = useState([])
+  const [nextCursor, setNextCursor] = useState(null)
+  const [loadingMore, setLoadingMore] = useState(false)
   const [err, setErr] = useState('')
 
   const load = async()=>{
     try {
-      const [p, o] = await Promise.all([ api('/products'), api('/orders/my', { token }) ])
-      setProducts(p); setOrders(o)
+      const [p, o] = await Promise.all([ api('/products'), api.page(`/orders/my?limit=${ORDERS_PAGE}`, token) ])
+      setProducts(p); setOrders(o.data); setNextCursor(o.next)
     } catch (e) { setErr('No se pudo cargar tus datos') }
   }
   useEffect(()=>{ load() },[])
 
+  // Sigue el cursor de X-Next-Cursor y agrega la página siguiente
+  const loadMore = async()=>{
+    if (!nextCursor || loadingMore) return
+    setLoadingMore(true)
+    try {
+      const o = await api.page(`/orders/my?limit=${ORDERS_PAGE}&cursor=${encodeURIComponent(nextCursor)}`, token)
+      setOrders(prev=>[...prev, ...o.data]); setNextCursor(o.next)
+    } catch (e) { setErr('No se pudieron cargar más órdenes') }
+    finally { setLoadingMore(false) }
+  }
+
   const add = (p)=>{
     const i = cart.findIndex(x=>x.product_id===p.id)
     if (i>=0) {
@@ -76,6 +91,13 @@ export default function UserPanel({ token }) {
                 </div>
               ))
             }
+            {nextCursor && (
+              <div className="mt-1">
+                <button className="btn ghost" disabled={loadingMore} onClick={loadMore}>
+                  {loadingMore ? 'Cargando…' : 'Cargar más'}
+                </button>
+              </div>
+            )}
           </div>
         </div>
 